@@ -1,43 +1,202 @@
+## usage : python 01_prepare_vcf_for_snpeff.py [--input df.csv] [--output GBM.vcf] [--chunksize 500000]
+##         VCF trié par chromosome / position : --sort
+##         VCF trié, compressé BGZF + index positionnel : --output GBM.vcf.gz
+##
+## Conversion MAF -> VCF en streaming : le MAF est lu par chunks, la mémoire ne dépend pas de sa taille.
+## Tri externe : chaque chunk trié est écrit dans un fichier temporaire, puis les fichiers sont fusionnés
+## (heapq.merge). Ordre des chromosomes : 1..22, X, Y, MT, puis les autres par ordre alphabétique.
+## Sortie .vcf.gz : BGZF (lisible par gzip, bgzip, tabix, SnpEff) et index GBM.vcf.gz.idx.tsv :
+##   chrom, first_pos, last_pos, virtual_offset, n_records (voir vcf_bgzf.py). 02 s'en sert pour
+##   paralléliser la lecture d'un .vcf.gz.
+##   Si pysam est installé, un index tabix GBM.vcf.gz.tbi est aussi écrit.
+## Correspondance variant -> échantillon écrite dans GBM.samples.tsv (CHROM, POS, REF, ALT, sample) pour le
+## mode cohorte de 06 (--hla_genotypes / --mutation_samples), depuis la colonne échantillon du MAF
+## (Tumor_Sample_Barcode, voir --sample_column) ; sans cette colonne, le fichier n'a que l'en-tête.
+
+import argparse
+import heapq
+import os
+import shutil
+import tempfile
 import pandas as pd
+from telemetry import Telemetry
+from vcf_bgzf import write_bgzip
+
+VCF_COLUMNS = ['#CHROM', 'POS', 'ID', 'REF', 'ALT', 'QUAL', 'FILTER', 'INFO']
+VCF_HEADER = (
+    "##fileformat=VCFv4.2\n"
+    "##INFO=<ID=GENE,Number=1,Type=String,Description=\"Gene symbol\">\n"
+    "##INFO=<ID=TYPE,Number=1,Type=String,Description=\"Variant classification\">\n"
+    "##INFO=<ID=FREQ,Number=1,Type=Float,Description=\"Allele frequency in tumor samples\">\n"
+    "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+)
+SAMPLE_COLUMN = "Tumor_Sample_Barcode"
+SAMPLE_TABLE_COLUMNS = ["CHROM", "POS", "REF", "ALT", "sample"]
+CHROM_ORDER = {**{str(i): i for i in range(1, 23)}, "X": 23, "Y": 24, "M": 25, "MT": 25}
+
+
+def chrom_key(chrom):
+    """Clé de tri d'un chromosome ('chr' ignoré) : chromosomes numérotés, X, Y, MT, puis les autres."""
+    name = chrom[3:] if chrom.lower().startswith("chr") else chrom
+    rank = CHROM_ORDER.get(name.upper())
+    return (0, rank, "") if rank is not None else (1, 0, name)
+
+
+def line_key(line):
+    chrom, pos, _ = line.split("\t", 2)
+    return chrom_key(chrom) + (int(pos),)
+
+
+def maf_to_vcf(df):
+    """Colonnes VCF d'un chunk du MAF (chaînes)."""
+    # Nettoyer les colonnes pour éviter les erreurs
+    df.columns = [col.strip() for col in df.columns]
+
+    # Nettoyer les colonnes critiques
+    df = df[df['Reference_Allele'].notna() & df['Tumor_Seq_Allele2'].notna()].copy()
+
+    # Assurer les types pour POS (1-based dans VCF)
+    df['POS'] = df['chromStart'].astype(int) + 1
+
+    # Assigner les valeurs obligatoires VCF
+    df['#CHROM'] = df['chrom'].astype(str)
+    df['ID'] = df['dbSNP_RS'].fillna('.')
+    df['REF'] = df['Reference_Allele']
+    df['ALT'] = df['Tumor_Seq_Allele2']
+    df['QUAL'] = '.'
+    df['FILTER'] = '.'
+
+    # Créer le champ INFO avec quelques métadonnées
+    df['INFO'] = ('GENE=' + df['Hugo_Symbol'].fillna('.') +
+        ';TYPE=' + df['Variant_Classification'].fillna('.') +
+        ';FREQ=' + df['freq'].fillna('.'))
+
+    # Garder uniquement les colonnes nécessaires au VCF
+    return df[VCF_COLUMNS]
+
+
+def sort_chunk(vcf_df):
+    """Tri stable d'un chunk par (chromosome, position)."""
+    # Rang de la clé chrom_key : '1' et 'chr1' sont à égalité, comme dans la fusion (line_key)
+    keys = {c: chrom_key(c) for c in vcf_df['#CHROM'].unique()}
+    key_rank = {key: i for i, key in enumerate(sorted(set(keys.values())))}
+    rank = {c: key_rank[key] for c, key in keys.items()}
+    order = pd.DataFrame({"rank": vcf_df['#CHROM'].map(rank).to_numpy(), "pos": vcf_df['POS'].to_numpy()})
+    return vcf_df.iloc[order.sort_values(["rank", "pos"], kind="stable").index]
+
+
+def iter_sorted_lines(run_paths):
+    """Fusion des chunks triés ; à clé égale, l'ordre du MAF est conservé."""
+    files = [open(path) for path in run_paths]
+    try:
+        yield from heapq.merge(*files, key=line_key)
+    finally:
+        for f in files:
+            f.close()
+
+
+def samples_path_for(vcf_path):
+    """'GBM.vcf' / 'GBM.vcf.gz' -> 'GBM.samples.tsv'"""
+    base = vcf_path[:-3] if vcf_path.endswith(".gz") else vcf_path
+    return os.path.splitext(base)[0] + ".samples.tsv"
+
+
+def variant_samples(chunk, vcf_df, sample_column=SAMPLE_COLUMN):
+    """Correspondance variant -> échantillon d'un chunk (None si le MAF n'a pas la colonne)."""
+    if sample_column not in chunk.columns:
+        return None
+    return pd.DataFrame({
+        "CHROM": vcf_df['#CHROM'], "POS": vcf_df['POS'], "REF": vcf_df['REF'], "ALT": vcf_df['ALT'],
+        "sample": chunk.loc[vcf_df.index, sample_column],
+    }).dropna(subset=["sample"]).drop_duplicates()
+
 
-# Charger le fichier
-df = pd.read_csv("df.csv", sep="\t", dtype=str)
+def convert_chunks(chunks, step, out=None, run_dir=None, samples_out=None, sample_column=SAMPLE_COLUMN):
+    """
+    Convertit les chunks du MAF : écrits tels quels dans `out`, ou triés un à un
+    dans `run_dir` (retourne alors la liste des fichiers à fusionner).
+    `samples_out` : fichier ouvert recevant la correspondance variant -> échantillon.
+    """
+    run_paths = []
+    step.rows_in = step.rows_out = 0
+    for i, chunk in enumerate(chunks):
+        step.rows_in += len(chunk)
+        vcf_df = maf_to_vcf(chunk)
+        step.rows_out += len(vcf_df)
+        if samples_out is not None:
+            samples = variant_samples(chunk, vcf_df, sample_column)
+            if samples is not None:
+                samples.to_csv(samples_out, sep="\t", index=False, header=samples_out.tell() == 0)
+        if out is not None:
+            vcf_df.to_csv(out, sep="\t", index=False, header=False)
+        else:
+            run_paths.append(os.path.join(run_dir, f"run_{i:05d}.vcf"))
+            sort_chunk(vcf_df).to_csv(run_paths[-1], sep="\t", index=False, header=False)
+    return run_paths
 
-# Nettoyer les colonnes pour éviter les erreurs
-df.columns = [col.strip() for col in df.columns]
 
-# Nettoyer les colonnes critiques
-df = df[df['Reference_Allele'].notna() & df['Tumor_Seq_Allele2'].notna()]
+def write_sorted(chunks, vcf_path, bgzip, telemetry, **options):
+    """Tri externe : chunks triés dans un répertoire temporaire voisin de la sortie, puis fusion."""
+    run_dir = tempfile.mkdtemp(prefix="01_sort_", dir=os.path.dirname(os.path.abspath(vcf_path)))
+    try:
+        with telemetry.step("convert_sort_chunks") as step:
+            run_paths = convert_chunks(chunks, step, run_dir=run_dir, **options)
+        telemetry.rows_in, telemetry.rows_out = step.rows_in, step.rows_out
 
-# Assurer les types pour POS (1-based dans VCF)
-df['POS'] = df['chromStart'].astype(int) + 1
+        with telemetry.step("merge_sorted_chunks", rows_in=telemetry.rows_out) as step:
+            lines = iter_sorted_lines(run_paths)
+            if bgzip:
+                write_bgzip(VCF_HEADER, lines, vcf_path)
+            else:
+                with open(vcf_path, "w") as out:
+                    out.write(VCF_HEADER)
+                    out.writelines(lines)
+            step.rows_out = telemetry.rows_out
+        print(f"[INFO] {len(run_paths)} chunks triés fusionnés")
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
 
-# Assigner les valeurs obligatoires VCF
-df['#CHROM'] = df['chrom'].astype(str)
-df['ID'] = df['dbSNP_RS'].fillna('.')
-df['REF'] = df['Reference_Allele']
-df['ALT'] = df['Tumor_Seq_Allele2']
-df['QUAL'] = '.'
-df['FILTER'] = '.'
 
+def main(maf_path="df.csv", vcf_path="GBM.vcf", chunksize=500_000, sort=False,
+         samples_path=None, sample_column=SAMPLE_COLUMN):
+    telemetry = Telemetry("01")
+    bgzip = vcf_path.endswith(".gz")
+    if bgzip and not sort:
+        print("[INFO] Sortie bgzip indexée : tri par chromosome / position activé")
+        sort = True
 
-# Créer le champ INFO avec quelques métadonnées
-df['INFO'] = ('GENE=' + df['Hugo_Symbol'].fillna('.') +
-    ';TYPE=' + df['Variant_Classification'].fillna('.') +
-    ';FREQ=' + df['freq'].fillna('.'))
+    # Correspondance variant -> échantillon toujours écrite (en-tête seul sans colonne échantillon dans le MAF)
+    columns = [c.strip() for c in pd.read_csv(maf_path, sep="\t", nrows=0).columns]
+    samples_path = samples_path or samples_path_for(vcf_path)
 
-# Garder uniquement les colonnes nécessaires au VCF
-vcf_df = df[['#CHROM', 'POS', 'ID', 'REF', 'ALT', 'QUAL', 'FILTER', 'INFO']]
+    chunks = pd.read_csv(maf_path, sep="\t", dtype=str, chunksize=chunksize)
+    with open(samples_path, "w") as samples_out:
+        options = dict(samples_out=samples_out, sample_column=sample_column)
+        if sort:
+            write_sorted(chunks, vcf_path, bgzip, telemetry, **options)
+        else:
+            with telemetry.step("convert_chunks") as step, open(vcf_path, "w") as out:
+                out.write(VCF_HEADER)
+                convert_chunks(chunks, step, out=out, **options)
+            telemetry.rows_in, telemetry.rows_out = step.rows_in, step.rows_out
+        if samples_out.tell() == 0:
+            samples_out.write("\t".join(SAMPLE_TABLE_COLUMNS) + "\n")
 
-# Sauvegarder au format VCF
-vcf_filename = "GBM.vcf"
-with open(vcf_filename, 'w') as f:
-    f.write("##fileformat=VCFv4.2\n")
-    f.write("##INFO=<ID=GENE,Number=1,Type=String,Description=\"Gene symbol\">\n")
-    f.write("##INFO=<ID=TYPE,Number=1,Type=String,Description=\"Variant classification\">\n")
-    f.write("##INFO=<ID=FREQ,Number=1,Type=Float,Description=\"Allele frequency in tumor samples\">\n")
-    f.write("#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n")
-    vcf_df.to_csv(f, sep="\t", index=False, header=False)
+    if sample_column in columns:
+        print(f"[INFO] Correspondance variant -> échantillon : {samples_path}")
+    else:
+        print(f"[INFO] Pas de colonne {sample_column} dans le MAF : {samples_path} sans échantillon (en-tête seul)")
+    print(f"✅ Fichier VCF généré avec succès : {vcf_path}")
 
-print(f"✅ Fichier VCF généré avec succès : {vcf_filename}")
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conversion MAF (df.csv) -> VCF pour SnpEff")
+    parser.add_argument("--input", default="df.csv", help="MAF tabulé (chrom, chromStart, Reference_Allele...)")
+    parser.add_argument("--output", default="GBM.vcf", help="VCF de sortie (.vcf.gz : BGZF trié + index)")
+    parser.add_argument("--chunksize", type=int, default=500_000, help="Nombre de lignes du MAF lues par chunk")
+    parser.add_argument("--sort", action="store_true", help="Trier par chromosome et position (tri externe)")
+    parser.add_argument("--sample_column", default=SAMPLE_COLUMN, help="Colonne échantillon du MAF")
+    parser.add_argument("--samples_output", default=None,
+                        help="Correspondance variant -> échantillon (défaut : GBM.samples.tsv à côté du VCF)")
+    args = parser.parse_args()
+    main(args.input, args.output, args.chunksize, args.sort, args.samples_output, args.sample_column)
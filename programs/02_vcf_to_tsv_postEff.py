@@ -1,5 +1,33 @@
-import sys
+## usage : python 02_vcf_to_tsv_postEff.py gbm.ann.vcf[.gz] gbm.ann.tsv [--threads 8]
+##         [--ann_mode all|first|mane --transcripts MANE.GRCh38.v1.2.ensembl_protein.faa] [--annotation missense_variant]
+## VCF bgzip accompagné d'un index positionnel <vcf>.idx.tsv (écrit par 01 pour GBM.vcf.gz ; pour la
+## sortie SnpEff : python vcf_bgzf.py gbm.ann.vcf gbm.ann.vcf.gz) : avec --threads, chaque worker
+## décompresse lui-même ses blocs.
+
+import argparse
 import csv
+import gzip
+import io
+import os
+import re
+from collections import Counter
+from functools import partial
+from multiprocessing import Pool
+from table_io import is_parquet, read_table, write_table
+from telemetry import Telemetry
+from vcf_bgzf import load_block_index
+
+# Colonnes ANN (fixées ici d'après doc SnpEff)
+ANN_COLUMNS = [
+    "Allele", "Annotation", "Annotation_Impact", "Gene_Name", "Gene_ID",
+    "Feature_Type", "Feature_ID", "Transcript_BioType", "Rank",
+    "HGVS.c", "HGVS.p", "cDNA.pos/cDNA.length", "CDS.pos/CDS.length",
+    "AA.pos/AA.length", "Distance", "ERRORS/WARNINGS/INFO"
+]
+
+# Nombre de lignes envoyées à un worker en une fois (entrée gzip)
+BATCH_LINES = 20000
+
 
 def parse_info_field(info_str):
     """Parse le champ INFO en dict clé=valeur."""
@@ -27,74 +55,297 @@ def parse_ann_field(ann_str):
         ann_list.append(fields)
     return ann_list
 
-def main(vcf_path, tsv_path):
-    with open(vcf_path) as vcf, open(tsv_path, "w", newline="") as tsvfile:
-        writer = None
+def select_annotations(ann_list, ann_mode="first", transcripts=None):
+    """
+    Choisit les annotations ANN à émettre :
+    - first : la première seulement (comportement historique)
+    - all   : toutes
+    - mane  : celles dont le Feature_ID appartient à `transcripts` (MANE ou canoniques)
+    """
+    if ann_mode == "first":
+        return ann_list[:1]
+    if ann_mode == "all":
+        return ann_list
+    return [ann for ann in ann_list if len(ann) > 6 and ann[6].split(".")[0] in transcripts]
+
+def load_transcripts(path):
+    """
+    Charge une liste de transcrits ENST (sans version) : soit un FASTA protéique
+    MANE (en-têtes 'transcript:ENST...'), soit un fichier texte un ID par ligne.
+    """
+    transcripts = set()
+    with open(path) as f:
+        for line in f:
+            if line.startswith(">"):
+                match = re.search(r"transcript:(ENST[0-9]+)", line)
+            else:
+                match = re.search(r"(ENST[0-9]+)", line)
+            if match:
+                transcripts.add(match.group(1))
+    return frozenset(transcripts)
 
-        for line in vcf:
+def is_gzipped(path):
+    """Détecte gzip/bgzip via le magic number (bgzip est un gzip multi-membres)."""
+    with open(path, "rb") as f:
+        return f.read(2) == b"\x1f\x8b"
+
+def open_vcf(path):
+    if is_gzipped(path):
+        return gzip.open(path, "rt")
+    return open(path)
+
+def read_header(vcf_path):
+    """
+    Lit l'en-tête et la première ligne de données.
+    Retourne (base_cols, clés INFO déclarées dans l'en-tête, first_data_line,
+    offset de la première ligne de données).
+    L'offset n'a de sens que pour un fichier texte non compressé : il est compté sur
+    les octets lus en mode binaire (fins de ligne CRLF comprises).
+    """
+    base_cols = None
+    header_info_keys = []
+    with (gzip.open(vcf_path, "rb") if is_gzipped(vcf_path) else open(vcf_path, "rb")) as vcf:
+        offset = 0
+        while True:
+            raw = vcf.readline()
+            if not raw:
+                return base_cols, header_info_keys, None, offset
+            line = raw.decode()
             if line.startswith("##"):
+                match = re.match(r"##INFO=<ID=([^,>]+)", line)
+                if match:
+                    header_info_keys.append(match.group(1))
+                offset += len(raw)
                 continue
             if line.startswith("#CHROM"):
                 header = line.lstrip("#").strip().split("\t")
-                # Colonnes classiques du VCF
-                base_cols = header[:8]  # CHROM, POS, ID, REF, ALT, QUAL, FILTER, INFO
-                
-                # On va élargir avec les clés INFO qu'on rencontre au fur et à mesure,
-                # mais comme on ne sait pas encore lesquelles, on attend la première ligne de données
+                # Colonnes classiques du VCF : CHROM, POS, ID, REF, ALT, QUAL, FILTER, INFO
+                base_cols = header[:8]
+                offset += len(raw)
+                continue
+            return base_cols, header_info_keys, line, offset
+
+def scan_info_keys(vcf_path):
+    """Pré-scan rapide : union des clés INFO de tout le fichier (seule la colonne INFO est découpée)."""
+    keys = set()
+    with open_vcf(vcf_path) as vcf:
+        for line in vcf:
+            if line.startswith("#"):
+                continue
+            info = line.split("\t", 8)[7].rstrip("\n")
+            if info == ".":
+                continue
+            for entry in info.split(";"):
+                keys.add(entry.split("=", 1)[0])
+    return keys
+
+def variant_to_rows(line, base_cols, info_keys, ann_mode="first", transcripts=None, annotation=None, stats=None):
+    """
+    Transforme une ligne variant en lignes de valeurs dans l'ordre du header
+    (une par annotation ANN retenue). Le filtre `annotation` est appliqué ici,
+    avant toute construction de ligne. `stats` (Counter) : variants écartés faute de transcrit MANE.
+    """
+    fields = line.strip().split("\t")
+    base_values = fields[:8]
+    info_dict = parse_info_field(base_values[7])
+
+    # On récupère les annotations ANN
+    ann_list = parse_ann_field(info_dict.get("ANN", ""))
+    selected = select_annotations(ann_list, ann_mode, transcripts)
+    if ann_list and not selected:
+        if stats is not None:
+            stats["no_mane"] += 1
+        return []
+    if annotation is not None:
+        selected = [ann for ann in selected if len(ann) > 1 and ann[1] == annotation]
+        if not selected:
+            return []
+    elif not ann_list:
+        # Variant sans ANN : une ligne avec colonnes ANN vides
+        selected = [[]]
+
+    prefix = list(base_values[:len(base_cols) - 1])
+    # Ajouter les infos hors ANN
+    prefix += [info_dict.get(k, "") for k in info_keys]
+
+    # On complète avec la taille de ANN_COLUMNS, certains champs peuvent manquer
+    return [
+        prefix + [ann[i] if i < len(ann) else "" for i in range(len(ANN_COLUMNS))]
+        for ann in selected
+    ]
+
+def format_lines(lines, base_cols, info_keys, **options):
+    """
+    Parse un lot de lignes ; renvoie (bloc TSV correspondant, compteurs du lot) :
+    variants lus, variants écartés faute de transcrit MANE.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter="\t", lineterminator="\r\n")
+    stats = Counter()
+    for line in lines:
+        if not line.strip() or line.startswith("#"):
+            continue
+        stats["variants"] += 1
+        writer.writerows(variant_to_rows(line, base_cols, info_keys, stats=stats, **options))
+    return buf.getvalue(), stats
+
+def format_byte_range(byte_range, vcf_path, base_cols, info_keys, **options):
+    """
+    Worker : traite les lignes qui commencent dans [start, end) d'un VCF texte.
+    Une ligne à cheval sur deux plages appartient à la plage où elle commence.
+    """
+    start, end = byte_range
+    lines = []
+    with open(vcf_path, "rb") as f:
+        f.seek(start)
+        if start > 0:
+            f.seek(start - 1)
+            if f.read(1) != b"\n":
+                f.readline()  # fin de ligne appartenant à la plage précédente
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            lines.append(line.decode())
+    return format_lines(lines, base_cols, info_keys, **options)
+
+def split_byte_ranges(start, size, n_chunks):
+    step = max(1, (size - start) // n_chunks + 1)
+    return [(s, min(s + step, size)) for s in range(start, size, step)]
+
+def format_bgzf_block(block, vcf_path, base_cols, info_keys, **options):
+    """Worker : lit `n_records` lignes à partir d'un offset virtuel BGZF et les formate."""
+    from Bio import bgzf
+    offset, n_records = block
+    with bgzf.BgzfReader(vcf_path, "rt") as vcf:
+        vcf.seek(offset)
+        lines = [vcf.readline() for _ in range(n_records)]
+    return format_lines(lines, base_cols, info_keys, **options)
+
+def iter_line_batches(vcf_path, batch_lines=BATCH_LINES):
+    """Décompression séquentielle, lignes de données regroupées par lots."""
+    batch = []
+    with open_vcf(vcf_path) as vcf:
+        for line in vcf:
+            if line.startswith("#"):
                 continue
+            batch.append(line)
+            if len(batch) >= batch_lines:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+def main(vcf_path, tsv_path, threads=1, ann_mode="first", transcripts_path=None,
+         annotation=None, info_schema="auto", telemetry=None):
+    telemetry = telemetry or Telemetry("02")
+    if is_parquet(tsv_path):
+        # Sortie Parquet : TSV écrit en streaming puis converti en table typée
+        text_path = tsv_path + ".tmp.tsv"
+        main(vcf_path, text_path, threads, ann_mode, transcripts_path, annotation, info_schema, telemetry)
+        with telemetry.step("parquet_convert") as step:
+            table = read_table(text_path)
+            write_table(table, tsv_path)
+            step.rows_out = len(table)
+        os.remove(text_path)
+        print(f"Conversion Parquet : {tsv_path}")
+        return
+
+    with telemetry.step("read_header"):
+        base_cols, header_info_keys, first_line, data_offset = read_header(vcf_path)
+
+    transcripts = None
+    if ann_mode == "mane":
+        if transcripts_path is None:
+            raise ValueError("--ann_mode mane nécessite --transcripts")
+        transcripts = load_transcripts(transcripts_path)
+        print(f"[INFO] {len(transcripts)} transcrits retenus depuis {transcripts_path}")
+    options = dict(ann_mode=ann_mode, transcripts=transcripts, annotation=annotation)
+
+    with open(tsv_path, "w", newline="") as tsvfile:
+        if first_line is None:
+            print(f"Aucun variant dans {vcf_path}")
+            return
 
-            # ligne variant
-            fields = line.strip().split("\t")
-            base_values = fields[:8]
-            info_field = base_values[7]
-
-            info_dict = parse_info_field(info_field)
-
-            # On récupère les annotations ANN
-            ann_list = parse_ann_field(info_dict.get("ANN", ""))
-
-            # Au premier variant, on construit le header complet
-            if writer is None:
-                # Colonnes INFO à ajouter (hors ANN)
-                info_keys = sorted(k for k in info_dict.keys() if k != "ANN")
-
-                # Colonnes ANN (fixées ici d'après doc SnpEff)
-                ann_columns = [
-                    "Allele", "Annotation", "Annotation_Impact", "Gene_Name", "Gene_ID",
-                    "Feature_Type", "Feature_ID", "Transcript_BioType", "Rank",
-                    "HGVS.c", "HGVS.p", "cDNA.pos/cDNA.length", "CDS.pos/CDS.length",
-                    "AA.pos/AA.length", "Distance", "ERRORS/WARNINGS/INFO"
-                ]
-
-                # Header final
-                full_header = base_cols[:-1] + info_keys + ann_columns
-                writer = csv.DictWriter(tsvfile, fieldnames=full_header, delimiter="\t", extrasaction="ignore")
-                writer.writeheader()
-
-            # Construction du dict ligne
-            row = dict(zip(base_cols[:-1], base_values[:-1]))
-
-            # Ajouter les infos hors ANN
-            for k in info_keys:
-                row[k] = info_dict.get(k, "")
-
-            # Prendre la première annotation ANN seulement (si plusieurs, tu peux modifier pour toutes)
-            if ann_list:
-                ann_first = ann_list[0]
-                # On complète avec la taille de ann_columns, certains champs peuvent manquer
-                for i, col in enumerate(ann_columns):
-                    row[col] = ann_first[i] if i < len(ann_first) else ""
+        # Colonnes INFO à ajouter (hors ANN) :
+        # - header : déclarations ##INFO de l'en-tête
+        # - scan   : union des clés de tout le fichier (une passe légère)
+        # - first  : clés du premier variant (ancien comportement)
+        # - auto   : union des déclarations de l'en-tête et du scan (clés non déclarées signalées)
+        with telemetry.step(f"info_schema_{info_schema}"):
+            if info_schema == "header":
+                keys = set(header_info_keys)
+            elif info_schema in ("scan", "auto"):
+                keys = scan_info_keys(vcf_path)
+                undeclared = sorted(keys - set(header_info_keys) - {"ANN"})
+                if info_schema == "auto":
+                    keys |= set(header_info_keys)
+                    if header_info_keys and undeclared:
+                        print(f"[WARNING] Clés INFO absentes des déclarations ##INFO de l'en-tête : {', '.join(undeclared)}")
             else:
-                for col in ann_columns:
-                    row[col] = ""
+                keys = set(parse_info_field(first_line.strip().split("\t")[7]).keys())
+        info_keys = sorted(k for k in keys if k != "ANN")
 
-            writer.writerow(row)
+        # Header final
+        full_header = base_cols[:-1] + info_keys + ANN_COLUMNS
+        csv.writer(tsvfile, delimiter="\t", lineterminator="\r\n").writerow(full_header)
+
+        gz = is_gzipped(vcf_path)
+        blocks = load_block_index(vcf_path) if gz and threads > 1 else None
+        with telemetry.step("parse_variants") as step:
+            # Lignes TSV écrites (une par annotation retenue) et compteurs de chaque lot, quel que soit le mode
+            step.rows_out = 0
+            stats = Counter()
+
+            def write_block(result):
+                block, block_stats = result
+                tsvfile.write(block)
+                stats.update(block_stats)
+                step.rows_out += block.count("\n")
+
+            if threads <= 1:
+                for batch in iter_line_batches(vcf_path):
+                    write_block(format_lines(batch, base_cols, info_keys, **options))
+            elif blocks is not None:
+                # bgzip indexé : chaque worker décompresse et formate ses blocs
+                worker = partial(format_bgzf_block, vcf_path=vcf_path, base_cols=base_cols,
+                                 info_keys=info_keys, **options)
+                with Pool(threads) as pool:
+                    for result in pool.imap(worker, blocks):
+                        write_block(result)
+            elif gz:
+                # gzip/bgzip : décompression dans le processus principal, parsing dans les workers
+                worker = partial(format_lines, base_cols=base_cols, info_keys=info_keys, **options)
+                with Pool(threads) as pool:
+                    for result in pool.imap(worker, iter_line_batches(vcf_path)):
+                        write_block(result)
+            else:
+                # Texte brut : chaque worker lit directement sa plage d'octets
+                ranges = split_byte_ranges(data_offset, os.path.getsize(vcf_path), threads * 4)
+                worker = partial(format_byte_range, vcf_path=vcf_path, base_cols=base_cols,
+                                 info_keys=info_keys, **options)
+                with Pool(threads) as pool:
+                    for result in pool.imap(worker, ranges):
+                        write_block(result)
+            step.rows_in = stats["variants"]
+        telemetry.rows_in, telemetry.rows_out = step.rows_in, step.rows_out
+        if ann_mode == "mane":
+            print(f"[INFO] {stats['no_mane']} variants sans transcrit MANE écartés (--ann_mode mane)")
 
     print(f"Extraction terminée, résultat dans {tsv_path}")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python vcf_to_tsv.py input.vcf output.tsv")
-        sys.exit(1)
-    main(sys.argv[1], sys.argv[2])
-
+    parser = argparse.ArgumentParser(description="Conversion d'un VCF annoté SnpEff (texte, gzip ou bgzip) en TSV")
+    parser.add_argument("vcf", help="VCF annoté par SnpEff (.vcf, .vcf.gz)")
+    parser.add_argument("tsv", help="Fichier TSV (ou .parquet) de sortie")
+    parser.add_argument("--threads", type=int, default=1, help="Nombre de processus de parsing")
+    parser.add_argument("--ann_mode", choices=["first", "all", "mane"], default="first",
+                        help="Annotations ANN émises : première, toutes, ou transcrits MANE/canoniques")
+    parser.add_argument("--transcripts", default=None,
+                        help="FASTA MANE ou liste d'ENST (un par ligne) pour --ann_mode mane")
+    parser.add_argument("--annotation", default=None,
+                        help="Ne garder que ce type d'annotation (ex. missense_variant)")
+    parser.add_argument("--info_schema", choices=["auto", "header", "scan", "first"], default="auto",
+                        help="Découverte des colonnes INFO (auto : en-tête + scan des variants)")
+    args = parser.parse_args()
+    main(args.vcf, args.tsv, args.threads, args.ann_mode, args.transcripts, args.annotation, args.info_schema)
@@ -1,42 +1,248 @@
-import pandas as pd
+## usage : python 03_cosmic.py --cosmic Cosmic_MutantCensus_v102_GRCh38.tsv --input gbm.ann.tsv --output cosmic_somatic.tsv
+## Recherche dans un index SQLite par release (cosmic_cache/) : clés normalisées (chromosome sans préfixe 'chr',
+## position entière), colonnes Cosmic écrites telles que lues dans le census (GENOME_START flottant) ;
+## la sortie est celle de la jointure pandas (--no_index), qui elle exige des noms de chromosome identiques.
 
-# Lecture du fichier Cosmic
-cosmic = pd.read_csv("Cosmic_MutantCensus_v102_GRCh38.tsv", sep="\t", low_memory=False)
+import argparse
+import os
+import re
+import sqlite3
+import pandas as pd
+from table_io import read_table, write_table
+from telemetry import Telemetry
 
-# Sélection des colonnes
-cosmic = cosmic[[
+# Colonnes Cosmic utiles pour l'annotation
+COSMIC_COLS = [
     "CHROMOSOME", "GENOME_START", "GENOMIC_WT_ALLELE", "GENOMIC_MUT_ALLELE",
     "MUTATION_DESCRIPTION", "MUTATION_SOMATIC_STATUS", "LEGACY_MUTATION_ID",
     "MUTATION_AA", "MUTATION_CDS"
-]]
-
-# Filtrage des mutations d'intérêt
-cosmic = cosmic[
-    (cosmic["MUTATION_DESCRIPTION"] == "missense_variant") &
-    (cosmic["MUTATION_SOMATIC_STATUS"] == "Confirmed somatic variant")
 ]
 
-# Lecture du fichier d'annotation
-data = pd.read_csv("gbm.ann.tsv", sep="\t")
+# Types explicites : évite la ré-inférence (et les types mixtes) chunk par chunk
+COSMIC_DTYPES = {col: str for col in COSMIC_COLS}
+COSMIC_DTYPES["GENOME_START"] = "float64"
+
+# Version du schéma de l'index SQLite (PRAGMA user_version) : un index d'une autre version est reconstruit
+COSMIC_INDEX_VERSION = 2
+
+
+def cosmic_release(cosmic_path):
+    """Déduit la version Cosmic (ex. 'v102') du nom de fichier."""
+    match = re.search(r"_(v\d+)_", os.path.basename(cosmic_path))
+    return match.group(1) if match else "unknown"
+
+
+def filter_cosmic(cosmic):
+    """Garde les missense confirmés somatiques."""
+    return cosmic[
+        (cosmic["MUTATION_DESCRIPTION"] == "missense_variant") &
+        (cosmic["MUTATION_SOMATIC_STATUS"] == "Confirmed somatic variant")
+    ]
+
+
+def stream_cosmic(cosmic_path, chunksize=500_000):
+    """Lecture par chunks : seules les colonnes utiles sont lues, le filtre est appliqué à la volée."""
+    chunks = []
+    reader = pd.read_csv(
+        cosmic_path, sep="\t", usecols=COSMIC_COLS, dtype=COSMIC_DTYPES, chunksize=chunksize
+    )
+    for chunk in reader:
+        chunks.append(filter_cosmic(chunk))
+    if not chunks:
+        return pd.DataFrame(columns=COSMIC_COLS)
+    return pd.concat(chunks, ignore_index=True)[COSMIC_COLS]
+
+
+def cached_snapshot_path(cosmic_path, cache_dir):
+    release = cosmic_release(cosmic_path)
+    stem = os.path.splitext(os.path.basename(cosmic_path))[0]
+    return os.path.join(cache_dir, f"{stem}.{release}.missense_somatic.parquet")
+
+
+def load_cosmic(cosmic_path, cache_dir="cosmic_cache", chunksize=500_000, use_cache=True):
+    """
+    Charge le Cosmic filtré. Si un snapshot Parquet de la même version existe
+    (et n'est pas plus ancien que le TSV source), il est relu directement.
+    """
+    if not use_cache:
+        return stream_cosmic(cosmic_path, chunksize)
+
+    snapshot = cached_snapshot_path(cosmic_path, cache_dir)
+    if os.path.exists(snapshot) and os.path.getmtime(snapshot) >= os.path.getmtime(cosmic_path):
+        print(f"[INFO] Snapshot Cosmic réutilisé : {snapshot}")
+        return pd.read_parquet(snapshot)
+
+    print(f"[INFO] Lecture en streaming de {cosmic_path} (release {cosmic_release(cosmic_path)})...")
+    cosmic = stream_cosmic(cosmic_path, chunksize)
+    os.makedirs(cache_dir, exist_ok=True)
+    cosmic.to_parquet(snapshot, index=False)
+    print(f"[INFO] Snapshot Cosmic écrit : {snapshot} ({len(cosmic)} mutations)")
+    return cosmic
+
+
+def normalise_keys(chrom, pos):
+    """Normalise les clés génomiques : chromosome sans préfixe 'chr', position entière."""
+    chrom = chrom.astype(str).str.replace(r"^chr", "", regex=True)
+    pos = pd.to_numeric(pos, errors="coerce").astype("Int64")
+    return chrom, pos
+
+
+def cosmic_index_path(cosmic_path, cache_dir):
+    release = cosmic_release(cosmic_path)
+    stem = os.path.splitext(os.path.basename(cosmic_path))[0]
+    return os.path.join(cache_dir, f"{stem}.{release}.index.sqlite")
+
+
+def fill_cosmic_index(cosmic, con):
+    """
+    Écrit le Cosmic filtré dans une table SQLite : colonnes telles que lues dans le census
+    (sortie identique à --no_index) et clés normalisées _chrom, _pos indexées avec les allèles.
+    Retourne le nombre de mutations.
+    """
+    cosmic = cosmic[COSMIC_COLS].copy()
+    cosmic["_chrom"], cosmic["_pos"] = normalise_keys(cosmic["CHROMOSOME"], cosmic["GENOME_START"])
+    cosmic = cosmic.dropna(subset=["_pos"])
+    cosmic["_pos"] = cosmic["_pos"].astype("int64")
+    cosmic.to_sql("cosmic", con, index=False)
+    con.execute("CREATE INDEX idx_cosmic_key ON cosmic (_chrom, _pos, GENOMIC_WT_ALLELE, GENOMIC_MUT_ALLELE)")
+    con.execute(f"PRAGMA user_version = {COSMIC_INDEX_VERSION}")
+    con.commit()
+    return len(cosmic)
+
+
+def build_cosmic_index(cosmic, index_path):
+    """Index Cosmic persistant : écriture dans un fichier temporaire puis remplacement atomique."""
+    tmp_path = index_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    con = sqlite3.connect(tmp_path)
+    try:
+        n = fill_cosmic_index(cosmic, con)
+    finally:
+        con.close()
+    os.replace(tmp_path, index_path)
+    print(f"[INFO] Index Cosmic écrit : {index_path} ({n} mutations)")
+
+
+def index_version(index_path):
+    con = sqlite3.connect(index_path)
+    try:
+        return con.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        con.close()
+
+
+def open_cosmic_index(cosmic_path, cache_dir="cosmic_cache", chunksize=500_000, use_cache=True):
+    """
+    Ouvre l'index Cosmic de la release, en le (re)construisant si absent ou périmé.
+    Sans cache : index construit en mémoire, ni snapshot ni index écrits dans `cache_dir`.
+    """
+    if not use_cache:
+        con = sqlite3.connect(":memory:")
+        n = fill_cosmic_index(stream_cosmic(cosmic_path, chunksize), con)
+        print(f"[INFO] Index Cosmic en mémoire ({n} mutations, --no_cache)")
+        return con
+    index_path = cosmic_index_path(cosmic_path, cache_dir)
+    if not (os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(cosmic_path)
+            and index_version(index_path) == COSMIC_INDEX_VERSION):
+        cosmic = load_cosmic(cosmic_path, cache_dir, chunksize)
+        os.makedirs(cache_dir, exist_ok=True)
+        build_cosmic_index(cosmic, index_path)
+    else:
+        print(f"[INFO] Index Cosmic réutilisé : {index_path}")
+    return sqlite3.connect(index_path)
+
+
+def lookup_cosmic(data, con):
+    """
+    Annote les variants par jointure dans l'index : clés uniques de `data` chargées dans une
+    table temporaire, une seule requête, correspondances dans l'ordre du census ; puis
+    rattachement aux lignes de `data` (même ordre et mêmes colonnes qu'avec --no_index).
+    """
+    key_cols = ["_chrom", "_pos", "REF", "ALT"]
+    data = data.copy()
+    data["_chrom"], data["_pos"] = normalise_keys(data["CHROM"], data["POS"])
+    data = data.dropna(subset=["_pos"])
+
+    keys = data[key_cols].drop_duplicates().astype({"_pos": "int64", "REF": str, "ALT": str})
+    con.execute("CREATE TEMP TABLE lookup_keys (_chrom TEXT, _pos INTEGER, REF TEXT, ALT TEXT)")
+    con.executemany("INSERT INTO lookup_keys VALUES (?, ?, ?, ?)",
+                    zip(keys["_chrom"], keys["_pos"].tolist(), keys["REF"], keys["ALT"]))
+    hits_df = pd.read_sql(
+        f"SELECT k._chrom, k._pos, k.REF, k.ALT, {', '.join('c.' + c for c in COSMIC_COLS)} "
+        "FROM lookup_keys k JOIN cosmic c ON c._chrom = k._chrom AND c._pos = k._pos "
+        "AND c.GENOMIC_WT_ALLELE = k.REF AND c.GENOMIC_MUT_ALLELE = k.ALT ORDER BY c.rowid",
+        con,
+    )
+    con.execute("DROP TABLE lookup_keys")
+    hits_df = hits_df.astype({"_pos": "Int64", "GENOME_START": "float64"})
+    merged = data.merge(hits_df, on=key_cols, how="inner")
+    return merged.drop(columns=["_chrom", "_pos"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Annotation des variants missense avec Cosmic (somatiques confirmés)")
+    parser.add_argument("--cosmic", default="Cosmic_MutantCensus_v102_GRCh38.tsv", help="Fichier Cosmic Mutant Census (TSV)")
+    parser.add_argument("--input", default="gbm.ann.tsv", help="Fichier TSV annoté par SnpEff")
+    parser.add_argument("--output", default="cosmic_somatic.tsv", help="Fichier TSV (ou .parquet) de sortie")
+    parser.add_argument("--tsv_export", action="store_true", help="Copie TSV en plus d'une sortie Parquet")
+    parser.add_argument("--cache_dir", default="cosmic_cache", help="Répertoire des snapshots Cosmic pré-filtrés")
+    parser.add_argument("--chunksize", type=int, default=500_000, help="Nombre de lignes Cosmic lues par chunk")
+    parser.add_argument("--no_cache", action="store_true", help="Ne pas lire/écrire de snapshot ni d'index Cosmic")
+    parser.add_argument("--no_index", action="store_true", help="Jointure pandas complète au lieu de l'index SQLite")
+    args = parser.parse_args()
+    telemetry = Telemetry("03")
+
+    # Lecture du fichier d'annotation
+    with telemetry.step("read_input") as step:
+        data = read_table(args.input)
+        step.rows_out = telemetry.rows_in = len(data)
+
+    # Filtrer sur les missense variants
+    data = data[data["Annotation"] == "missense_variant"]
+
+    # Supprimer les colonnes inutiles si elles existent
+    cols_to_drop = ["Distance", "ERRORS/WARNINGS/INFO"]
+    data = data.drop(columns=[col for col in cols_to_drop if col in data.columns])
+
+    if args.no_index:
+        # Lecture du fichier Cosmic (colonnes utiles + filtrage des mutations d'intérêt)
+        with telemetry.step("load_cosmic") as step:
+            cosmic = load_cosmic(args.cosmic, args.cache_dir, args.chunksize, use_cache=not args.no_cache)
+            step.rows_out = len(cosmic)
 
-# Filtrer sur les missense variants
-data = data[data["Annotation"] == "missense_variant"]
+        # CHROMOSOME est lu en texte côté Cosmic : aligner le type de CHROM
+        data["CHROM"] = data["CHROM"].astype(str)
 
-# Supprimer les colonnes inutiles si elles existent
-cols_to_drop = ["Distance", "ERRORS/WARNINGS/INFO"]
-data = data.drop(columns=[col for col in cols_to_drop if col in data.columns])
+        # Fusionner avec Cosmic sur les clés génomiques
+        with telemetry.step("merge", rows_in=len(data)) as step:
+            merged = pd.merge(
+                data, cosmic,
+                how="inner",
+                left_on=["CHROM", "POS", "REF", "ALT"],
+                right_on=["CHROMOSOME", "GENOME_START", "GENOMIC_WT_ALLELE", "GENOMIC_MUT_ALLELE"]
+            )
+            step.rows_out = len(merged)
+    else:
+        # Recherche ponctuelle dans l'index persistant (construit une fois par release)
+        with telemetry.step("open_index"):
+            con = open_cosmic_index(args.cosmic, args.cache_dir, args.chunksize, use_cache=not args.no_cache)
+        try:
+            with telemetry.step("index_lookup", rows_in=len(data)) as step:
+                merged = lookup_cosmic(data, con)
+                step.rows_out = len(merged)
+        finally:
+            con.close()
 
-# Fusionner avec Cosmic sur les clés génomiques
-merged = pd.merge(
-    data, cosmic,
-    how="inner",
-    left_on=["CHROM", "POS", "REF", "ALT"],
-    right_on=["CHROMOSOME", "GENOME_START", "GENOMIC_WT_ALLELE", "GENOMIC_MUT_ALLELE"]
-)
+    # Éliminer les doublons
+    merged = merged.drop_duplicates()
 
-# Éliminer les doublons
-merged = merged.drop_duplicates()
+    # Exporter le résultat
+    with telemetry.step("write_output", rows_in=len(merged)):
+        write_table(merged, args.output, args.tsv_export)
+    telemetry.rows_out = len(merged)
+    print(f"✅ {len(merged)} variants annotés Cosmic écrits dans {args.output}")
 
-# Exporter le résultat
-merged.to_csv("cosmic_somatic.tsv", sep="\t", index=False)
 
+if __name__ == "__main__":
+    main()
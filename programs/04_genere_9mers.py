@@ -1,11 +1,27 @@
 ## python 04_genere_9mers.py --input cosmic_somatic.tsv  --cds_fasta MANE.GRCh38.v1.2.ensembl_protein.faa   --output peptides_9mer.tsv
+## longueurs variables + déduplication : --lengths 8,9,10,11 --unique_output peptides_unique.tsv
+## sortie normalisée : ajouter --normalised (peptides -> Mutation_ID, mutations dans --mutations_output)
+## avec protéome indexé : ajouter --proteome MANE.proteome (construit au premier appel si absent)
+## autres classes HGVS.p : --classes all (indels en phase, delins, frameshift, stop-loss ; colonne Mutation_Class)
+##   nouveau cadre des frameshifts traduit depuis le CDS : --cds_nt Homo_sapiens.GRCh38.cds.all.fa (+ colonne HGVS.c)
+## changement par rapport au script d'origine (lecture du préfixe p.Xxx<pos>Yyy comme missense) : p.Arg123Ter
+##   est un nonsense, p.Arg97ProfsTer23 un frameshift et p.Arg123Arg un synonyme ; ils ne produisent plus
+##   de 9-mers "missense" (fenêtres avec '*', résidu du nouveau cadre seul ou peptide identique au WT)
 
 
 
+import numpy as np
 import pandas as pd
 from Bio import SeqIO
+from Bio.Seq import Seq
 import argparse
+import os
 import re
+from itertools import repeat
+from delta import SEQUENCE_ID_COLUMNS, sequence_id
+from proteome_store import iter_fasta, open_store
+from table_io import read_table, write_table
+from telemetry import Telemetry
 
 def parse_protein_fasta(fasta_path):
     tx2seq = {}
@@ -17,76 +33,397 @@ def parse_protein_fasta(fasta_path):
             tx2seq[tx_id] = str(rec.seq)
     return tx2seq
 
-def extract_pos_and_aa(hgvs_p):
-    match = re.match(r"p\.([A-Za-z]{3})(\d+)([A-Za-z]{3})", hgvs_p)
-    aa_3to1 = {
-        'Ala':'A','Arg':'R','Asn':'N','Asp':'D','Cys':'C','Gln':'Q','Glu':'E','Gly':'G','His':'H','Ile':'I',
-        'Leu':'L','Lys':'K','Met':'M','Phe':'F','Pro':'P','Ser':'S','Thr':'T','Trp':'W','Tyr':'Y','Val':'V',
-        'Ter':'*'
-    }
-    if not match:
-        return None, None
-    pos = int(match.group(2))
-    mut_aa = aa_3to1.get(match.group(3), None)
-    return pos, mut_aa
-
-def generate_9mers_sliding(seq, pos1, mut_aa):
-    peptides = []
-    for offset in range(9):
-        start = pos1 - (offset + 1)
-        end = start + 9
-        if start < 0 or end > len(seq):
+AA_3TO1 = {
+    'Ala':'A','Arg':'R','Asn':'N','Asp':'D','Cys':'C','Gln':'Q','Glu':'E','Gly':'G','His':'H','Ile':'I',
+    'Leu':'L','Lys':'K','Met':'M','Phe':'F','Pro':'P','Ser':'S','Thr':'T','Trp':'W','Tyr':'Y','Val':'V',
+    'Ter':'*'
+}
+
+PEPTIDE_LENGTH = 9
+
+# Colonnes de la mutation recopiées dans la table des sources (04 --unique_output)
+SOURCE_COLUMNS = ["Transcript_ID", "Gene_Name", "CHROM", "POS", "REF", "ALT"]
+
+def parse_lengths(text):
+    """'8,9,10,11' -> [8, 9, 10, 11]"""
+    return sorted({int(x) for x in str(text).split(",") if x.strip()})
+
+# HGVS.p (notation 3 lettres, '*' accepté pour Ter) : une seule expression pour toutes les classes
+#   p.Arg123Gly  p.Arg123Ter  p.Lys23del  p.Lys23_Val25del  p.Lys23dup  p.Lys23_Leu24insArgSer
+#   p.Cys28delinsTrpVal  p.Arg97ProfsTer23  p.Arg97fs  p.Ter110GlnextTer17
+AA_TOKEN = r"(?:[A-Z][a-z]{2}|\*)"
+HGVS_P_PATTERN = re.compile(
+    rf"^p\.\(?(?P<ref>{AA_TOKEN})(?P<start>\d+)(?:_(?P<ref_end>{AA_TOKEN})(?P<end>\d+))?"
+    rf"(?P<op>delins|del|dup|ins)?(?P<alt>(?:{AA_TOKEN})*?)(?P<shift>fs|ext)?"
+    rf"(?:(?:Ter|\*)(?P<new_stop>\d+|\?))?\)?$"
+)
+HGVS_C_PATTERN = re.compile(r"^c\.(?P<start>\d+)(?:_(?P<end>\d+))?(?P<op>delins|del|dup|ins)(?P<seq>[ACGTNacgtn]*)$")
+AA_CODES = {**AA_3TO1, "*": "*"}
+INFRAME_CLASSES = ["deletion", "insertion", "duplication", "delins"]
+PEPTIDE_CLASSES = ["missense", *INFRAME_CLASSES, "frameshift", "stop_loss"]
+
+def parse_classes(text):
+    """'missense,inframe' -> classes de mutations retenues ('inframe' et 'all' sont des raccourcis)."""
+    classes = []
+    for name in str(text).split(","):
+        name = name.strip()
+        if name == "all":
+            classes += PEPTIDE_CLASSES
+        elif name == "inframe":
+            classes += INFRAME_CLASSES
+        elif name in PEPTIDE_CLASSES:
+            classes.append(name)
+        elif name:
+            raise argparse.ArgumentTypeError(f"classe inconnue : {name} (choix : {', '.join(PEPTIDE_CLASSES)}, inframe, all)")
+    return [c for c in PEPTIDE_CLASSES if c in classes]
+
+def decode_hgvs_p(hgvs_p):
+    """
+    Décode HGVS.p pour toute la colonne (un seul str.extract) :
+    Mutation_Class, pos / end (1-based, end = pos pour un seul résidu), ref_aa, alt (résidus
+    insérés ou nouveaux, 1 lettre), mut_aa (missense), new_stop (position du Ter du nouveau cadre).
+    Classes : missense, synonymous, nonsense, deletion, insertion, duplication, delins,
+    frameshift, stop_loss ; NaN si la notation n'est pas reconnue.
+    """
+    parts = hgvs_p.astype(str).str.extract(HGVS_P_PATTERN)
+    ref = parts["ref"].map(AA_CODES)
+    alt = parts["alt"].fillna("").str.replace(AA_TOKEN, lambda m: AA_CODES.get(m.group(0), "?"), regex=True)
+    op = parts["op"].fillna("")
+    shift = parts["shift"].fillna("")
+    pos = pd.to_numeric(parts["start"], errors="coerce")
+    end = pd.to_numeric(parts["end"], errors="coerce").fillna(pos)
+    plain = (op == "") & (shift == "") & (alt.str.len() == 1)
+
+    mutation_class = pd.Series(np.select(
+        [
+            shift == "fs", shift == "ext",
+            (op == "del") & (alt == ""), (op == "dup") & (alt == ""),
+            (op == "ins") & (alt != "") & (end == pos + 1), (op == "delins") & (alt != ""),
+            plain & (alt == "*"), plain & (alt == ref), plain,
+        ],
+        ["frameshift", "stop_loss", "deletion", "duplication", "insertion", "delins",
+         "nonsense", "synonymous", "missense"],
+        default="",
+    ), index=hgvs_p.index)
+    unknown = (mutation_class == "") | ref.isna() | alt.str.contains("?", regex=False) | (end < pos)
+    mutation_class = mutation_class.mask(unknown)
+
+    return pd.DataFrame({
+        "Mutation_Class": mutation_class,
+        "pos": pos,
+        "end": end,
+        "ref_aa": ref,
+        "alt": alt,
+        "mut_aa": alt.where(mutation_class == "missense"),
+        "new_stop": pd.to_numeric(parts["new_stop"], errors="coerce"),
+    }, index=hgvs_p.index)
+
+def decode_hgvs_c(hgvs_c):
+    """Décode HGVS.c (del / ins / dup / delins codants) : c_start, c_end, c_op, c_seq."""
+    parts = hgvs_c.astype(str).str.extract(HGVS_C_PATTERN)
+    start = pd.to_numeric(parts["start"], errors="coerce")
+    return pd.DataFrame({
+        "c_start": start,
+        "c_end": pd.to_numeric(parts["end"], errors="coerce").fillna(start),
+        "c_op": parts["op"],
+        "c_seq": parts["seq"].fillna("").str.upper(),
+    }, index=hgvs_c.index)
+
+def parse_cds_fasta(fasta_path, transcripts=None):
+    """FASTA nucléotidique des CDS (ex. Ensembl cds.all.fa) -> {ENST sans version: séquence}."""
+    tx2cds = {}
+    for desc, seq in iter_fasta(fasta_path):
+        match = re.match(r"(ENST[0-9]+)", desc)
+        if match and (transcripts is None or match.group(1) in transcripts):
+            tx2cds[match.group(1)] = seq.upper()
+    return tx2cds
+
+def frameshift_residues(cds, c_start, c_end, c_op, c_seq, pos):
+    """
+    Applique l'édition HGVS.c au CDS et traduit le nouveau cadre depuis le codon `pos`
+    jusqu'au premier stop (ou la fin du CDS). None si l'édition est incohérente avec le CDS.
+    """
+    a, b = int(c_start), int(c_end)
+    if b > len(cds) or a < 1 or b < a:
+        return None
+    if c_op == "del":
+        mutant = cds[:a - 1] + cds[b:]
+    elif c_op == "dup":
+        mutant = cds[:b] + cds[a - 1:b] + cds[b:]
+    elif c_op == "ins":
+        mutant = cds[:a] + c_seq + cds[a:]
+    else:
+        mutant = cds[:a - 1] + c_seq + cds[b:]
+    tail = mutant[3 * (pos - 1):]
+    return str(Seq(tail[:len(tail) // 3 * 3]).translate(to_stop=True))
+
+def altered_region(mutation, seq, cds_dict=None):
+    """
+    Région modifiée d'une mutation non missense sur la protéine de référence :
+    (début 0-based, fin exclusive des résidus remplacés, résidus nouveaux, suite inconnue).
+    Frameshift : nouveau cadre traduit depuis le CDS si disponible, sinon seul le premier
+    résidu annoté ; stop-loss : seul le premier résidu de l'extension (3'UTR non lu).
+    """
+    cls, pos, end, alt = mutation.Mutation_Class, int(mutation.pos), int(mutation.end), mutation.alt
+    if end > len(seq) + (cls == "stop_loss"):
+        return None
+    if cls == "deletion":
+        return pos - 1, end, "", False
+    if cls == "duplication":
+        return end, end, seq[pos - 1:end], False
+    if cls == "insertion":
+        return pos, pos, alt, False
+    if cls == "delins":
+        return pos - 1, end, alt, False
+    if cls == "frameshift":
+        cds = (cds_dict or {}).get(mutation.Transcript_ID)
+        if cds is not None and pd.notna(getattr(mutation, "c_op", None)):
+            translated = frameshift_residues(cds, mutation.c_start, mutation.c_end, mutation.c_op, mutation.c_seq, pos)
+            # Le premier résidu traduit doit être celui de l'annotation (même version du transcrit)
+            if translated and (not alt or translated[0] == alt[0]):
+                alt = translated
+        return (pos - 1, pos - 1, alt, True) if alt else None
+    if cls == "stop_loss":
+        return pos - 1, pos - 1, alt, True
+    return None
+
+def generate_variant_kmers(mutations, protein_dict, k=PEPTIDE_LENGTH, cds_dict=None):
+    """
+    Fenêtres k-mer des mutations non missense (indels en phase, delins, frameshift, stop-loss).
+    Chaque fenêtre chevauche au moins un résidu nouveau (ou la jonction d'une délétion) ;
+    WT_9mer est la fenêtre de référence de même début (NA si elle dépasse la fin de la protéine :
+    stop-loss, frameshift), Mutant_AA_Position_in_9mer le premier résidu modifié. Les fenêtres présentes dans la protéine de référence (indel dans une
+    répétition, début d'une duplication) sont ignorées.
+    """
+    columns = ["Mutation_ID", "Mutant_AA_Position_in_9mer", "WT_9mer", "MUT_9mer"]
+    records = []
+    for mutation in mutations.itertuples(index=False):
+        seq = protein_dict[mutation.Transcript_ID]
+        region = altered_region(mutation, seq, cds_dict)
+        if region is None:
             continue
-        wt = seq[start:end]
-        mut = list(wt)
-        mut[offset] = mut_aa
-        peptides.append((offset + 1, wt, ''.join(mut)))
-    return peptides
+        start, stop, alt, open_end = region
+        left = seq[max(0, start - k + 1):start]
+        local = left + alt + ("" if open_end else seq[stop:stop + k - 1])
+        flank = len(left)
+        origin = start - flank
+        for w in range(max(0, flank - k + 1), min(flank + len(alt) - 1, len(local) - k) + 1):
+            mut = local[w:w + k]
+            if mut in seq:
+                continue
+            wt = seq[origin + w:origin + w + k]
+            records.append((mutation.Mutation_ID, max(flank - w, 0) + 1, wt if len(wt) == k else None, mut))
+    return pd.DataFrame.from_records(records, columns=columns)
+
+def generate_kmers_batch(mutations, protein_dict, k=PEPTIDE_LENGTH):
+    """
+    Génère les fenêtres k-mer de toutes les mutations en une fois.
+    `mutations` : DataFrame avec Mutation_ID, Transcript_ID, pos, mut_aa.
+    Retourne la table peptides (Mutation_ID, Mutant_AA_Position_in_9mer, WT_9mer, MUT_9mer) ;
+    les noms de colonnes historiques sont gardés quelle que soit la longueur k.
+    """
+    span = 2 * k - 1
+    columns = ["Mutation_ID", "Mutant_AA_Position_in_9mer", "WT_9mer", "MUT_9mer"]
+    if mutations.empty:
+        return pd.DataFrame(columns=columns)
+
+    pos = mutations["pos"].to_numpy(dtype=np.int64)
+    lengths = np.empty(len(mutations), dtype=np.int64)
+
+    # Une seule extraction de région (2k-1 résidus) par mutation, complétée par '-' hors séquence
+    regions = []
+    for i, (tx_id, p) in enumerate(zip(mutations["Transcript_ID"], pos)):
+        seq = protein_dict[tx_id]
+        lengths[i] = len(seq)
+        r0 = p - k
+        left = max(0, -r0)
+        chunk = seq[max(0, r0):max(0, min(len(seq), r0 + span))]
+        regions.append(("-" * left + chunk).ljust(span, "-"))
+    region_mat = np.frombuffer("".join(regions).encode("ascii"), dtype="S1").reshape(-1, span)
+
+    # Fenêtre `offset` (0-based) : début à pos - 1 - offset, soit colonne k - 1 - offset de la région
+    offsets = np.arange(k)
+    windows = np.lib.stride_tricks.sliding_window_view(region_mat, k, axis=1)[:, ::-1, :]
+    starts = pos[:, None] - 1 - offsets[None, :]
+    valid = (starts >= 0) & (starts + k <= lengths[:, None])
+
+    wt = windows[valid]
+    rows, offs = np.nonzero(valid)
+    mut = wt.copy()
+    mut[np.arange(len(offs)), offs] = mutations["mut_aa"].to_numpy().astype("S1")[rows]
+
+    return pd.DataFrame({
+        "Mutation_ID": mutations["Mutation_ID"].to_numpy()[rows],
+        "Mutant_AA_Position_in_9mer": offs + 1,
+        "WT_9mer": np.ascontiguousarray(wt).view(f"S{k}").ravel().astype(str),
+        "MUT_9mer": np.ascontiguousarray(mut).view(f"S{k}").ravel().astype(str),
+    }, columns=columns)
+
+def generate_class_kmers(mutations, protein_dict, k=PEPTIDE_LENGTH, cds_dict=None):
+    """Fenêtres k-mer par classe : missense vectorisé, autres classes région par région."""
+    if "Mutation_Class" not in mutations.columns:
+        return generate_kmers_batch(mutations, protein_dict, k)
+    missense = mutations["Mutation_Class"] == "missense"
+    tables = [
+        generate_kmers_batch(mutations[missense], protein_dict, k).assign(Mutation_Class="missense"),
+        generate_variant_kmers(mutations[~missense], protein_dict, k, cds_dict).merge(
+            mutations[["Mutation_ID", "Mutation_Class"]], on="Mutation_ID", how="left"),
+    ]
+    peptides = pd.concat(tables, ignore_index=True)
+    return peptides.sort_values(["Mutation_ID", "Mutant_AA_Position_in_9mer"], kind="stable").reset_index(drop=True)
+
+def generate_peptides_batch(mutations, protein_dict, lengths=(PEPTIDE_LENGTH,), cds_dict=None):
+    """
+    Fenêtres de toutes les longueurs demandées ; ajoute Peptide_Length hors mode 9-mer seul
+    et Mutation_Class si `mutations` en porte une (classes autres que missense demandées).
+    """
+    if list(lengths) == [PEPTIDE_LENGTH]:
+        return generate_class_kmers(mutations, protein_dict, PEPTIDE_LENGTH, cds_dict)
+    tables = [
+        generate_class_kmers(mutations, protein_dict, k, cds_dict).assign(Peptide_Length=k)
+        for k in lengths
+    ]
+    peptides = pd.concat(tables, ignore_index=True)
+    # Ordre : par mutation, puis longueur, puis position
+    return peptides.sort_values(
+        ["Mutation_ID", "Peptide_Length", "Mutant_AA_Position_in_9mer"], kind="stable"
+    ).reset_index(drop=True)
+
+def deduplicate_peptides(peptides, mutations):
+    """
+    Regroupe les peptides mutés identiques (toutes mutations / transcrits confondus).
+    Retourne (table unique Peptide_ID -> séquence, table de correspondance peptide -> sources) ;
+    chaque source porte le variant (Gene_Name, CHROM, POS, REF, ALT) et l'identifiant Sequence_ID
+    de la fenêtre tel que l'écrit 05, que 06 --peptide_sources substitue au Peptide_ID.
+    """
+    columns = ["Mutation_ID"] + [c for c in SOURCE_COLUMNS if c in mutations.columns]
+    sources = peptides.merge(mutations[columns], on="Mutation_ID", how="left")
+    sources = sources[sources["MUT_9mer"].str.len() > 0].reset_index(drop=True)
+    sources["Sequence_ID"] = [
+        sequence_id(*values)
+        for values in zip(*(sources[c] if c in sources.columns else repeat(d, len(sources)) for c, d in SEQUENCE_ID_COLUMNS))
+    ]
+    codes, uniques = pd.factorize(sources["MUT_9mer"], sort=True)
+    sources.insert(0, "Peptide_ID", [f"PEP{c:07d}" for c in codes])
+
+    unique = pd.DataFrame({
+        "Peptide_ID": [f"PEP{c:07d}" for c in range(len(uniques))],
+        "Peptide": uniques,
+    })
+    unique["Peptide_Length"] = unique["Peptide"].str.len()
+    unique["N_Sources"] = np.bincount(codes, minlength=len(uniques))
+    return unique, sources.drop(columns="MUT_9mer").rename(columns={"WT_9mer": "WT_Peptide"})
 
 def main():
     parser = argparse.ArgumentParser(description="Génère 9 peptides 9-mer sliding window avec AA muté")
     parser.add_argument("--input", required=True, help="Fichier TSV avec mutations (cosmic_somatic.tsv)")
-    parser.add_argument("--cds_fasta", required=True, help="FASTA protéique MANE avec annotation transcript")
-    parser.add_argument("--output", required=True, help="Fichier TSV de sortie avec peptides")
+    parser.add_argument("--cds_fasta", default=None, help="FASTA protéique MANE avec annotation transcript")
+    parser.add_argument("--proteome", default=None, help="Préfixe du protéome indexé mmap (voir proteome_store.py)")
+    parser.add_argument("--output", required=True, help="Fichier TSV (ou .parquet) de sortie avec peptides")
+    parser.add_argument("--tsv_export", action="store_true", help="Copie TSV en plus des sorties Parquet")
+    parser.add_argument("--lengths", type=parse_lengths, default=[PEPTIDE_LENGTH],
+                        help="Longueurs de peptides, séparées par des virgules (ex. 8,9,10,11)")
+    parser.add_argument("--unique_output", default=None,
+                        help="Table des peptides mutés uniques (+ <unique_output>.sources.tsv)")
+    parser.add_argument("--normalised", action="store_true",
+                        help="Sortie normalisée : peptides référant aux mutations par Mutation_ID")
+    parser.add_argument("--mutations_output", default=None,
+                        help="Table des mutations en mode --normalised (défaut : <output>.mutations.tsv)")
+    parser.add_argument("--classes", type=parse_classes, default=["missense"],
+                        help="Classes de mutations : missense (défaut), deletion, insertion, duplication, "
+                             "delins, frameshift, stop_loss, ou inframe / all")
+    parser.add_argument("--cds_nt", default=None,
+                        help="FASTA nucléotidique des CDS (ENST...) pour traduire le nouveau cadre des frameshifts")
 
     args = parser.parse_args()
+    if args.cds_fasta is None and args.proteome is None:
+        parser.error("--cds_fasta ou --proteome est requis")
+    telemetry = Telemetry("04")
 
     # Chargement des données mutationnelles
-    df = pd.read_csv(args.input, sep="\t")
+    with telemetry.step("read_input") as step:
+        df = read_table(args.input)
+        step.rows_out = telemetry.rows_in = len(df)
 
     # Renommer les colonnes si nécessaire pour correspondre aux attentes du script
     if "Feature_ID" in df.columns:
         df["Transcript_ID"] = df["Feature_ID"].str.split(".").str[0]
     if "HGVS.p" in df.columns:
         df["HGVS_p"] = df["HGVS.p"]
+    df.insert(0, "Mutation_ID", np.arange(len(df)))
 
-    protein_dict = parse_protein_fasta(args.cds_fasta)
-    all_peptides = []
+    with telemetry.step("fasta_load") as step:
+        if args.proteome is not None:
+            protein_dict = open_store(args.proteome, args.cds_fasta)
+        else:
+            protein_dict = parse_protein_fasta(args.cds_fasta)
+        step.rows_out = len(protein_dict)
 
-    for _, row in df.iterrows():
-        tx_id = row["Transcript_ID"]
-        hgvs_p = str(row["HGVS_p"])
-        if tx_id not in protein_dict or not hgvs_p.startswith("p."):
-            continue
+    # Décodage vectorisé puis sélection des mutations exploitables
+    decoded = decode_hgvs_p(df["HGVS_p"])
+    counts = decoded["Mutation_Class"].fillna("non reconnue").value_counts()
+    print("[INFO] Classes HGVS.p : " + ", ".join(f"{name} {n}" for name, n in counts.items()))
+    usable = (
+        df["Transcript_ID"].isin(list(protein_dict.keys()))
+        & decoded["Mutation_Class"].isin(args.classes)
+    )
+    skipped = int(decoded["Mutation_Class"].isin(PEPTIDE_CLASSES).sum() - usable.sum())
+    if skipped:
+        print(f"[WARNING] {skipped} mutations non traitées (classe non demandée via --classes ou transcrit absent)")
+    mutations = df.loc[usable, ["Mutation_ID", "Transcript_ID"]].assign(
+        pos=decoded.loc[usable, "pos"].astype(np.int64),
+        mut_aa=decoded.loc[usable, "mut_aa"],
+    )
 
-        pos1, mut_aa = extract_pos_and_aa(hgvs_p)
-        if pos1 is None or mut_aa is None:
-            continue
+    cds_dict = None
+    if args.classes != ["missense"]:
+        mutations = mutations.join(decoded.loc[usable, ["Mutation_Class", "end", "alt"]].astype({"end": np.int64}))
+        frameshift = mutations["Mutation_Class"] == "frameshift"
+        if frameshift.any() and "HGVS.c" in df.columns:
+            mutations = mutations.join(decode_hgvs_c(df.loc[mutations.index[frameshift], "HGVS.c"]))
+        if frameshift.any() and args.cds_nt:
+            with telemetry.step("cds_load") as step:
+                cds_dict = parse_cds_fasta(args.cds_nt, set(mutations.loc[frameshift, "Transcript_ID"]))
+                step.rows_out = len(cds_dict)
+        elif frameshift.any():
+            print("[WARNING] Frameshifts sans --cds_nt (ou sans HGVS.c) : seul le premier résidu nouveau est utilisé")
 
-        seq = protein_dict[tx_id]
-        peptides = generate_9mers_sliding(seq, pos1, mut_aa)
+    with telemetry.step("kmer_generation", rows_in=len(mutations)) as step:
+        peptides = generate_peptides_batch(mutations, protein_dict, args.lengths, cds_dict)
+        step.rows_out = len(peptides)
+
+    if args.unique_output:
+        with telemetry.step("deduplicate", rows_in=len(peptides)) as step:
+            unique, sources = deduplicate_peptides(peptides, df)
+            step.rows_out = len(unique)
+        base, ext = os.path.splitext(args.unique_output)
+        sources_output = base + ".sources" + ext
+        with telemetry.step("write_unique", rows_in=len(unique) + len(sources)):
+            write_table(unique, args.unique_output, args.tsv_export)
+            write_table(sources, sources_output, args.tsv_export)
+        print(f"{len(unique)} peptides uniques (sur {len(peptides)} fenêtres) dans {args.unique_output}")
+        print(f"Correspondance peptide -> sources dans {sources_output}")
 
-        for mutant_position, wt_pep, mut_pep in peptides:
-            record = row.to_dict()
-            record["Mutant_AA_Position_in_9mer"] = mutant_position
-            record["WT_9mer"] = wt_pep
-            record["MUT_9mer"] = mut_pep
-            all_peptides.append(record)
+    if args.normalised:
+        base, ext = os.path.splitext(args.output)
+        mutations_output = args.mutations_output or base + ".mutations" + ext
+        mutation_table = df[df["Mutation_ID"].isin(peptides["Mutation_ID"])]
+        with telemetry.step("write_output", rows_in=len(peptides) + len(mutation_table)):
+            write_table(mutation_table, mutations_output, args.tsv_export)
+            write_table(peptides, args.output, args.tsv_export)
+        telemetry.rows_out = len(peptides)
+        print(f"{len(peptides)} peptides sliding générés dans {args.output}")
+        print(f"{len(mutation_table)} mutations sources dans {mutations_output}")
+        return
 
-    out_df = pd.DataFrame(all_peptides)
-    out_df.to_csv(args.output, sep="\t", index=False)
-    print(f"{len(out_df)} peptides sliding 9-mer générés dans {args.output}")
+    # Sortie large historique : colonnes de la mutation répétées pour chaque peptide
+    with telemetry.step("merge", rows_in=len(peptides)) as step:
+        out_df = df.merge(peptides, on="Mutation_ID", how="inner").drop(columns="Mutation_ID")
+        step.rows_out = len(out_df)
+    with telemetry.step("write_output", rows_in=len(out_df)):
+        write_table(out_df, args.output, args.tsv_export)
+    telemetry.rows_out = len(out_df)
+    print(f"{len(out_df)} peptides sliding générés dans {args.output}")
 
 if __name__ == "__main__":
     main()
-
@@ -1,20 +1,57 @@
 # usage : python 05_fasta.py --input peptides_9mer.tsv   --wt_fasta peptides_wt.fasta --mut_fasta peptides_mut.fasta
+# peptides uniques (04 --unique_output) : python 05_fasta.py --unique peptides_unique.tsv --mut_fasta peptides_mut.fasta --lengths 8,9,10,11
 
-import pandas as pd
 import argparse
+from delta import SEQUENCE_ID_COLUMNS, sequence_id
+from table_io import read_table
+from telemetry import Telemetry
 
-def sanitize(text):
-    """Nettoie les chaînes pour en faire des identifiants valides pour FASTA"""
-    return str(text).replace(" ", "_").replace(".", "_").replace("/", "_")
+# Colonnes utilisées pour construire les enregistrements FASTA
+FASTA_COLUMNS = [
+    "Mutation_ID", "Gene_Name", "Transcript_ID", "Transcript_IDHGVS_p", "Mutant_AA_Position_in_9mer",
+    "CHROM", "POS", "REF", "ALT", "WT_9mer", "MUT_9mer",
+]
+
+def parse_lengths(text):
+    """'8,9,10,11' -> [8, 9, 10, 11]"""
+    return sorted({int(x) for x in str(text).split(",") if x.strip()})
+
+def write_unique_fasta(unique_path, mut_fasta, lengths):
+    """
+    Un enregistrement FASTA par peptide muté unique, identifié par son Peptide_ID
+    (06 --peptide_sources <unique>.sources.tsv le ramène aux variants sources).
+    """
+    unique = read_table(unique_path, columns=["Peptide_ID", "Peptide"])
+    unique = unique[unique["Peptide"].str.len().isin(lengths)]
+    with open(mut_fasta, "w") as f:
+        f.write("".join(f">{pid}\n{pep}\n" for pid, pep in zip(unique["Peptide_ID"], unique["Peptide"])))
+    print(f"✅ FASTA muté (peptides uniques) : {mut_fasta}")
+    print(f"🔢 {len(unique)} peptides écrits")
 
 def main():
     parser = argparse.ArgumentParser(description="Génère deux fichiers FASTA pour peptides WT et mutés à partir d’un TSV")
-    parser.add_argument("--input", required=True, help="Fichier TSV contenant WT_9mer et MUT_9mer")
+    parser.add_argument("--input", default=None, help="Fichier TSV contenant WT_9mer et MUT_9mer")
+    parser.add_argument("--unique", default=None, help="Table des peptides uniques produite par 04 --unique_output")
+    parser.add_argument("--lengths", type=parse_lengths, default=[9], help="Longueurs de peptides acceptées (ex. 8,9,10,11)")
     parser.add_argument("--wt_fasta", default="wt.fasta", help="Fichier de sortie FASTA pour les peptides normaux")
     parser.add_argument("--mut_fasta", default="mut.fasta", help="Fichier de sortie FASTA pour les peptides mutés")
+    parser.add_argument("--mutations", default=None, help="Table des mutations si --input est la sortie normalisée de 04")
     args = parser.parse_args()
+    telemetry = Telemetry("05")
 
-    df = pd.read_csv(args.input, sep="\t")
+    if args.unique:
+        with telemetry.step("write_unique_fasta"):
+            write_unique_fasta(args.unique, args.mut_fasta, args.lengths)
+        return
+    if args.input is None:
+        parser.error("--input ou --unique est requis")
+
+    with telemetry.step("read_input") as step:
+        df = read_table(args.input, columns=FASTA_COLUMNS)
+        if args.mutations:
+            # Sortie normalisée de 04 : rattacher les colonnes de mutation par Mutation_ID
+            df = df.merge(read_table(args.mutations, columns=FASTA_COLUMNS), on="Mutation_ID", how="left")
+        step.rows_out = telemetry.rows_in = len(df)
 
     # Séparer correctement la colonne combinée "Transcript_IDHGVS_p" si nécessaire
     if "Transcript_IDHGVS_p" in df.columns and "Transcript_ID" not in df.columns:
@@ -23,33 +60,34 @@ def main():
     wt_records = []
     mut_records = []
 
-    for _, row in df.iterrows():
-        gene = sanitize(row.get("Gene_Name", "NA"))
-        tx = sanitize(row.get("Transcript_ID", "NA"))
-        pos = row.get("Mutant_AA_Position_in_9mer", "NA")
-        chrom = row.get("CHROM", "NA")
-        position = row.get("POS", "NA")
-        ref = row.get("REF", "X")
-        alt = row.get("ALT", "X")
-
-        base_id = f"{gene}_{tx}_pos{pos}_chr{chrom}_{position}_{ref}>{alt}"
+    with telemetry.step("build_records", rows_in=len(df)) as step:
+        for _, row in df.iterrows():
+            base_id = sequence_id(*(row.get(col, default) for col, default in SEQUENCE_ID_COLUMNS))
 
-        wt_seq = row.get("WT_9mer", "")
-        mut_seq = row.get("MUT_9mer", "")
+            # WT absent (NA) : fenêtre au-delà de la fin de la protéine (stop-loss, frameshift)
+            wt_seq = row.get("WT_9mer")
+            mut_seq = row.get("MUT_9mer")
+            wt_seq = wt_seq if isinstance(wt_seq, str) and wt_seq else None
+            if not isinstance(mut_seq, str) or len(mut_seq) not in args.lengths:
+                continue
 
-        if len(wt_seq) == 9 and len(mut_seq) == 9:
-            wt_records.append(f">{base_id}\n{wt_seq}")
-            mut_records.append(f">{base_id}\n{mut_seq}")
+            if wt_seq is None:
+                mut_records.append(f">{base_id}\n{mut_seq}")
+            elif len(mut_seq) == len(wt_seq):
+                wt_records.append(f">{base_id}\n{wt_seq}")
+                mut_records.append(f">{base_id}\n{mut_seq}")
+        step.rows_out = telemetry.rows_out = len(mut_records)
 
-    with open(args.wt_fasta, "w") as f:
-        f.write("\n".join(wt_records) + "\n")
+    with telemetry.step("write_fasta", rows_in=len(wt_records) + len(mut_records)):
+        with open(args.wt_fasta, "w") as f:
+            f.write("\n".join(wt_records) + "\n")
 
-    with open(args.mut_fasta, "w") as f:
-        f.write("\n".join(mut_records) + "\n")
+        with open(args.mut_fasta, "w") as f:
+            f.write("\n".join(mut_records) + "\n")
 
     print(f"✅ FASTA WT : {args.wt_fasta}")
     print(f"✅ FASTA muté : {args.mut_fasta}")
-    print(f"🔢 {len(wt_records)} peptides écrits dans chaque fichier")
+    print(f"🔢 {len(wt_records)} peptides WT, {len(mut_records)} peptides mutés écrits")
 
 if __name__ == "__main__":
     main()
@@ -1,13 +1,34 @@
-## usage python 06_predict_binders.py --fasta peptides_mut.fasta
+## usage python 06_predict_binders.py --fasta peptides_mut.fasta [--lengths 8,9,10,11] [--cache mhcflurry_cache.sqlite]
+##       [--engine inprocess --batch_size 100000]
+##       [--shards 64 --shard_by hash|allele --workers 8 --shard_dir 06_shards]   (prédiction shardée et reprenable)
+## grands jeux de données : [--plot_mode auto|full|large --plotlyjs inline|cdn|directory]
+## mode apparié WT / muté : python 06_predict_binders.py --pairs peptides_9mer.tsv [--paired_output 06_paired_binders.tsv]
+## mode cohorte (allèles propres à chaque patient) :
+##       python 06_predict_binders.py --fasta peptides_mut.fasta --hla_genotypes hla_typing.tsv --mutation_samples GBM.samples.tsv
+##       hla_typing.tsv : sample, allele (une ligne par allèle) ou sample + une colonne par allèle (HLA-A1, HLA-A2...)
+##       GBM.samples.tsv : CHROM, POS, REF, ALT, sample (écrit par 01 depuis Tumor_Sample_Barcode)
+## peptides uniques (04 --unique_output, 05 --unique) : --peptide_sources peptides_unique.sources.tsv
+## base SQLite indexée des prédictions (requêtes, rapports 07 / 08 / 10) : --store 06_binders.sqlite
+## mode incrémental (run_pipeline.py --incremental) : --fasta ne contient que les peptides des variants
+##       nouveaux / modifiés, --update retract.tsv (CHROM, POS, REF, ALT) liste les variants à retirer des
+##       sorties existantes, --key_order order.tsv donne l'ordre des variants du FASTA complet ;
+##       meilleurs binders et graphique sont recalculés sur la table fusionnée.
 
 import argparse
+import numpy as np
 import pandas as pd
-import subprocess
 from Bio import SeqIO
-import uuid
 import plotly.express as px
+import plotly.graph_objects as go
 import os
 import glob
+import re
+from binder_store import write_store
+from delta import SEQ_ID_VARIANT, VARIANT_KEY, key_order, read_keys, sequence_keys
+from prediction_cache import PredictionCache, predictor_version
+from table_io import read_table, with_extension, write_table
+from predictors import DEFAULT_BATCH_SIZE, get_predictor, predict_sharded
+from telemetry import Telemetry
 
 HLA_SUPERTYPES = [
     "HLA-A*01:01", "HLA-A*02:01", "HLA-A*03:01",
@@ -16,15 +37,42 @@ HLA_SUPERTYPES = [
     "HLA-B*39:01", "HLA-B*58:01", "HLA-B*15:01"
 ]
 
-def read_peptides_from_fasta(fasta_file):
+# Colonnes d'identification reprises en mode apparié
+PAIR_ID_COLUMNS = ["Mutation_ID", "Gene_Name", "Transcript_ID", "HGVS_p", "Mutant_AA_Position_in_9mer"]
+
+# Au-delà, le mode "auto" bascule sur le rendu agrégé (WebGL + densité des non-binders)
+LARGE_PLOT_ROWS = 20000
+
+def parse_lengths(text):
+    """'8,9,10,11' -> [8, 9, 10, 11]"""
+    return sorted({int(x) for x in str(text).split(",") if x.strip()})
+
+def read_peptides_from_fasta(fasta_file, lengths=(9,)):
     peptides = []
     for record in SeqIO.parse(fasta_file, "fasta"):
         seq = str(record.seq).strip().upper()
-        if len(seq) == 9:
+        if len(seq) in lengths:
             peptides.append({'id': record.id, 'sequence': seq})
     return peptides
 
-def write_input_csv(peptides, csv_file):
+def expand_peptide_sources(peptides, sources_path):
+    """
+    Peptides uniques (PEP..., 04 --unique_output) -> un enregistrement par fenêtre source, identifié
+    par le Sequence_ID de 05 : les sorties ont la forme d'un run sans déduplication (variant retrouvé
+    par la base, le mode cohorte et --update). Paires peptide x allèle prédites une seule fois.
+    """
+    sources = read_table(sources_path, columns=["Peptide_ID", "Sequence_ID", "WT_Peptide"])
+    sequences = {p["id"]: p["sequence"] for p in peptides}
+    sources = sources[sources["Peptide_ID"].isin(sequences.keys())]
+    # Comme 05 : fenêtre écartée si le WT existe mais n'a pas la longueur du muté
+    mut_length = sources["Peptide_ID"].map(sequences).str.len()
+    sources = sources[sources["WT_Peptide"].isna() | (sources["WT_Peptide"].str.len() == mut_length)]
+    missing = len(sequences) - sources["Peptide_ID"].nunique()
+    if missing:
+        print(f"[WARNING] {missing} peptides uniques absents de {sources_path}, écartés")
+    return [{"id": seq_id, "sequence": sequences[pid]} for pid, seq_id in zip(sources["Peptide_ID"], sources["Sequence_ID"])]
+
+def build_input_pairs(peptides):
     rows = []
     for p in peptides:
         for allele in HLA_SUPERTYPES:
@@ -33,19 +81,87 @@ def write_input_csv(peptides, csv_file):
                 "allele": allele,
                 "seq_id": p["id"]
             })
-    df = pd.DataFrame(rows)
-    df.to_csv(csv_file, index=False)
-    return df, csv_file
-
-def run_mhcflurry(input_csv, output_csv):
-    subprocess.run([
-        "mhcflurry-predict",
-        input_csv,
-        "--out", output_csv
-    ], check=True)
-    return output_csv
+    return pd.DataFrame(rows, columns=["peptide", "allele", "seq_id"])
+
+def normalise_allele(allele):
+    """'A*02:01', 'A02:01', 'HLA-A*02:01:01' -> 'HLA-A*02:01' (nomenclature mhcflurry)."""
+    text = str(allele).strip().upper()
+    match = re.match(r"^(?:HLA-)?([A-Z]+[0-9]?)\*?(\d{2,3}):(\d{2,3})", text)
+    return f"HLA-{match.group(1)}*{match.group(2)}:{match.group(3)}" if match else str(allele).strip()
+
+def load_genotypes(path):
+    """Table sample -> allèles HLA, au format long (sample, allele) ou large (une colonne par allèle)."""
+    table = read_table(path)
+    if not {"sample", "allele"} <= set(table.columns):
+        sample_col = table.columns[0]
+        table = table.melt(id_vars=sample_col, value_name="allele").rename(columns={sample_col: "sample"})
+    genotypes = table[["sample", "allele"]].dropna()
+    genotypes = genotypes.assign(sample=genotypes["sample"].astype(str),
+                                 allele=genotypes["allele"].map(normalise_allele))
+    return genotypes.drop_duplicates().reset_index(drop=True)
+
+def load_mutation_samples(path):
+    """Correspondance variant (CHROM, POS, REF, ALT) -> échantillon, clés en texte."""
+    mapping = read_table(path, columns=VARIANT_KEY + ["sample"]).dropna()
+    return mapping.astype(str).drop_duplicates()
+
+def build_cohort_pairs(peptides, mutation_samples, genotypes):
+    """
+    Paires (peptide, allele, seq_id) limitées aux allèles des porteurs de chaque variant,
+    dédupliquées entre échantillons.
+    Retourne aussi la table des porteurs (sample, seq_id, peptide, allele) pour la sortie par échantillon.
+    """
+    table = pd.DataFrame(peptides, columns=["id", "sequence"])
+    table = pd.concat([table, table["id"].str.extract(SEQ_ID_VARIANT)], axis=1)
+    carriers = (
+        table.merge(mutation_samples, on=VARIANT_KEY, how="inner")
+        .merge(genotypes, on="sample", how="inner")
+        .rename(columns={"sequence": "peptide", "id": "seq_id"})
+    )
+    carriers = carriers[["sample", "seq_id", "peptide", "allele"]].drop_duplicates()
+    pairs = carriers[["peptide", "allele", "seq_id"]].drop_duplicates().reset_index(drop=True)
+
+    n_unmatched = len(table) - table["id"].isin(carriers["seq_id"]).sum()
+    full_product = len(table) * len(HLA_SUPERTYPES)
+    print(f"[INFO] Mode cohorte : {len(pairs)} paires peptide x allèle de porteurs "
+          f"(produit complet sur les supertypes : {full_product})")
+    if n_unmatched:
+        print(f"[WARNING] {n_unmatched} peptides sans échantillon génotypé porteur, non prédits")
+    return pairs, carriers
+
+def predict_affinities(pairs, predictor, cache=None, sharding=None):
+    """
+    Affinités des paires (peptide, allele) uniques de `pairs`.
+    Les paires présentes dans le cache ne sont pas renvoyées au prédicteur.
+    `sharding` : options de predict_sharded (shard_dir, n_shards, shard_by, workers...) ou None.
+    Retourne un DataFrame peptide, allele, affinity.
+    """
+    unique_pairs = pairs[["peptide", "allele"]].drop_duplicates()
+    known = pd.DataFrame({"peptide": pd.Series(dtype=object), "allele": pd.Series(dtype=object),
+                          "affinity": pd.Series(dtype=float)})
+    if cache is not None:
+        known = cache.get_many(unique_pairs)
+        cache.report()
+
+    missing = unique_pairs.merge(known[["peptide", "allele"]], on=["peptide", "allele"], how="left", indicator=True)
+    missing = missing.loc[missing["_merge"] == "left_only", ["peptide", "allele"]]
+    if missing.empty:
+        print("[INFO] Toutes les paires sont déjà dans le cache, mhcflurry non lancé.")
+        return known
+
+    print(f"[INFO] Prédiction mhcflurry ({predictor.name}) sur {len(missing)} paires peptide x allèle...")
+    if sharding:
+        predicted = predict_sharded(missing, engine=predictor.name, **sharding)
+    else:
+        predicted = predictor.predict(missing)
+    if cache is not None:
+        cache.put_many(predicted)
+    return pd.concat([known, predicted], ignore_index=True)
 
 def classify_affinity(affinity):
+    # Affinité manquante (paire non supportée par le modèle) : non-binder
+    if pd.isna(affinity):
+        return "Non-binder"
     if affinity < 50:
         return "Strong binder"
     elif affinity < 500:
@@ -53,7 +169,15 @@ def classify_affinity(affinity):
     else:
         return "Non-binder"
 
-def generate_html_plot(df, html_file="binders_plot.html"):
+def plotlyjs_option(plotlyjs):
+    """inline : plotly.js embarqué ; cdn / directory : référence externe."""
+    return True if plotlyjs == "inline" else plotlyjs
+
+def generate_html_plot(df, html_file="binders_plot.html", plot_mode="auto", plotlyjs="inline"):
+    if plot_mode == "large" or (plot_mode == "auto" and len(df) > LARGE_PLOT_ROWS):
+        generate_large_html_plot(df, html_file, plotlyjs)
+        return
+
     # Récupération de la palette qualitative Plotly par défaut
     default_colors = px.colors.qualitative.Plotly
 
@@ -87,9 +211,65 @@ def generate_html_plot(df, html_file="binders_plot.html"):
             font_family="Arial"
         )
     )
-    fig.write_html(html_file)
+    fig.write_html(html_file, include_plotlyjs=plotlyjs_option(plotlyjs))
     print(f"[INFO] Graphique interactif enregistré dans {html_file}")
 
+def generate_large_html_plot(df, html_file, plotlyjs="inline", x_bins=400, y_bins=60):
+    """
+    Rendu borné pour les grandes tables : les binders restent des points (WebGL),
+    les non-binders sont agrégés en densité (heatmap peptide x log10 affinité).
+    Les peptides sont placés par rang (ordre alphabétique) sur l'axe x.
+    """
+    default_colors = px.colors.qualitative.Plotly
+    # Colonne objet possible (table fusionnée, relue sans type) : np.log10 exige des flottants
+    df = df.assign(Affinity_nM=pd.to_numeric(df["Affinity_nM"], errors="coerce"))
+    df = df[df["Affinity_nM"].notna()]
+    x = pd.Categorical(df["Peptide"]).codes
+    log_aff = np.log10(df["Affinity_nM"].clip(lower=1e-3).to_numpy())
+    is_binder = (df["Interpretation"] != "Non-binder").to_numpy()
+
+    fig = go.Figure()
+    if (~is_binder).any():
+        counts, x_edges, y_edges = np.histogram2d(
+            x[~is_binder], log_aff[~is_binder],
+            bins=[min(x_bins, max(1, x.max() + 1)), y_bins]
+        )
+        fig.add_trace(go.Heatmap(
+            x=(x_edges[:-1] + x_edges[1:]) / 2,
+            y=10 ** ((y_edges[:-1] + y_edges[1:]) / 2),
+            z=np.where(counts.T > 0, counts.T, np.nan),
+            colorscale=[[0, "#dbe4fb"], [1, default_colors[0]]],
+            colorbar=dict(title="Non-binders"),
+            name="Non-binder",
+            hovertemplate="Non-binders : %{z}<extra></extra>",
+        ))
+
+    color_map = {"Strong binder": default_colors[1], "Weak binder": default_colors[2]}
+    for label, color in color_map.items():
+        mask = (df["Interpretation"] == label).to_numpy()
+        if not mask.any():
+            continue
+        sub = df[mask]
+        fig.add_trace(go.Scattergl(
+            x=x[mask],
+            y=sub["Affinity_nM"],
+            mode="markers",
+            marker=dict(color=color, size=5),
+            name=label,
+            customdata=sub[["Peptide", "Sequence_ID", "HLA"]].to_numpy(),
+            hovertemplate="%{customdata[0]}<br>%{customdata[1]}<br>%{customdata[2]}<br>%{y:.1f} nM<extra></extra>",
+        ))
+
+    fig.update_layout(
+        title=f"Affinités MHC-I des peptides par allèle ({len(df)} prédictions, non-binders agrégés)",
+        xaxis_title="Peptide (rang)",
+        yaxis_title="Affinité (nM)",
+    )
+    fig.update_yaxes(type="log")
+    fig.update_xaxes(showticklabels=False)
+    fig.write_html(html_file, include_plotlyjs=plotlyjs_option(plotlyjs))
+    print(f"[INFO] Graphique interactif (mode grand volume) enregistré dans {html_file}")
+
 
 def cleanup_temp_files():
     patterns = ["mhcflurry_input_*.csv", "mhcflurry_output_*.csv"]
@@ -101,52 +281,230 @@ def cleanup_temp_files():
             except Exception as e:
                 print(f"[WARNING] Impossible de supprimer {f} : {e}")
 
-def main(fasta_path):
-    print("[INFO] Lecture des peptides 9-mers dans le fichier FASTA...")
-    peptides = read_peptides_from_fasta(fasta_path)
+def run_predictions(input_df, cache_path=None, model_version=None, cache_max_entries=None,
+                    engine="subprocess", batch_size=DEFAULT_BATCH_SIZE, sharding=None):
+    """Instancie cache et moteur, puis prédit les paires (peptide, allele) de `input_df`."""
+    cache = None
+    if cache_path:
+        cache = PredictionCache(cache_path, model_version or predictor_version(), cache_max_entries)
+    if sharding:
+        sharding = dict(sharding, batch_size=batch_size)
+    try:
+        return predict_affinities(input_df, get_predictor(engine, batch_size), cache, sharding)
+    finally:
+        if cache is not None:
+            cache.close()
+
+def merge_previous(table, path, retract, order=None):
+    """
+    Mode --update : lignes existantes de `path` hors variants retirés et nouvelles lignes,
+    rangées selon l'ordre des variants `order` (FASTA complet) comme dans un run complet.
+    """
+    if not os.path.exists(path):
+        return table
+    previous = read_table(path)
+    kept = previous[~sequence_keys(previous["Sequence_ID"]).isin(retract).to_numpy()]
+    print(f"[INFO] {path} : {len(previous) - len(kept)} lignes retirées, {len(kept)} gardées, {len(table)} ajoutées")
+    merged = pd.concat([kept, table], ignore_index=True)
+    if order is not None:
+        merged = merged.iloc[key_order(sequence_keys(merged["Sequence_ID"]), order)].reset_index(drop=True)
+    return merged
+
+def main_paired(pairs_path, output_tsv="06_paired_binders.tsv", lengths=(9,), output_format="tsv", **options):
+    """
+    Mode apparié : WT et muté de chaque paire sont prédits en une seule passe
+    (union dédupliquée des séquences), puis rapprochés par allèle.
+    Agretopicity = affinité mutée / affinité WT (< 1 : le muté lie mieux que le WT).
+    """
+    telemetry = Telemetry("06")
+    print(f"[INFO] Lecture des paires WT / muté dans {pairs_path}...")
+    with telemetry.step("read_pairs") as step:
+        table = read_table(pairs_path, columns=PAIR_ID_COLUMNS + ["WT_9mer", "MUT_9mer"])
+        step.rows_out = telemetry.rows_in = len(table)
+    id_cols = [c for c in PAIR_ID_COLUMNS if c in table.columns]
+    pairs = table[id_cols + ["WT_9mer", "MUT_9mer"]].dropna(subset=["WT_9mer", "MUT_9mer"]).drop_duplicates()
+    pairs = pairs[pairs["WT_9mer"].str.len().isin(lengths) & (pairs["WT_9mer"].str.len() == pairs["MUT_9mer"].str.len())]
 
-    print(f"[INFO] {len(peptides)} peptides lus. Préparation du CSV d'entrée...")
-    input_csv = f"mhcflurry_input_{uuid.uuid4().hex}.csv"
-    output_csv = f"mhcflurry_output_{uuid.uuid4().hex}.csv"
+    sequences = pd.unique(pd.concat([pairs["WT_9mer"], pairs["MUT_9mer"]], ignore_index=True))
+    print(f"[INFO] {len(pairs)} paires, {len(sequences)} séquences uniques (WT + muté) à prédire par allèle")
+    input_df = pd.DataFrame({
+        "peptide": [seq for seq in sequences for _ in HLA_SUPERTYPES],
+        "allele": [allele for _ in sequences for allele in HLA_SUPERTYPES],
+    })
+    with telemetry.step("predict", rows_in=len(input_df)) as step:
+        affinities = run_predictions(input_df, **options)
+        step.rows_out = len(affinities)
+
+    with telemetry.step("merge", rows_in=len(pairs)) as step:
+        wt = affinities.rename(columns={"peptide": "WT_9mer", "allele": "HLA", "affinity": "WT_Affinity_nM"})
+        mut = affinities.rename(columns={"peptide": "MUT_9mer", "allele": "HLA", "affinity": "MUT_Affinity_nM"})
+        paired = pairs.merge(pd.Series(HLA_SUPERTYPES, name="HLA"), how="cross")
+        paired = paired.merge(wt, on=["WT_9mer", "HLA"], how="left").merge(mut, on=["MUT_9mer", "HLA"], how="left")
+        paired["Agretopicity"] = paired["MUT_Affinity_nM"] / paired["WT_Affinity_nM"]
+        paired["Interpretation"] = paired["MUT_Affinity_nM"].apply(classify_affinity)
+        step.rows_out = telemetry.rows_out = len(paired)
 
-    input_df, _ = write_input_csv(peptides, input_csv)
+    output_tsv = with_extension(output_tsv, output_format)
+    with telemetry.step("write_output", rows_in=len(paired)):
+        write_table(paired, output_tsv)
+    cleanup_temp_files()
+    print(f"[✔] {len(paired)} lignes WT / muté x allèle écrites dans {output_tsv}")
 
-    print("[INFO] Exécution de mhcflurry-predict...")
-    run_mhcflurry(input_csv, output_csv)
+def main(fasta_path, lengths=(9,), plot_mode="auto", plotlyjs="inline", output_format="tsv", tsv_export=False,
+         cohort=None, update=None, store_path=None, order=None, peptide_sources=None, **options):
+    """
+    `cohort` : (correspondance variant -> échantillon, génotypes HLA) pour le mode cohorte, ou None.
+    `update` : clés des variants à retirer des sorties existantes (mode incrémental), ou None ;
+    `order` : clés des variants du FASTA complet, ordre des lignes fusionnées.
+    `peptide_sources` : table des sources de 04 --unique_output si le FASTA porte des Peptide_ID, ou None.
+    `store_path` : base SQLite indexée des prédictions (binder_store.py), ou None.
+    """
+    final_path = with_extension("06_binders_final.tsv", output_format)
+    best_path = with_extension("06_best_binders_by_peptide.tsv", output_format)
+    sample_path = with_extension("06_binders_by_sample.tsv", output_format)
+    telemetry = Telemetry("06")
 
-    print("[INFO] Lecture des résultats de mhcflurry...")
-    prediction_df = pd.read_csv(output_csv)
+    print(f"[INFO] Lecture des peptides ({', '.join(map(str, lengths))}-mers) dans le fichier FASTA...")
+    with telemetry.step("read_fasta") as step:
+        peptides = read_peptides_from_fasta(fasta_path, lengths)
+        step.rows_out = telemetry.rows_in = len(peptides)
+    if peptide_sources:
+        with telemetry.step("expand_sources", rows_in=len(peptides)) as step:
+            peptides = expand_peptide_sources(peptides, peptide_sources)
+            step.rows_out = len(peptides)
+        print(f"[INFO] {telemetry.rows_in} peptides uniques -> {len(peptides)} fenêtres sources ({peptide_sources})")
+    elif any(re.fullmatch(r"PEP\d+", p["id"]) for p in peptides):
+        print("[WARNING] Identifiants Peptide_ID (04 --unique_output) sans --peptide_sources : "
+              "gène et variant inconnus dans les sorties (base, mode cohorte, --update)")
+
+    print(f"[INFO] {len(peptides)} peptides lus. Préparation des paires peptide x allèle...")
+    with telemetry.step("build_pairs", rows_in=len(peptides)) as step:
+        if cohort is None:
+            input_df = build_input_pairs(peptides)
+        else:
+            input_df, carriers = build_cohort_pairs(peptides, *cohort)
+        step.rows_out = len(input_df)
+    with telemetry.step("predict", rows_in=len(input_df)) as step:
+        affinities = run_predictions(input_df, **options)
+        step.rows_out = len(affinities)
 
     print("[INFO] Fusion des données et ajout des colonnes d'interprétation...")
-    full_df = input_df.copy()
-    full_df["Affinity_nM"] = prediction_df["mhcflurry_affinity"]
+    with telemetry.step("merge", rows_in=len(input_df)) as step:
+        full_df = input_df.merge(affinities, on=["peptide", "allele"], how="left")
+        full_df = full_df.rename(columns={"affinity": "Affinity_nM"})
 
-    full_df = full_df.rename(columns={
-        "peptide": "Peptide",
-        "allele": "HLA",
-        "seq_id": "Sequence_ID"
-    })
+        full_df = full_df.rename(columns={
+            "peptide": "Peptide",
+            "allele": "HLA",
+            "seq_id": "Sequence_ID"
+        })
 
-    full_df["Interpretation"] = full_df["Affinity_nM"].apply(classify_affinity)
+        full_df["Interpretation"] = full_df["Affinity_nM"].apply(classify_affinity)
+        n_missing = int(full_df["Affinity_nM"].isna().sum())
+        if n_missing:
+            print(f"[WARNING] {n_missing} paires peptide x allèle sans affinité (non supportées par le modèle), "
+                  "classées Non-binder")
+        step.rows_out = telemetry.rows_out = len(full_df)
+
+    if update is not None:
+        with telemetry.step("merge_previous", rows_in=len(full_df)) as step:
+            full_df = merge_previous(full_df, final_path, update, order)
+            step.rows_out = telemetry.rows_out = len(full_df)
 
     print("[INFO] Sauvegarde du fichier complet avec tous les résultats...")
-    full_df.to_csv("06_binders_final.tsv", sep="\t", index=False)
+    with telemetry.step("write_output", rows_in=len(full_df)):
+        write_table(full_df, final_path, tsv_export)
+    if store_path:
+        with telemetry.step("write_store", rows_in=len(full_df)):
+            write_store(full_df, store_path)
+
+    if cohort is not None:
+        print("[INFO] Sauvegarde des prédictions par échantillon...")
+        with telemetry.step("write_by_sample", rows_in=len(carriers)):
+            by_sample = carriers.rename(columns={
+                "sample": "Sample", "seq_id": "Sequence_ID", "peptide": "Peptide", "allele": "HLA"
+            }).merge(full_df, on=["Peptide", "HLA", "Sequence_ID"], how="left")
+            if update is not None:
+                by_sample = merge_previous(by_sample, sample_path, update, order)
+            write_table(by_sample, sample_path, tsv_export)
 
     print("[INFO] Extraction des meilleurs binders par peptide...")
-    best_binders_df = full_df.loc[full_df.groupby("Sequence_ID")["Affinity_nM"].idxmin()]
-    best_binders_df.to_csv("06_best_binders_by_peptide.tsv", sep="\t", index=False)
+    with telemetry.step("best_binders", rows_in=len(full_df)) as step:
+        predicted = full_df[full_df["Affinity_nM"].notna()]
+        best_binders_df = predicted.loc[predicted.groupby("Sequence_ID")["Affinity_nM"].idxmin()]
+        write_table(best_binders_df, best_path, tsv_export)
+        step.rows_out = len(best_binders_df)
 
     print("[INFO] Génération du graphique interactif HTML...")
-    generate_html_plot(full_df, "06_binders_plot.html")
+    with telemetry.step("plot", rows_in=len(full_df)):
+        generate_html_plot(full_df, "06_binders_plot.html", plot_mode, plotlyjs)
 
     print("[INFO] Nettoyage des fichiers temporaires...")
     cleanup_temp_files()
 
     print("[✔] Analyse terminée.")
-    print("Fichiers générés dans : 06_binders_final.tsv, 06_best_binders_by_peptide.tsv, 06_binders_plot.html")
+    generated = [final_path, best_path] + ([sample_path] if cohort is not None else []) + ["06_binders_plot.html"]
+    generated += [store_path] if store_path else []
+    print(f"Fichiers générés dans : {', '.join(generated)}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Prédiction binders MHC-I avec mhcflurry et sortie HTML interactive")
-    parser.add_argument("--fasta", required=True, help="Fichier FASTA contenant peptides 9-mers")
+    parser.add_argument("--fasta", default=None, help="Fichier FASTA contenant peptides 9-mers")
+    parser.add_argument("--peptide_sources", default=None,
+                        help="Sources des peptides uniques (<unique>.sources.tsv de 04 --unique_output) si --fasta vient de 05 --unique")
+    parser.add_argument("--pairs", default=None, help="Table peptides (WT_9mer, MUT_9mer) pour le mode apparié WT / muté")
+    parser.add_argument("--paired_output", default="06_paired_binders.tsv", help="Sortie du mode apparié")
+    parser.add_argument("--lengths", type=parse_lengths, default=[9], help="Longueurs de peptides acceptées (ex. 8,9,10,11)")
+    parser.add_argument("--cache", default=None, help="Cache SQLite des prédictions (peptide, allèle, version du modèle)")
+    parser.add_argument("--model_version", default=None, help="Version du modèle pour la clé de cache (défaut : version mhcflurry installée)")
+    parser.add_argument("--cache_max_entries", type=int, default=None, help="Taille maximale du cache (éviction LRU)")
+    parser.add_argument("--engine", choices=["subprocess", "inprocess"], default="subprocess",
+                        help="inprocess : modèles mhcflurry chargés une fois, prédiction par lots ; subprocess : mhcflurry-predict")
+    parser.add_argument("--batch_size", type=int, default=DEFAULT_BATCH_SIZE, help="Taille des lots pour --engine inprocess")
+    parser.add_argument("--shards", type=int, default=0, help="Nombre maximal de shards, prédiction shardée si > 0 (0 : pas de sharding) ; "
+                             "--shard_by hash : plages de hash du peptide, --shard_by allele : allèles répartis à tour de rôle")
+    parser.add_argument("--shard_by", choices=["hash", "allele"], default="hash", help="Découpage par hash du peptide ou par allèle")
+    parser.add_argument("--shard_dir", default="06_shards", help="Répertoire des checkpoints de shards")
+    parser.add_argument("--workers", type=int, default=1, help="Nombre de processus pour les shards")
+    parser.add_argument("--plot_mode", choices=["auto", "full", "large"], default="auto",
+                        help=f"large : WebGL + densité des non-binders (auto au-delà de {LARGE_PLOT_ROWS} lignes)")
+    parser.add_argument("--plotlyjs", choices=["inline", "cdn", "directory"], default="inline",
+                        help="plotly.js embarqué dans le HTML ou référencé en externe")
+    parser.add_argument("--hla_genotypes", default=None,
+                        help="Mode cohorte : génotypes HLA par échantillon (sample, allele)")
+    parser.add_argument("--mutation_samples", default=None,
+                        help="Mode cohorte : correspondance variant -> échantillon (GBM.samples.tsv écrit par 01)")
+    parser.add_argument("--format", choices=["tsv", "parquet"], default="tsv", help="Format des tables de sortie")
+    parser.add_argument("--tsv_export", action="store_true", help="Copie TSV en plus des sorties Parquet")
+    parser.add_argument("--store", default=None, help="Base SQLite indexée des prédictions (ex. 06_binders.sqlite)")
+    parser.add_argument("--update", default=None,
+                        help="Mode incrémental : variants à retirer (CHROM, POS, REF, ALT), fusion dans les sorties existantes")
+    parser.add_argument("--key_order", default=None,
+                        help="Mode incrémental : variants du FASTA complet (CHROM, POS, REF, ALT), ordre des lignes fusionnées")
     args = parser.parse_args()
-    main(args.fasta)
+    if (args.fasta is None) == (args.pairs is None):
+        parser.error("indiquer --fasta ou --pairs")
+    if (args.hla_genotypes is None) != (args.mutation_samples is None):
+        parser.error("le mode cohorte nécessite --hla_genotypes et --mutation_samples")
+    if args.hla_genotypes and args.pairs:
+        parser.error("le mode cohorte s'applique à --fasta")
+    if args.update and args.pairs:
+        parser.error("--update s'applique à --fasta")
+
+    sharding = None
+    if args.shards > 0:
+        sharding = dict(shard_dir=args.shard_dir, n_shards=args.shards,
+                        shard_by=args.shard_by, workers=args.workers)
+    options = dict(cache_path=args.cache, model_version=args.model_version,
+                   cache_max_entries=args.cache_max_entries, engine=args.engine,
+                   batch_size=args.batch_size, sharding=sharding)
+    if args.pairs:
+        main_paired(args.pairs, args.paired_output, args.lengths, args.format, **options)
+    else:
+        cohort = None
+        if args.hla_genotypes:
+            cohort = (load_mutation_samples(args.mutation_samples), load_genotypes(args.hla_genotypes))
+        update = read_keys(args.update) if args.update else None
+        order = read_keys(args.key_order) if args.key_order else None
+        main(args.fasta, args.lengths, args.plot_mode, args.plotlyjs, args.format, args.tsv_export, cohort, update,
+             args.store, order, args.peptide_sources, **options)
@@ -1,9 +1,12 @@
 ## usage python 07_barplot.py --input-tsv 06_binders_final.tsv --output-html 07_barplot.html
+##       depuis la base indexée de 06 (comptes calculés par SQLite) : --store 06_binders.sqlite au lieu de --input-tsv
 
 
 import argparse
-import pandas as pd
 import plotly.express as px
+from binder_store import BinderStore
+from table_io import read_table
+from telemetry import Telemetry
 
 HLA_SUPERTYPES = [
     "HLA-A*01:01", "HLA-A*02:01", "HLA-A*03:01",
@@ -12,15 +15,29 @@ HLA_SUPERTYPES = [
     "HLA-B*27:05", "HLA-B*39:01", "HLA-B*58:01"
 ]
 
-def main(input_tsv, output_html):
-    print(f"[INFO] Lecture du fichier {input_tsv} ...")
-    df = pd.read_csv(input_tsv, sep="\t")
+def main(input_tsv, output_html, store_path=None):
+    telemetry = Telemetry("07")
+    if store_path:
+        # Comptes par (HLA, Interpretation) lus dans l'agrégat HLA x interprétation x gène de 06
+        print(f"[INFO] Comptes depuis la base {store_path} ...")
+        with telemetry.step("query_store") as step:
+            store = BinderStore(store_path)
+            counts = store.counts(["HLA", "Interpretation"], hla=HLA_SUPERTYPES)
+            store.close()
+            step.rows_out = telemetry.rows_out = len(counts)
+    else:
+        print(f"[INFO] Lecture du fichier {input_tsv} ...")
+        with telemetry.step("read_input") as step:
+            df = read_table(input_tsv, columns=["HLA", "Interpretation"], categorical=True)
+            step.rows_out = telemetry.rows_in = len(df)
 
-    # Filtrer uniquement sur les 12 supertypes
-    df = df[df['HLA'].isin(HLA_SUPERTYPES)]
+        # Filtrer uniquement sur les 12 supertypes
+        df = df[df['HLA'].isin(HLA_SUPERTYPES)]
 
-    # Compter le nombre de peptides par HLA et par Interpretation
-    counts = df.groupby(['HLA', 'Interpretation']).size().reset_index(name='Count')
+        # Compter le nombre de peptides par HLA et par Interpretation
+        with telemetry.step("aggregate", rows_in=len(df)) as step:
+            counts = df.groupby(['HLA', 'Interpretation'], observed=True).size().reset_index(name='Count')
+            step.rows_out = telemetry.rows_out = len(counts)
     
     # Prendre la palette par défaut
     default_colors = px.colors.qualitative.Plotly
@@ -33,33 +50,37 @@ def main(input_tsv, output_html):
     }
 
 
-    fig = px.bar(
-        counts,
-        x='HLA',
-        y='Count',
-        color='Interpretation',
-        color_discrete_map=color_discrete_map,
-        barmode='group',
-        title="Nombre de peptides par type d'interprétation et HLA supertype",
-        labels={'Count': 'Nombre de peptides (log10)', 'HLA': 'HLA Supertype'}
-    )
+    with telemetry.step("plot", rows_in=len(counts)):
+        fig = px.bar(
+            counts,
+            x='HLA',
+            y='Count',
+            color='Interpretation',
+            color_discrete_map=color_discrete_map,
+            barmode='group',
+            title="Nombre de peptides par type d'interprétation et HLA supertype",
+            labels={'Count': 'Nombre de peptides (log10)', 'HLA': 'HLA Supertype'}
+        )
 
-    fig.update_layout(
-        xaxis_tickangle=-45,
-        yaxis_type="log",
-        xaxis=dict(tickfont=dict(size=14), title_font=dict(size=16)),
-        yaxis=dict(tickfont=dict(size=14), title_font=dict(size=16)),
-        title_font=dict(size=18)
-    )
+        fig.update_layout(
+            xaxis_tickangle=-45,
+            yaxis_type="log",
+            xaxis=dict(tickfont=dict(size=14), title_font=dict(size=16)),
+            yaxis=dict(tickfont=dict(size=14), title_font=dict(size=16)),
+            title_font=dict(size=18)
+        )
 
-    # Sauvegarder le plot interactif en HTML
-    fig.write_html(output_html)
+        # Sauvegarder le plot interactif en HTML
+        fig.write_html(output_html)
     print(f"[INFO] Graphique sauvegardé dans {output_html}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Barplot des counts par HLA supertype et type d'interprétation")
-    parser.add_argument("--input-tsv", required=True, help="Fichier TSV en entrée avec colonnes HLA et Interpretation")
+    parser.add_argument("--input-tsv", default=None, help="Fichier TSV en entrée avec colonnes HLA et Interpretation")
+    parser.add_argument("--store", default=None, help="Base indexée des prédictions (06 --store) au lieu de --input-tsv")
     parser.add_argument("--output-html", required=True, help="Fichier HTML de sortie pour le graphique")
     args = parser.parse_args()
+    if (args.input_tsv is None) == (args.store is None):
+        parser.error("indiquer --input-tsv ou --store")
 
-    main(args.input_tsv, args.output_html)
+    main(args.input_tsv, args.output_html, args.store)
@@ -1,10 +1,20 @@
+## usage python 08_generate_seqlogos.py [--input 06_binders_final.tsv] [--output-html 08_seqlogos.html]
+##       [--workers 4] [--cache_dir 08_logo_cache]
+##       depuis la base indexée de 06 (binders seulement) : --store 06_binders.sqlite au lieu de --input
+
+import argparse
+import hashlib
+from multiprocessing import Pool
+import numpy as np
 import pandas as pd
 import logomaker
 import matplotlib.pyplot as plt
 import io
 import base64
-from collections import defaultdict
 import os
+from binder_store import BinderStore
+from table_io import read_table
+from telemetry import Telemetry
 
 # Couleurs classiques par acide aminé
 AA_COLORS = {
@@ -15,21 +25,45 @@ AA_COLORS = {
     'T': '#d9d9d9', 'V': '#d9d9d9', 'W': '#d9d9d9', 'Y': '#d9d9d9'
 }
 
+def build_pwms(peptides, groups):
+    """
+    PWM de tous les groupes (allèles) en une opération : matrice de caractères
+    peptides x positions, comptée par (groupe, position, acide aminé).
+    Tous les peptides doivent avoir la même longueur.
+    Retourne {groupe: DataFrame positions x AA présents, fréquences}.
+    """
+    peptides = np.asarray(peptides, dtype=str)
+    if len(peptides) == 0:
+        return {}
+    length = len(peptides[0])
+    chars = np.frombuffer("".join(peptides).encode("ascii"), dtype="S1").reshape(-1, length)
+    group_codes, group_names = pd.factorize(pd.Series(groups))
+    aa_codes, aa_names = np.unique(chars, return_inverse=True)
+    aa_codes = aa_codes.astype(str)
+    aa_idx = aa_names.reshape(chars.shape)
+
+    counts = np.zeros((len(group_names), length, len(aa_codes)), dtype=np.int64)
+    pos_idx = np.broadcast_to(np.arange(length), chars.shape)
+    np.add.at(counts, (np.broadcast_to(group_codes[:, None], chars.shape), pos_idx, aa_idx), 1)
+
+    pwms = {}
+    for g, name in enumerate(group_names):
+        present = counts[g].sum(axis=0) > 0
+        freq = counts[g][:, present] / counts[g].sum(axis=1, keepdims=True)
+        pwms[name] = pd.DataFrame(freq, columns=aa_codes[present])
+    return pwms
+
 def build_pwm(peptides):
     if len(peptides) == 0:
         return None
-    length = len(peptides[0])
-    counts = [defaultdict(int) for _ in range(length)]
-    for pep in peptides:
-        for i, aa in enumerate(pep):
-            counts[i][aa] += 1
-    pwm_data = {}
-    all_aas = sorted({aa for pos in counts for aa in pos.keys()})
-    for aa in all_aas:
-        pwm_data[aa] = [counts[i].get(aa, 0) for i in range(length)]
-    pwm_df = pd.DataFrame(pwm_data)
-    pwm_df = pwm_df / pwm_df.sum(axis=1).values[:, None]
-    return pwm_df
+    return build_pwms(peptides, [0] * len(peptides))[0]
+
+def pwm_digest(pwm_df):
+    """Empreinte de la PWM (et de la palette) : clé du cache des logos."""
+    h = hashlib.sha256()
+    h.update(pwm_df.round(12).to_csv().encode())
+    h.update(repr(sorted(AA_COLORS.items())).encode())
+    return h.hexdigest()
 
 def generate_logo(pwm_df):
     plt.figure(figsize=(max(6, pwm_df.shape[0]*0.6), 3))
@@ -49,6 +83,21 @@ def generate_logo(pwm_df):
     img_b64 = base64.b64encode(img_bytes).decode('utf-8')
     return img_b64
 
+def cached_logo(task):
+    """Worker : renvoie le logo base64 depuis le cache PNG, ou le dessine et l'y dépose."""
+    pwm_df, cache_dir = task
+    if cache_dir is None:
+        return generate_logo(pwm_df)
+    png_path = os.path.join(cache_dir, pwm_digest(pwm_df) + ".png")
+    if os.path.exists(png_path):
+        with open(png_path, "rb") as f:
+            return base64.b64encode(f.read()).decode("utf-8")
+    img_b64 = generate_logo(pwm_df)
+    with open(png_path + ".tmp", "wb") as f:
+        f.write(base64.b64decode(img_b64))
+    os.replace(png_path + ".tmp", png_path)
+    return img_b64
+
 def create_output_dir(path="output"):
     if not os.path.exists(path):
         os.makedirs(path)
@@ -67,38 +116,76 @@ def create_html(hla_logos, out_html_path):
     with open(out_html_path, "w") as f:
         f.write(html_header + content + html_footer)
 
-def main():
-    df = pd.read_csv("06_binders_final.tsv", sep='\t')
+def main(input_path="06_binders_final.tsv", out_html="08_seqlogos.html", workers=1, cache_dir="08_logo_cache",
+         store_path=None):
+    telemetry = Telemetry("08")
+    if store_path:
+        # Listes de binders par allèle précalculées par 06 (agrégat allele_binders)
+        with telemetry.step("query_store") as step:
+            store = BinderStore(store_path)
+            df_binders = store.allele_binders(["Peptide", "HLA", "Interpretation"])
+            store.close()
+            step.rows_out = telemetry.rows_in = len(df_binders)
+    else:
+        with telemetry.step("read_input") as step:
+            df = read_table(input_path, columns=["Peptide", "HLA", "Interpretation"], categorical=True)
+            step.rows_out = telemetry.rows_in = len(df)
 
-    df_binders = df[~df['Interpretation'].str.contains("Non-binder", case=False, na=False)]
+        df_binders = df[~df['Interpretation'].str.contains("Non-binder", case=False, na=False)]
     print(f"Nombre total de peptides binders : {len(df_binders)}")
 
-    hla_groups = df_binders.groupby('HLA')['Peptide'].apply(list)
+    # Sélection des allèles exploitables (>= 5 peptides, longueur unique)
+    stats = df_binders.assign(length=df_binders['Peptide'].str.len()).groupby('HLA', observed=True)['length'].agg(['size', 'nunique'])
+    kept = []
+    for hla, (n, n_lengths) in stats.iterrows():
+        if n < 5:
+            print(f"[INFO] Trop peu de peptides pour {hla} ({n}). Ignoré.")
+        elif n_lengths != 1:
+            print(f"[WARNING] Peptides de longueurs différentes pour {hla}, ignoré.")
+        else:
+            kept.append(hla)
+
+    # PWM de tous les allèles retenus, groupés par longueur de peptide
+    selected = df_binders[df_binders['HLA'].isin(kept)]
+    pwms = {}
+    with telemetry.step("build_pwms", rows_in=len(selected)) as step:
+        for _, group in selected.groupby(selected['Peptide'].str.len()):
+            pwms.update(build_pwms(group['Peptide'].astype(str).to_numpy(), group['HLA'].astype(str).to_numpy()))
+        step.rows_out = len(pwms)
+    hlas = [hla for hla in stats.index if hla in pwms]
+
+    # Rendu des logos en parallèle, PNG mis en cache par empreinte de PWM
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    tasks = [(pwms[hla], cache_dir) for hla in hlas]
+    with telemetry.step("render_logos", rows_in=len(tasks)) as step:
+        if workers > 1 and len(tasks) > 1:
+            with Pool(workers) as pool:
+                images = pool.map(cached_logo, tasks)
+        else:
+            images = [cached_logo(task) for task in tasks]
+        step.rows_out = telemetry.rows_out = len(images)
 
     hla_logos = {}
-    for hla, peptides in hla_groups.items():
-        if len(peptides) < 5:
-            print(f"[INFO] Trop peu de peptides pour {hla} ({len(peptides)}). Ignoré.")
-            continue
-        lengths = set(len(p) for p in peptides)
-        if len(lengths) != 1:
-            print(f"[WARNING] Peptides de longueurs différentes pour {hla}, ignoré.")
-            continue
-        pwm_df = build_pwm(peptides)
-        if pwm_df is None:
-            continue
-        logo_img_b64 = generate_logo(pwm_df)
-        hla_logos[hla] = (logo_img_b64, len(peptides))  # <-- on stocke aussi le n
+    for hla, logo_img_b64 in zip(hlas, images):
+        hla_logos[hla] = (logo_img_b64, int(stats.loc[hla, 'size']))  # <-- on stocke aussi le n
 
     if len(hla_logos) == 0:
         print("[WARNING] Aucun logo généré.")
         return
 
     create_output_dir()
-    out_html = "08_seqlogos.html"
-    create_html(hla_logos, out_html)
+    with telemetry.step("write_html", rows_in=len(hla_logos)):
+        create_html(hla_logos, out_html)
     print(f"[INFO] Logos générés et enregistrés dans {out_html}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Seqlogos des peptides binders par allèle HLA")
+    parser.add_argument("--input", default="06_binders_final.tsv", help="Table des prédictions (TSV ou Parquet)")
+    parser.add_argument("--output-html", default="08_seqlogos.html", help="Fichier HTML de sortie")
+    parser.add_argument("--workers", type=int, default=1, help="Nombre de processus pour le rendu des logos")
+    parser.add_argument("--cache_dir", default="08_logo_cache", help="Cache des PNG par empreinte de PWM ('' pour désactiver)")
+    parser.add_argument("--store", default=None, help="Base indexée des prédictions (06 --store) au lieu de --input")
+    args = parser.parse_args()
+    main(args.input, args.output_html, args.workers, args.cache_dir or None, args.store)
 
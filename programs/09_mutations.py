@@ -1,32 +1,49 @@
+## usage python 09_mutations.py [--input cosmic_somatic.tsv] [--output-html 09_mutations_plot.html] [--no_show]
+
+import argparse
 import pandas as pd
 import plotly.express as px
+from table_io import read_table
+from telemetry import Telemetry
+
+parser = argparse.ArgumentParser(description="Scatter interactif des mutations somatiques")
+parser.add_argument("--input", default="cosmic_somatic.tsv", help="Fichier TSV des mutations annotées Cosmic")
+parser.add_argument("--output-html", default="09_mutations_plot.html", help="Fichier HTML de sortie")
+parser.add_argument("--no_show", action="store_true", help="Ne pas ouvrir le graphique (exécution non interactive)")
+args = parser.parse_args()
+telemetry = Telemetry("09")
 
 # 1. Chargement des données depuis un fichier CSV ou TSV
-# Remplacez par le nom réel du fichier si nécessaire
-df = pd.read_csv("cosmic_somatic.tsv", sep="\t")
+with telemetry.step("read_input") as step:
+    df = read_table(args.input, columns=[
+        "CHROM", "POS", "GENE", "FREQ", "Annotation", "HGVS.c", "HGVS.p", "COSMIC_ID", "MUTATION_DESCRIPTION"
+    ])
+    step.rows_out = telemetry.rows_in = telemetry.rows_out = len(df)
 
 # 2. Nettoyage des types
 df['FREQ'] = pd.to_numeric(df['FREQ'], errors='coerce')
 df['POS'] = pd.to_numeric(df['POS'], errors='coerce')
 
-# 3. Création du scatter plot interactif
-fig = px.scatter(
-    df,
-    x="POS",
-    y="GENE",
-    color="GENE",
-    size="FREQ",
-    hover_data=[
-        "CHROM", "POS", "GENE", "FREQ", "Annotation", "HGVS.c", "HGVS.p", "COSMIC_ID" if "COSMIC_ID" in df.columns else "MUTATION_DESCRIPTION"
-    ],
-    title="Visualisation des mutations somatiques",
-    labels={"POS": "Position sur le chromosome", "GENE": "Gène", "FREQ": "Fréquence"},
-    template="plotly_white"
-)
-
-# 4. Exporter en HTML
-fig.write_html("09_mutations_plot.html")
+with telemetry.step("plot", rows_in=len(df)):
+    # 3. Création du scatter plot interactif
+    fig = px.scatter(
+        df,
+        x="POS",
+        y="GENE",
+        color="GENE",
+        size="FREQ",
+        hover_data=[
+            "CHROM", "POS", "GENE", "FREQ", "Annotation", "HGVS.c", "HGVS.p", "COSMIC_ID" if "COSMIC_ID" in df.columns else "MUTATION_DESCRIPTION"
+        ],
+        title="Visualisation des mutations somatiques",
+        labels={"POS": "Position sur le chromosome", "GENE": "Gène", "FREQ": "Fréquence"},
+        template="plotly_white"
+    )
+
+    # 4. Exporter en HTML
+    fig.write_html(args.output_html)
 
 # Afficher dans un notebook si souhaité
-fig.show()
+if not args.no_show:
+    fig.show()
 
@@ -1,18 +1,82 @@
-## usage python 10_scatter2.py --peptides peptides_9mer.tsv --binders 06_binders_final.tsv
+## usage python 10_scatter2.py --peptides peptides_9mer.tsv --binders 06_binders_final.tsv [--max_affinity 500] [--top_k 3]
+##       depuis la base indexée de 06 (binders seulement) : --store 06_binders.sqlite au lieu de --binders
 import pandas as pd
 import numpy as np
 import plotly.express as px
 import argparse
+from binder_store import BinderStore
+from table_io import read_table
+from telemetry import Telemetry
+
+# Colonnes projetées depuis la table peptides (et la table mutations en mode normalisé)
+PEPTIDE_COLUMNS = ["Mutation_ID", "Gene_Name", "HGVS.p", "FREQ", "MUT_9mer", "Mutant_AA_Position_in_9mer", "LEGACY_MUTATION_ID"]
+BINDER_COLUMNS = ["Peptide", "HLA", "Sequence_ID", "Affinity_nM", "Interpretation"]
+
+def join_binders(pep_unique, binder, max_affinity=None, predicted=None):
+    """
+    Jointure peptide -> binders par index de codes catégoriels.
+    Les non-binders (et les binders au-delà de `max_affinity`) sont écartés avant
+    la jointure ; un peptide absent de la table des prédictions garde une ligne
+    vide (comme la jointure gauche historique).
+    `predicted` : peptides prédits, si `binder` ne contient que les binders (base indexée).
+    """
+    predicted = pd.Categorical(binder['Peptide'] if predicted is None else predicted).categories
+    keep = ~binder['Interpretation'].str.contains("Non", na=False)
+    if max_affinity is not None:
+        keep &= binder['Affinity_nM'] <= max_affinity
+    binders_only = binder[keep].reset_index(drop=True)
+
+    # Index : binders regroupés par code de peptide (tri stable + bornes par searchsorted)
+    bind_codes = predicted.get_indexer(binders_only['Peptide'])
+    order = np.argsort(bind_codes, kind="stable")
+    sorted_codes = bind_codes[order]
+
+    pep_codes = predicted.get_indexer(pep_unique['MUT_9mer'])
+    starts = np.searchsorted(sorted_codes, pep_codes, side="left")
+    ends = np.searchsorted(sorted_codes, pep_codes, side="right")
+    n_match = np.where(pep_codes >= 0, ends - starts, 0)
+    # Peptide jamais prédit : une ligne sans binder
+    n_rows = np.where(pep_codes < 0, 1, n_match)
+
+    left_idx = np.repeat(np.arange(len(pep_unique)), n_rows)
+    offsets = np.arange(len(left_idx)) - np.repeat(np.cumsum(n_rows) - n_rows, n_rows)
+    matched = np.repeat(pep_codes >= 0, n_rows)
+    right_pos = np.full(len(left_idx), -1)
+    right_pos[matched] = order[(np.repeat(starts, n_rows) + offsets)[matched]]
+
+    left = pep_unique.iloc[left_idx].reset_index(drop=True)
+    right = binders_only.reindex(right_pos).reset_index(drop=True)
+    return pd.concat([left, right], axis=1)
 
 def main():
     parser = argparse.ArgumentParser(description="Analyse peptides et binders")
     parser.add_argument('--peptides', type=str, required=True, help="Fichier peptides TSV")
-    parser.add_argument('--binders', type=str, required=True, help="Fichier binders TSV")
+    parser.add_argument('--binders', type=str, default=None, help="Fichier binders TSV")
+    parser.add_argument('--store', type=str, default=None, help="Base indexée des prédictions (06 --store) au lieu de --binders")
+    parser.add_argument('--mutations', type=str, default=None, help="Table des mutations si --peptides est la sortie normalisée de 04")
+    parser.add_argument('--max_affinity', type=float, default=None, help="Ne garder que les binders d'affinité <= seuil (nM)")
+    parser.add_argument('--top_k', type=int, default=None, help="Ne garder que les k meilleurs binders par mutation")
     args = parser.parse_args()
+    if (args.binders is None) == (args.store is None):
+        parser.error("indiquer --binders ou --store")
+    telemetry = Telemetry("10")
 
     # 1. Lecture des fichiers
-    pep = pd.read_csv(args.peptides, sep="\t")
-    binder = pd.read_csv(args.binders, sep="\t")
+    with telemetry.step("read_input") as step:
+        pep = read_table(args.peptides, columns=PEPTIDE_COLUMNS)
+        if args.mutations:
+            # Sortie normalisée de 04 : rattacher les colonnes de mutation par Mutation_ID
+            pep = pep.merge(read_table(args.mutations, columns=PEPTIDE_COLUMNS), on="Mutation_ID", how="left")
+        predicted = None
+        if args.store:
+            # Agrégats de 06 : binders (allele_binders) et peptides prédits (predicted_peptides)
+            store = BinderStore(args.store)
+            binder = store.allele_binders(BINDER_COLUMNS, max_affinity=args.max_affinity)
+            predicted = store.predicted_peptides()
+            store.close()
+        else:
+            binder = read_table(args.binders, columns=BINDER_COLUMNS)
+        step.rows_out = telemetry.rows_in = len(pep) + len(binder)
 
     # 2. Créer colonne 'conca'
     pep['conca'] = pep['Gene_Name'] + "_" + pep['HGVS.p']
@@ -20,52 +84,51 @@ def main():
     # 3. Garder colonnes utiles et supprimer doublons
     pep_unique = pep[['conca', 'FREQ', 'MUT_9mer', 'Mutant_AA_Position_in_9mer','LEGACY_MUTATION_ID']].drop_duplicates()
 
-    # 4. Jointure many-to-many
-    merged = pd.merge(
-        pep_unique,
-        binder,
-        left_on='MUT_9mer',
-        right_on='Peptide',
-        how='left'
-    )
+    # 4. Jointure indexée peptide -> binders (non-binders filtrés avant la jointure)
+    with telemetry.step("join", rows_in=len(pep_unique)) as step:
+        filtered = join_binders(pep_unique, binder, args.max_affinity, predicted)
 
-    # 5. Filtrer les lignes sans "Non" dans Interpretation
-    filtered = merged[~merged['Interpretation'].str.contains("Non", na=False)].copy()
+        # 5. Optionnel : k meilleurs binders par mutation
+        if args.top_k is not None:
+            filtered = filtered.sort_values('Affinity_nM', kind="stable").groupby('conca', sort=False).head(args.top_k)
+            filtered = filtered.sort_index()
+        step.rows_out = telemetry.rows_out = len(filtered)
 
     # --- Export du dataset filtré ---
     filtered.to_csv("10_peptides_mutations.tsv", sep="\t", index=False)
     print("✅ Dataset filtré exporté dans '10_peptides_mutations.tsv'")
 
-    # 8. Graphique
-    fig = px.scatter(
-        filtered,
-        x='FREQ',
-        y='Affinity_nM',
-        color='HLA',
-        symbol='Interpretation',
-        hover_data=['conca', 'FREQ', 'MUT_9mer'],
-        title="Affinité en fonction de Frequence, couleur (HLA) et forme (Interpretation)",
-        log_y=True,
-        size_max=20
-    )
-
-    fig.update_layout(
-    xaxis_title="Frequency",
-    yaxis_title="Affinity (nM)",
-    showlegend=False
-    )
-
-
-
-    # 9. Ligne horizontale à y=50
-    fig.add_hline(
-        y=50,
-        line_dash="dash",
-        line_color="black"
-    )
-
-    # 10. Export HTML avec autoresize
-    fig.write_html("10_peptides_selection.html", full_html=True, include_plotlyjs='cdn', config={"responsive": True})
+    with telemetry.step("plot", rows_in=len(filtered)):
+        # 8. Graphique
+        fig = px.scatter(
+            filtered,
+            x='FREQ',
+            y='Affinity_nM',
+            color='HLA',
+            symbol='Interpretation',
+            hover_data=['conca', 'FREQ', 'MUT_9mer'],
+            title="Affinité en fonction de Frequence, couleur (HLA) et forme (Interpretation)",
+            log_y=True,
+            size_max=20
+        )
+
+        fig.update_layout(
+        xaxis_title="Frequency",
+        yaxis_title="Affinity (nM)",
+        showlegend=False
+        )
+
+
+
+        # 9. Ligne horizontale à y=50
+        fig.add_hline(
+            y=50,
+            line_dash="dash",
+            line_color="black"
+        )
+
+        # 10. Export HTML avec autoresize
+        fig.write_html("10_peptides_selection.html", full_html=True, include_plotlyjs='cdn', config={"responsive": True})
 
     print("✅ Graphique généré pour l'étape 10 avec redimensionnement dynamique")
 
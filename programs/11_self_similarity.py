@@ -0,0 +1,93 @@
+## usage : python 11_self_similarity.py --input peptides_9mer.tsv --index MANE.kmers [--cds_fasta MANE.GRCh38.v1.2.ensembl_protein.faa]
+##         [--output 11_peptides_self_similarity.tsv]
+##
+## Annote chaque peptide muté (MUT_9mer, toutes longueurs) par rapport au protéome normal :
+##   Self_Exact      le peptide muté existe tel quel ailleurs dans le protéome
+##   Self_Near_Count nombre de peptides normaux à une substitution près, hors peptide WT parent
+##   Self_Near       Self_Near_Count > 0
+## L'index k-mers (kmer_index.py) est construit au premier appel depuis --cds_fasta s'il est absent.
+## Une seule passe : paires (muté, WT) uniques regroupées par longueur, requêtes vectorisées par lots.
+
+import argparse
+import numpy as np
+import pandas as pd
+from kmer_index import BITS, INVALID, encode_peptides, open_index
+from table_io import read_table, write_table
+from telemetry import Telemetry
+
+ANNOTATION_COLUMNS = ["Self_Exact", "Self_Near_Count", "Self_Near"]
+
+
+def residue_differences(a, b, k):
+    """Nombre de positions différentes entre deux tableaux de k-mers packés."""
+    diff = a ^ b
+    count = np.zeros(len(diff), dtype=np.int64)
+    for j in range(k):
+        count += ((diff >> np.uint64(BITS * j)) & np.uint64(INVALID)) != 0
+    return count
+
+
+def annotate_peptides(mut, wt, indexes):
+    """
+    `mut`, `wt` : Series alignées de peptides mutés et WT (WT vide si inconnu).
+    Retourne Self_Exact, Self_Near_Count, Self_Near sur l'index de `mut`.
+    """
+    pairs = pd.DataFrame({"mut": mut.fillna("").astype(str), "wt": wt.fillna("").astype(str)})
+    unique = pairs.drop_duplicates().reset_index(drop=True)
+    unique["Self_Exact"] = False
+    unique["Self_Near_Count"] = 0
+    for k, rows in unique.groupby(unique["mut"].str.len()).groups.items():
+        if k not in indexes:
+            print(f"[WARNING] Pas d'index pour k = {k}, {len(rows)} peptides non annotés")
+            continue
+        index = indexes[k]
+        group = unique.loc[rows]
+        mut_code, mut_ok = encode_peptides(group["mut"].to_numpy(), k)
+        wt_code, wt_ok = encode_peptides(group["wt"].where(group["wt"].str.len() == k, "").to_numpy(), k)
+        exact = index.contains(mut_code) & mut_ok
+        near = np.where(mut_ok, index.neighbour_counts(mut_code), 0)
+        # Le WT parent (une substitution, présent dans le protéome) n'est pas un voisin informatif
+        parent = wt_ok & mut_ok & (residue_differences(mut_code, wt_code, k) == 1) & index.contains(wt_code)
+        unique.loc[rows, "Self_Exact"] = exact
+        unique.loc[rows, "Self_Near_Count"] = near - parent
+    annotated = pairs.merge(unique, on=["mut", "wt"], how="left")
+    annotated.index = mut.index
+    annotated["Self_Near"] = annotated["Self_Near_Count"] > 0
+    return annotated[ANNOTATION_COLUMNS]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Similarité des peptides mutés avec le protéome normal (index k-mers)")
+    parser.add_argument("--input", required=True, help="Table peptides de 04 (MUT_9mer, WT_9mer)")
+    parser.add_argument("--index", required=True, help="Préfixe de l'index k-mers (voir kmer_index.py)")
+    parser.add_argument("--cds_fasta", default=None, help="FASTA protéique MANE pour construire l'index s'il manque")
+    parser.add_argument("--output", default="11_peptides_self_similarity.tsv", help="Table annotée (TSV ou .parquet)")
+    args = parser.parse_args()
+    telemetry = Telemetry("11")
+
+    with telemetry.step("read_input") as step:
+        peptides = read_table(args.input)
+        step.rows_out = telemetry.rows_in = len(peptides)
+    mut = peptides["MUT_9mer"]
+    wt = peptides["WT_9mer"] if "WT_9mer" in peptides.columns else pd.Series("", index=peptides.index)
+    lengths = sorted(int(k) for k in mut.dropna().astype(str).str.len().unique())
+
+    with telemetry.step("open_index") as step:
+        indexes = open_index(args.index, lengths, args.cds_fasta)
+        step.rows_out = sum(len(index) for index in indexes.values())
+
+    with telemetry.step("annotate", rows_in=len(peptides)) as step:
+        annotations = annotate_peptides(mut, wt, indexes)
+        step.rows_out = int(annotations["Self_Near"].sum() + annotations["Self_Exact"].sum())
+    peptides = pd.concat([peptides.drop(columns=ANNOTATION_COLUMNS, errors="ignore"), annotations], axis=1)
+
+    with telemetry.step("write_output", rows_in=len(peptides)):
+        write_table(peptides, args.output)
+    telemetry.rows_out = len(peptides)
+    print(f"[INFO] {int(annotations['Self_Exact'].sum())} peptides présents dans le protéome normal, "
+          f"{int(annotations['Self_Near'].sum())} à une substitution d'un autre peptide normal")
+    print(f"✅ {len(peptides)} peptides annotés écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
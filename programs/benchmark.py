@@ -0,0 +1,281 @@
+## usage : python programs/benchmark.py [--sizes 1000,100000,1000000] [--workdir benchmark_runs]
+##         [--results benchmark_results.jsonl] [--stages 01,02,...] [--set 06="--engine subprocess --shards 8"]
+##
+## Banc d'essai sur cohorte synthétique : pour chaque taille (nombre de variants), génère
+##   df.csv (MAF), gbm.ann.vcf (sortie SnpEff simulée), un Cosmic Mutant Census réduit,
+##   un protéome jouet (FASTA MANE-like) et un faux mhcflurry-predict déterministe,
+## puis exécute les étapes 01 -> 11 (déclarées dans run_pipeline.py) une par une
+## en mesurant temps réel, temps CPU et pic de RSS de chaque processus.
+## Une ligne JSON par (taille, étape) est ajoutée à --results pour suivre les régressions ;
+## elle reprend les sous-étapes écrites par chaque script dans telemetry.jsonl.
+
+import argparse
+import json
+import os
+import platform
+import shlex
+import shutil
+import stat
+import subprocess
+import sys
+import time
+import numpy as np
+import pandas as pd
+from run_pipeline import PROGRAMS_DIR, pipeline_stages, parse_overrides
+from telemetry import DEFAULT_PATH as TELEMETRY_FILE, TELEMETRY_ENV
+
+# Ordre alphabétique (searchsorted)
+AMINO_ACIDS = np.frombuffer(b"ACDEFGHIKLMNPQRSTVWY", dtype=np.uint8)
+AA_1TO3 = {
+    'A': 'Ala', 'R': 'Arg', 'N': 'Asn', 'D': 'Asp', 'C': 'Cys', 'Q': 'Gln', 'E': 'Glu', 'G': 'Gly', 'H': 'His',
+    'I': 'Ile', 'L': 'Leu', 'K': 'Lys', 'M': 'Met', 'F': 'Phe', 'P': 'Pro', 'S': 'Ser', 'T': 'Thr', 'W': 'Trp',
+    'Y': 'Tyr', 'V': 'Val',
+}
+NUCLEOTIDES = np.array(list("ACGT"))
+PROTEIN_LENGTH = 400
+COSMIC_FILE = "Cosmic_MutantCensus_v102_GRCh38.tsv"
+PROTEOME_FILE = "synthetic_proteome.faa"
+
+# Faux mhcflurry-predict : affinité déterministe dérivée du hash (peptide, allèle), lecture en flux
+FAKE_PREDICTOR = '''#!{python}
+import csv, sys, zlib
+inp, out = sys.argv[1], sys.argv[sys.argv.index("--out") + 1]
+with open(inp, newline="") as fin, open(out, "w", newline="") as fout:
+    writer = csv.writer(fout)
+    writer.writerow(["allele", "peptide", "mhcflurry_affinity"])
+    for row in csv.DictReader(fin):
+        key = (row["peptide"] + row["allele"]).encode()
+        writer.writerow([row["allele"], row["peptide"], 10 + zlib.crc32(key) % 30000 / 3])
+'''
+
+
+def parse_sizes(text):
+    """'1k,100k,1M' ou '1000,100000' -> [1000, 100000, 1000000]"""
+    factors = {"k": 1_000, "m": 1_000_000}
+    sizes = []
+    for item in str(text).split(","):
+        item = item.strip().lower()
+        if item:
+            sizes.append(int(float(item[:-1]) * factors[item[-1]]) if item[-1] in factors else int(item))
+    return sizes
+
+
+def write_proteome(path, n_genes, rng):
+    """Protéome jouet : une protéine de PROTEIN_LENGTH résidus par gène, en-têtes au format MANE."""
+    residues = AMINO_ACIDS[rng.integers(len(AMINO_ACIDS), size=(n_genes, PROTEIN_LENGTH))]
+    residues[:, 0] = ord("M")
+    with open(path, "w") as f:
+        for i, row in enumerate(residues):
+            f.write(f">ENSP{i:011d}.1 pep transcript:ENST{i:011d}.1 gene_symbol:GENE{i}\n{row.tobytes().decode()}\n")
+    return residues
+
+
+def generate_cohort(workdir, n_variants, seed=0):
+    """Écrit les entrées synthétiques d'une cohorte de `n_variants` faux-sens dans `workdir`."""
+    rng = np.random.default_rng(seed)
+    n_genes = int(np.clip(n_variants // 20, 50, 20000))
+    residues = write_proteome(os.path.join(workdir, PROTEOME_FILE), n_genes, rng)
+
+    # Mutations : gène, position protéique, AA de référence (lu dans le protéome) et AA muté différent
+    gene = rng.integers(n_genes, size=n_variants)
+    aa_pos = rng.integers(2, PROTEIN_LENGTH + 1, size=n_variants)
+    ref_codes = residues[gene, aa_pos - 1]
+    ref_index = np.searchsorted(AMINO_ACIDS, ref_codes)
+    alt_codes = AMINO_ACIDS[(ref_index + rng.integers(1, len(AMINO_ACIDS), size=n_variants)) % len(AMINO_ACIDS)]
+    ref_aa = ref_codes.view("S1").astype(str)
+    alt_aa = alt_codes.view("S1").astype(str)
+
+    # Coordonnées génomiques uniques : une clé (CHROM, POS, REF, ALT) par variant
+    chrom = (gene % 22 + 1).astype(str)
+    chrom_start = 10_000 + np.arange(n_variants, dtype=np.int64) * 7
+    ref_nt_index = rng.integers(4, size=n_variants)
+    ref_nt = NUCLEOTIDES[ref_nt_index]
+    alt_nt = NUCLEOTIDES[(ref_nt_index + rng.integers(1, 4, size=n_variants)) % 4]
+    freq = np.round(rng.random(n_variants), 4)
+
+    gene_name = pd.Series(gene).map("GENE{}".format)
+    transcript = pd.Series(gene).map("ENST{:011d}.1".format)
+    pos = pd.Series(aa_pos).astype(str)
+    hgvs_p = "p." + pd.Series(ref_aa).map(AA_1TO3) + pos + pd.Series(alt_aa).map(AA_1TO3)
+    hgvs_c = "c." + pd.Series(3 * (aa_pos - 1) + 1).astype(str) + ref_nt + ">" + alt_nt
+
+    maf = pd.DataFrame({
+        "chrom": chrom, "chromStart": chrom_start, "dbSNP_RS": "",
+        "Reference_Allele": ref_nt, "Tumor_Seq_Allele2": alt_nt,
+        "Hugo_Symbol": gene_name, "Variant_Classification": "Missense_Mutation", "freq": freq,
+    })
+    maf.to_csv(os.path.join(workdir, "df.csv"), sep="\t", index=False)
+
+    # Sortie SnpEff simulée : VCF de 01 + champ ANN (un transcrit MANE par variant)
+    ann = (
+        alt_nt + "|missense_variant|MODERATE|" + gene_name + "|ENSG" + pd.Series(gene).map("{:011d}".format)
+        + "|transcript|" + transcript + "|protein_coding|1/1|" + hgvs_c + "|" + hgvs_p
+        + "|" + pos + "/" + str(PROTEIN_LENGTH) + "|" + pos + "/" + str(PROTEIN_LENGTH)
+        + "|" + pos + "/" + str(PROTEIN_LENGTH) + "||"
+    )
+    vcf = pd.DataFrame({
+        "#CHROM": chrom, "POS": chrom_start + 1, "ID": ".", "REF": ref_nt, "ALT": alt_nt,
+        "QUAL": ".", "FILTER": ".",
+        "INFO": "GENE=" + gene_name + ";TYPE=Missense_Mutation;FREQ=" + pd.Series(freq).astype(str) + ";ANN=" + ann,
+    })
+    with open(os.path.join(workdir, "gbm.ann.vcf"), "w") as f:
+        f.write("##fileformat=VCFv4.2\n")
+        f.write("##INFO=<ID=GENE,Number=1,Type=String,Description=\"Gene symbol\">\n")
+        f.write("##INFO=<ID=TYPE,Number=1,Type=String,Description=\"Variant classification\">\n")
+        f.write("##INFO=<ID=FREQ,Number=1,Type=Float,Description=\"Allele frequency in tumor samples\">\n")
+        f.write("##INFO=<ID=ANN,Number=.,Type=String,Description=\"Functional annotations (synthetic)\">\n")
+        vcf.to_csv(f, sep="\t", index=False)
+
+    # Cosmic réduit : les variants de la cohorte (90 % confirmés somatiques) + autant de lignes leurres
+    status = np.where(rng.random(n_variants) < 0.9, "Confirmed somatic variant", "Reported in another cancer sample as somatic")
+    cohort_rows = pd.DataFrame({
+        "GENE_SYMBOL": gene_name, "CHROMOSOME": chrom, "GENOME_START": chrom_start + 1, "GENOME_STOP": chrom_start + 1,
+        "GENOMIC_WT_ALLELE": ref_nt, "GENOMIC_MUT_ALLELE": alt_nt, "MUTATION_DESCRIPTION": "missense_variant",
+        "MUTATION_SOMATIC_STATUS": status, "LEGACY_MUTATION_ID": pd.Series(np.arange(n_variants)).map("COSM{}".format),
+        "MUTATION_AA": hgvs_p, "MUTATION_CDS": hgvs_c,
+    })
+    decoys = cohort_rows.assign(
+        GENOME_START=cohort_rows["GENOME_START"] + 3, GENOME_STOP=cohort_rows["GENOME_STOP"] + 3,
+        LEGACY_MUTATION_ID=pd.Series(np.arange(n_variants, 2 * n_variants)).map("COSM{}".format),
+    )
+    pd.concat([cohort_rows, decoys]).sample(frac=1, random_state=seed).to_csv(
+        os.path.join(workdir, COSMIC_FILE), sep="\t", index=False
+    )
+
+    # Faux prédicteur placé en tête du PATH des étapes
+    bin_dir = os.path.join(workdir, "bin")
+    os.makedirs(bin_dir, exist_ok=True)
+    predictor_path = os.path.join(bin_dir, "mhcflurry-predict")
+    with open(predictor_path, "w") as f:
+        f.write(FAKE_PREDICTOR.format(python=sys.executable))
+    os.chmod(predictor_path, os.stat(predictor_path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return bin_dir
+
+
+def count_rows(path):
+    """Nombre de lignes de données d'une sortie (TSV/CSV, VCF, FASTA) ; None pour les autres formats."""
+    if not os.path.isfile(path):
+        return None
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".tsv", ".csv"):
+        with open(path, "rb") as f:
+            return max(sum(1 for _ in f) - 1, 0)
+    if ext == ".vcf":
+        with open(path, "rb") as f:
+            return sum(1 for line in f if not line.startswith(b"#"))
+    if ext in (".fasta", ".faa", ".fa"):
+        with open(path, "rb") as f:
+            return sum(1 for line in f if line.startswith(b">"))
+    if ext in (".parquet", ".pq"):
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    return None
+
+
+def measure(cmd, cwd, env, log_path):
+    """Lance `cmd` et retourne (code retour, temps réel, temps CPU, pic RSS en Mo) via wait4."""
+    start = time.perf_counter()
+    with open(log_path, "w") as log:
+        proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss en Ko sous Linux, en octets sous macOS ; inclut les sous-processus attendus
+    rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return proc.returncode, wall, usage.ru_utime + usage.ru_stime, rss_mb
+
+
+def read_steps(path, offset):
+    """Sous-étapes ajoutées au fichier de télémétrie depuis `offset` (hors ligne "total")."""
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        f.seek(offset)
+        entries = [json.loads(line) for line in f if line.strip()]
+    keep = ("step", "wall_s", "cpu_s", "peak_rss_mb", "rows_in", "rows_out", "rows_per_s")
+    return [{k: e.get(k) for k in keep} for e in entries if e.get("step") != "total"]
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROGRAMS_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_scale(n_variants, workdir, stages_filter, overrides, seed):
+    """Génère la cohorte puis chronomètre chaque étape ; retourne une liste d'enregistrements."""
+    scale_dir = os.path.abspath(os.path.join(workdir, f"n{n_variants}"))
+    shutil.rmtree(scale_dir, ignore_errors=True)
+    os.makedirs(scale_dir)
+
+    start = time.perf_counter()
+    bin_dir = generate_cohort(scale_dir, n_variants, seed)
+    print(f"[INFO] Cohorte synthétique de {n_variants} variants générée en {time.perf_counter() - start:.1f} s")
+
+    telemetry_path = os.path.join(scale_dir, TELEMETRY_FILE)
+    env = dict(os.environ, PATH=bin_dir + os.pathsep + os.environ.get("PATH", ""), MPLBACKEND="Agg")
+    env[TELEMETRY_ENV] = telemetry_path
+    stages = pipeline_stages(COSMIC_FILE, PROTEOME_FILE)
+    records = []
+    for stage in stages:
+        if stages_filter and stage["name"] not in stages_filter:
+            continue
+        args = stage["args"] + overrides.get(stage["name"], [])
+        cmd = [sys.executable, os.path.join(PROGRAMS_DIR, stage["script"])] + args
+        log_path = os.path.join(scale_dir, f"{stage['name']}_{os.path.splitext(stage['script'])[0]}.log")
+        print(f"[INFO] n={n_variants} étape {stage['name']} : {' '.join(shlex.quote(c) for c in cmd[1:])}")
+        offset = os.path.getsize(telemetry_path) if os.path.exists(telemetry_path) else 0
+        code, wall, cpu, rss = measure(cmd, scale_dir, env, log_path)
+        rows_in = {p: count_rows(os.path.join(scale_dir, p)) for p in stage["inputs"]}
+        rows_out = {p: count_rows(os.path.join(scale_dir, p)) for p in stage["outputs"]}
+        main_in = next((n for n in rows_in.values() if n is not None), None)
+        records.append({
+            "n_variants": n_variants, "stage": stage["name"], "script": stage["script"], "args": args,
+            "returncode": code, "wall_s": round(wall, 3), "cpu_s": round(cpu, 3), "peak_rss_mb": round(rss, 1),
+            "rows_in": rows_in, "rows_out": rows_out,
+            "rows_per_s": round(main_in / wall, 1) if main_in and wall > 0 else None,
+            "steps": read_steps(telemetry_path, offset),
+        })
+        print(f"[INFO]   {wall:.2f} s réel, {cpu:.2f} s CPU, pic RSS {rss:.0f} Mo")
+        if code != 0:
+            print(f"[ERROR] Étape {stage['name']} en échec (code {code}), voir {log_path} ; étapes suivantes non mesurées")
+            break
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des étapes 01 à 11 sur cohortes synthétiques")
+    parser.add_argument("--sizes", type=parse_sizes, default=[1_000, 100_000, 1_000_000],
+                        help="Nombres de variants, séparés par des virgules (ex. 1k,100k,1M)")
+    parser.add_argument("--workdir", default="benchmark_runs", help="Répertoire des cohortes générées")
+    parser.add_argument("--results", default="benchmark_results.jsonl", help="Fichier JSON lines des mesures (ajout)")
+    parser.add_argument("--stages", default=None, help="Étapes à mesurer, séparées par des virgules (défaut : toutes)")
+    parser.add_argument("--set", action="append", metavar="ETAPE=ARGS", help="Arguments supplémentaires d'une étape")
+    parser.add_argument("--seed", type=int, default=0, help="Graine de génération de la cohorte")
+    parser.add_argument("--keep", action="store_true", help="Garder les cohortes générées après mesure")
+    args = parser.parse_args()
+
+    stages_filter = set(args.stages.split(",")) if args.stages else None
+    overrides = parse_overrides(args.set)
+    run_info = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "git_revision": git_revision(),
+        "host": platform.node(), "python": platform.python_version(), "cpu_count": os.cpu_count(),
+        "seed": args.seed,
+    }
+
+    os.makedirs(args.workdir, exist_ok=True)
+    for n_variants in args.sizes:
+        records = run_scale(n_variants, args.workdir, stages_filter, overrides, args.seed)
+        with open(args.results, "a") as f:
+            for record in records:
+                f.write(json.dumps({**run_info, **record}) + "\n")
+        if not args.keep:
+            shutil.rmtree(os.path.join(args.workdir, f"n{n_variants}"), ignore_errors=True)
+
+    print(f"✅ Mesures ajoutées à {args.results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+## usage : python binder_store.py --build 06_binders_final.tsv --store 06_binders.sqlite
+##         python binder_store.py --store 06_binders.sqlite --gene EGFR --hla "HLA-A*68:01" --interpretation "Strong binder"
+##         python binder_store.py --store 06_binders.sqlite --counts [--output counts.tsv]
+##         python binder_store.py --store 06_binders.sqlite --best_by_mutation [--output best.tsv]
+##
+## Table des prédictions de 06 en base SQLite indexée (écrite par 06 --store) :
+##   colonnes de 06_binders_final (Sequence_ID, Peptide, HLA, Affinity_nM, Interpretation)
+##   + Gene, Transcript_ID, CHROM, POS, REF, ALT tirés de l'identifiant FASTA de 05
+##   + Bucket : 0 Strong binder, 1 Weak binder, 2 Non-binder
+## Index : Peptide, Sequence_ID, (HLA, Bucket), (Gene, HLA, Bucket), (Bucket, HLA).
+## Agrégats calculés à l'écriture de la base (même transaction), lus par les rapports 07 / 08 / 10 (--store) :
+##   allele_counts       HLA x Bucket x Gene -> Count (07 : comptes par HLA et interprétation)
+##   allele_binders      lignes strong / weak binders, indexées par HLA (08 : logos, 10 : jointure)
+##   mutation_best       meilleur binder (affinité minimale) par variant CHROM, POS, REF, ALT
+##   predicted_peptides  peptides prédits : N_Predictions, Best_Affinity_nM (10 : peptides jamais prédits)
+## Le temps des rapports dépend de la taille des agrégats, pas de celle de la table brute.
+## Les lignes sont rendues dans l'ordre de 06_binders_final (rowid).
+
+import argparse
+import os
+import sqlite3
+import pandas as pd
+from delta import SEQ_ID_VARIANT
+from table_io import read_table, write_table
+
+BUCKETS = {"Strong binder": 0, "Weak binder": 1, "Non-binder": 2}
+STORE_COLUMNS = [
+    "Sequence_ID", "Peptide", "HLA", "Affinity_nM", "Interpretation", "Bucket",
+    "Gene", "Transcript_ID", "CHROM", "POS", "REF", "ALT",
+]
+INDEXES = {
+    "idx_peptide": "Peptide",
+    "idx_sequence": "Sequence_ID",
+    "idx_hla_bucket": "HLA, Bucket",
+    "idx_gene": "Gene, HLA, Bucket",
+    "idx_bucket_hla": "Bucket, HLA",
+}
+AGGREGATES = {
+    "allele_counts": "SELECT HLA, Bucket, Gene, COUNT(*) AS Count FROM binders GROUP BY HLA, Bucket, Gene",
+    "allele_binders": (
+        "SELECT Sequence_ID, Peptide, HLA, Affinity_nM, Interpretation, Bucket FROM binders "
+        "WHERE Bucket < 2 ORDER BY rowid"
+    ),
+    "mutation_best": (
+        "SELECT CHROM, POS, REF, ALT, Gene, Transcript_ID, Sequence_ID, Peptide, HLA, Affinity_nM, Interpretation "
+        "FROM (SELECT *, ROW_NUMBER() OVER ("
+        "PARTITION BY COALESCE(CHROM || ':' || POS || ':' || REF || ':' || ALT, Sequence_ID) "
+        "ORDER BY Affinity_nM, rowid) AS rank FROM binders WHERE Affinity_nM IS NOT NULL) "
+        "WHERE rank = 1 ORDER BY Affinity_nM"
+    ),
+    "predicted_peptides": (
+        "SELECT Peptide, COUNT(*) AS N_Predictions, MIN(Affinity_nM) AS Best_Affinity_nM "
+        "FROM binders GROUP BY Peptide ORDER BY Peptide"
+    ),
+}
+AGGREGATE_INDEXES = {
+    "idx_counts_hla": "allele_counts (HLA, Bucket, Gene)",
+    "idx_allele_binders_hla": "allele_binders (HLA)",
+}
+# Colonnes de l'agrégat allele_binders et filtres qu'il sert (les autres passent par binders)
+ALLELE_BINDER_COLUMNS = ["Sequence_ID", "Peptide", "HLA", "Affinity_nM", "Interpretation", "Bucket"]
+ALLELE_BINDER_FILTERS = {"hla", "interpretation", "peptide", "sequence_id", "binders_only", "max_affinity"}
+# Comptes servis par allele_counts tant que groupes et filtres restent dans ces colonnes
+COUNT_KEYS = {"HLA", "Interpretation", "Gene"}
+COUNT_FILTERS = {"gene", "hla", "interpretation", "binders_only"}
+# Identifiant FASTA de 05 : <gène>_<transcrit>_pos<position>_chr<CHROM>_<POS>_<REF>><ALT>
+SEQ_ID_GENE = r"^(?P<Gene>.+?)_(?P<Transcript_ID>[^_]+)_pos[^_]+_chr"
+
+
+def store_table(binders):
+    """Table 06_binders_final -> lignes de la base (bucket et colonnes tirées de Sequence_ID)."""
+    seq_ids = binders["Sequence_ID"].astype(str)
+    table = pd.concat([
+        binders[["Sequence_ID", "Peptide", "HLA", "Affinity_nM", "Interpretation"]].reset_index(drop=True),
+        seq_ids.str.extract(SEQ_ID_GENE).reset_index(drop=True),
+        seq_ids.str.extract(SEQ_ID_VARIANT).reset_index(drop=True),
+    ], axis=1)
+    table["Bucket"] = table["Interpretation"].astype(str).map(BUCKETS).fillna(BUCKETS["Non-binder"]).astype(int)
+    table["POS"] = pd.to_numeric(table["POS"], errors="coerce").astype("Int64")
+    for col in ["Sequence_ID", "Peptide", "HLA", "Interpretation"]:
+        table[col] = table[col].astype(str)
+    return table[STORE_COLUMNS]
+
+
+def write_store(binders, path):
+    """(Re)construit la base : écriture dans un fichier temporaire puis remplacement atomique."""
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    con = sqlite3.connect(tmp_path)
+    try:
+        con.execute("PRAGMA journal_mode = OFF")
+        con.execute("PRAGMA synchronous = OFF")
+        con.execute(
+            "CREATE TABLE binders (Sequence_ID TEXT, Peptide TEXT, HLA TEXT, Affinity_nM REAL, "
+            "Interpretation TEXT, Bucket INTEGER, Gene TEXT, Transcript_ID TEXT, "
+            "CHROM TEXT, POS INTEGER, REF TEXT, ALT TEXT)"
+        )
+        table = store_table(binders).astype(object).where(lambda t: t.notna(), None)
+        con.executemany(
+            f"INSERT INTO binders VALUES ({', '.join('?' * len(STORE_COLUMNS))})",
+            table.itertuples(index=False, name=None),
+        )
+        for name, columns in INDEXES.items():
+            con.execute(f"CREATE INDEX {name} ON binders ({columns})")
+        for name, sql in AGGREGATES.items():
+            con.execute(f"CREATE TABLE {name} AS {sql}")
+        for name, target in AGGREGATE_INDEXES.items():
+            con.execute(f"CREATE INDEX {name} ON {target}")
+        con.execute("ANALYZE")
+        con.commit()
+    finally:
+        con.close()
+    os.replace(tmp_path, path)
+    print(f"[INFO] Base des prédictions : {path} ({len(binders)} lignes)")
+
+
+class BinderStore:
+    """Requêtes indexées sur la base des prédictions."""
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Base des prédictions introuvable : {path}")
+        self.path = path
+        self.con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+    @staticmethod
+    def _where(gene=None, hla=None, interpretation=None, peptide=None, sequence_id=None,
+               binders_only=False, max_affinity=None):
+        """Clause WHERE et paramètres ; listes acceptées pour gene / hla / peptide / sequence_id."""
+        clauses, params = [], []
+        for column, value in [("Gene", gene), ("HLA", hla), ("Peptide", peptide), ("Sequence_ID", sequence_id)]:
+            if value is None:
+                continue
+            values = [value] if isinstance(value, str) else list(value)
+            clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params += values
+        if interpretation is not None:
+            clauses.append("Bucket = ?")
+            params.append(BUCKETS[interpretation])
+        if binders_only:
+            clauses.append("Bucket < ?")
+            params.append(BUCKETS["Non-binder"])
+        if max_affinity is not None:
+            clauses.append("Affinity_nM <= ?")
+            params.append(float(max_affinity))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query(self, columns=None, limit=None, table="binders", **filters):
+        """Lignes filtrées (voir _where) de `table`, dans l'ordre de 06_binders_final."""
+        where, params = self._where(**filters)
+        selected = ", ".join(columns) if columns else ", ".join(STORE_COLUMNS) if table == "binders" else "*"
+        sql = f"SELECT {selected} FROM {table}{where} ORDER BY rowid"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return pd.read_sql_query(sql, self.con, params=params)
+
+    def counts(self, by=("HLA", "Interpretation"), **filters):
+        """
+        Nombre de lignes par groupe ; Interpretation est regroupée via Bucket.
+        Lu dans l'agrégat allele_counts quand groupes et filtres le permettent, sinon dans binders.
+        """
+        where, params = self._where(**filters)
+        keys = ", ".join("Bucket" if k == "Interpretation" else k for k in by)
+        active = {name for name, value in filters.items() if value not in (None, False)}
+        if set(by) <= COUNT_KEYS and active <= COUNT_FILTERS:
+            sql = f"SELECT {keys}, SUM(Count) AS Count FROM allele_counts{where} GROUP BY {keys}"
+        else:
+            sql = f"SELECT {keys}, COUNT(*) AS Count FROM binders{where} GROUP BY {keys}"
+        counts = pd.read_sql_query(sql, self.con, params=params)
+        if "Interpretation" in by:
+            names = {code: name for name, code in BUCKETS.items()}
+            counts = counts.rename(columns={"Bucket": "Interpretation"})
+            counts["Interpretation"] = counts["Interpretation"].map(names)
+        return counts.sort_values(list(by)).reset_index(drop=True)
+
+    def allele_binders(self, columns=None, **filters):
+        """
+        Strong / weak binders, dans l'ordre de 06_binders_final : agrégat allele_binders, ou table
+        binders (Bucket < 2) si un filtre porte sur une colonne absente de l'agrégat (gene).
+        """
+        columns = columns or ALLELE_BINDER_COLUMNS
+        active = {name for name, value in filters.items() if value not in (None, False)}
+        if active <= ALLELE_BINDER_FILTERS:
+            return self.query(columns, table="allele_binders", **filters)
+        return self.query(columns, **dict(filters, binders_only=True))
+
+    def best_by_mutation(self):
+        """Meilleur binder de chaque variant (agrégat mutation_best)."""
+        return pd.read_sql_query("SELECT * FROM mutation_best", self.con)
+
+    def predicted_peptides(self):
+        """Peptides présents dans les prédictions (agrégat predicted_peptides)."""
+        return [row[0] for row in self.con.execute("SELECT Peptide FROM predicted_peptides")]
+
+    def distinct(self, column, **filters):
+        where, params = self._where(**filters)
+        rows = self.con.execute(f"SELECT DISTINCT {column} FROM binders{where}", params).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        self.con.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Base SQLite indexée des prédictions de 06 et requêtes")
+    parser.add_argument("--store", default="06_binders.sqlite", help="Base des prédictions")
+    parser.add_argument("--build", default=None, help="Construire la base depuis 06_binders_final (TSV ou Parquet)")
+    parser.add_argument("--gene", action="append", default=None, help="Gène (répétable)")
+    parser.add_argument("--hla", action="append", default=None, help="Allèle HLA (répétable)")
+    parser.add_argument("--peptide", action="append", default=None, help="Peptide (répétable)")
+    parser.add_argument("--sequence_id", action="append", default=None, help="Identifiant FASTA (répétable)")
+    parser.add_argument("--interpretation", choices=list(BUCKETS), default=None, help="Classe d'affinité")
+    parser.add_argument("--binders_only", action="store_true", help="Strong et weak binders seulement")
+    parser.add_argument("--max_affinity", type=float, default=None, help="Affinité maximale (nM)")
+    parser.add_argument("--counts", action="store_true", help="Comptes par HLA et interprétation au lieu des lignes")
+    parser.add_argument("--best_by_mutation", action="store_true", help="Meilleur binder de chaque variant")
+    parser.add_argument("--limit", type=int, default=None, help="Nombre maximal de lignes")
+    parser.add_argument("--output", default=None, help="Table de sortie (TSV ou .parquet) ; affichage sinon")
+    args = parser.parse_args()
+
+    if args.build:
+        write_store(read_table(args.build), args.store)
+    else:
+        store = BinderStore(args.store)
+        filters = dict(gene=args.gene, hla=args.hla, peptide=args.peptide, sequence_id=args.sequence_id,
+                       interpretation=args.interpretation, binders_only=args.binders_only,
+                       max_affinity=args.max_affinity)
+        if args.best_by_mutation:
+            result = store.best_by_mutation()
+        elif args.counts:
+            result = store.counts(**filters)
+        else:
+            result = store.query(limit=args.limit, **filters)
+        store.close()
+        if args.output:
+            write_table(result, args.output)
+            print(f"✅ {len(result)} lignes écrites dans {args.output}")
+        else:
+            print(result.to_string(index=False))
@@ -0,0 +1,202 @@
+## Traitement incrémental (run_pipeline.py --incremental) : seuls les variants nouveaux ou modifiés
+## repassent par les étapes 02 -> 06, les variants disparus sont retirés des sorties existantes.
+##
+## Clé d'un variant : CHROM:POS:REF:ALT, retrouvée selon le format du fichier
+##   VCF    colonnes #CHROM, POS, REF, ALT de chaque ligne de variant
+##   table  colonnes CHROM, POS, REF, ALT (TSV ou Parquet, voir table_io.py)
+##   FASTA  suffixe _chr<CHROM>_<POS>_<REF>><ALT> des identifiants écrits par 05
+## Manifeste par étape : .delta/<étape>.manifest.tsv (key, digest), empreinte des lignes d'entrée de
+## chaque variant combinée au contexte de l'étape (script, paramètres, entrées non découpées) :
+## si le contexte change, tous les variants sont retraités.
+## Fusion : les lignes des variants inchangés sont recopiées telles quelles (texte brut, sans relecture
+## typée) et les lignes fusionnées sont rangées dans l'ordre des variants de l'entrée, comme un run complet.
+
+import gzip
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+from proteome_store import iter_fasta
+from table_io import is_parquet, read_table, table_columns, write_table
+
+DELTA_DIR = ".delta"
+VARIANT_KEY = ["CHROM", "POS", "REF", "ALT"]
+# Colonnes de l'identifiant FASTA (sequence_id) et valeurs par défaut si absentes
+SEQUENCE_ID_COLUMNS = [
+    ("Gene_Name", "NA"), ("Transcript_ID", "NA"), ("Mutant_AA_Position_in_9mer", "NA"),
+    ("CHROM", "NA"), ("POS", "NA"), ("REF", "X"), ("ALT", "X"),
+]
+# Clé génomique dans l'identifiant FASTA écrit par 05 (..._chr<CHROM>_<POS>_<REF>><ALT>)
+SEQ_ID_VARIANT = r"_chr(?P<CHROM>[^_]+)_(?P<POS>\d+)_(?P<REF>[^_>]+)>(?P<ALT>[^_>]+)$"
+
+
+def file_kind(path):
+    name = str(path).lower()
+    if name.endswith((".vcf", ".vcf.gz")):
+        return "vcf"
+    if name.endswith((".fasta", ".fa", ".faa")):
+        return "fasta"
+    return "table"
+
+
+def key_strings(chrom, pos, ref, alt):
+    """Colonnes CHROM, POS, REF, ALT -> clés 'CHROM:POS:REF:ALT'."""
+    return (chrom.astype(str) + ":" + pos.astype(str) + ":" + ref.astype(str) + ":" + alt.astype(str)).reset_index(drop=True)
+
+
+def sanitize(text):
+    """Nettoie les chaînes pour en faire des identifiants valides pour FASTA"""
+    return str(text).replace(" ", "_").replace(".", "_").replace("/", "_")
+
+
+def sequence_id(gene, transcript, pos_in_peptide, chrom, pos, ref, alt):
+    """Identifiant FASTA d'une fenêtre mutée (05), terminé par la clé du variant lue par SEQ_ID_VARIANT."""
+    return f"{sanitize(gene)}_{sanitize(transcript)}_pos{pos_in_peptide}_chr{chrom}_{pos}_{ref}>{alt}"
+
+
+def sequence_keys(seq_ids):
+    """Identifiants FASTA de 05 -> clés de variant."""
+    parts = pd.Series(seq_ids, dtype=object).astype(str).str.extract(SEQ_ID_VARIANT)
+    return key_strings(*(parts[c] for c in VARIANT_KEY))
+
+
+def table_keys(header, lines):
+    """Lignes brutes d'une table TSV -> clés de variant (colonnes CHROM, POS, REF, ALT de l'en-tête)."""
+    columns = header.rstrip("\r\n").split("\t")
+    index = [columns.index(c) for c in VARIANT_KEY]
+    if len(lines) == 0:
+        return pd.Series(dtype=object)
+    fields = lines.str.rstrip("\r\n").str.split("\t", n=max(index) + 1, expand=True)
+    return key_strings(*(fields[i] for i in index))
+
+
+def read_keyed(path):
+    """
+    Lit un fichier découpable par variant : (en-tête, données, clés alignées sur les données).
+    VCF : lignes de variants ; FASTA : enregistrements ; table TSV : lignes brutes (fins de ligne
+    comprises, sans relecture typée) ; Parquet : DataFrame.
+    """
+    kind = file_kind(path)
+    if kind == "vcf":
+        header, lines = [], []
+        with (gzip.open(path, "rt") if path.endswith(".gz") else open(path)) as f:
+            for line in f:
+                (header if line.startswith("#") else lines).append(line)
+        data = pd.Series(lines, dtype=object)
+        fields = data.str.split("\t", n=5, expand=True) if lines else pd.DataFrame(columns=range(5))
+        return "".join(header), data, key_strings(fields[0], fields[1], fields[3], fields[4])
+    if kind == "fasta":
+        records = list(iter_fasta(path))
+        data = pd.Series([f">{desc}\n{seq}\n" for desc, seq in records], dtype=object)
+        return "", data, sequence_keys([desc for desc, _ in records])
+    if is_parquet(path):
+        data = read_table(path).reset_index(drop=True)
+        return "", data, key_strings(*(data[c] for c in VARIANT_KEY))
+    with open(path, newline="") as f:
+        header = f.readline()
+        data = pd.Series(f.readlines(), dtype=object)
+    return header, data, table_keys(header, data)
+
+
+def write_keyed(path, header, data):
+    """Écriture atomique d'un fichier lu par read_keyed (VCF écrit non compressé)."""
+    if is_parquet(path):
+        write_table(data, path)
+        return
+    with open(path + ".tmp", "w", newline="") as f:
+        f.write(header)
+        f.writelines(data)
+    os.replace(path + ".tmp", path)
+
+
+def table_header(path):
+    """Colonnes d'une table découpable par variant (None pour un VCF ou un FASTA)."""
+    return table_columns(path) if file_kind(path) == "table" else None
+
+
+def variant_digests(data, keys, context):
+    """Empreinte (hex) des lignes de chaque variant, combinée au contexte de l'étape."""
+    if len(data) == 0:
+        return pd.Series(dtype=object)
+    frame = data.to_frame() if isinstance(data, pd.Series) else data
+    rows = pd.util.hash_pandas_object(frame.astype(str), index=False).to_numpy()
+    salt = int(hashlib.sha256(context.encode()).hexdigest()[:16], 16)
+    digests = pd.Series(rows, index=keys.to_numpy()).groupby(level=0).sum() ^ salt
+    return digests.map("{:016x}".format)
+
+
+def manifest_path(stage):
+    return os.path.join(DELTA_DIR, f"{stage}.manifest.tsv")
+
+
+def load_manifest(stage):
+    path = manifest_path(stage)
+    if not os.path.exists(path):
+        return pd.Series(dtype=object)
+    manifest = pd.read_csv(path, sep="\t", dtype=str, keep_default_na=False)
+    return pd.Series(manifest["digest"].to_numpy(), index=manifest["key"].to_numpy())
+
+
+def save_manifest(stage, digests):
+    path = manifest_path(stage)
+    os.makedirs(DELTA_DIR, exist_ok=True)
+    pd.DataFrame({"key": digests.index, "digest": digests.to_numpy()}).to_csv(path + ".tmp", sep="\t", index=False)
+    os.replace(path + ".tmp", path)
+
+
+def diff_manifest(digests, manifest):
+    """(clés nouvelles ou modifiées, clés disparues) par rapport au manifeste."""
+    previous = manifest.reindex(digests.index)
+    changed = digests.index[previous.isna().to_numpy() | (previous.to_numpy() != digests.to_numpy())]
+    removed = manifest.index.difference(digests.index)
+    return pd.Index(changed), removed
+
+
+def write_keys(path, keys):
+    """Clés de variant -> table CHROM, POS, REF, ALT."""
+    parts = pd.Series(keys, dtype=object).str.split(":", n=3, expand=True)
+    parts = parts.reindex(columns=range(4)).set_axis(VARIANT_KEY, axis=1)
+    parts.to_csv(path, sep="\t", index=False)
+
+
+def read_keys(path):
+    """Table CHROM, POS, REF, ALT -> clés de variant, dans l'ordre du fichier."""
+    keys = pd.read_csv(path, sep="\t", dtype=str, keep_default_na=False)
+    return pd.Index(key_strings(*(keys[c] for c in VARIANT_KEY))).unique()
+
+
+def key_order(keys, order):
+    """
+    Permutation stable rangeant les lignes selon la position de leur variant dans `order`
+    (ordre de l'entrée complète, celui d'un run non incrémental) ; variants absents de `order` en fin.
+    """
+    position = pd.Index(order).get_indexer(keys)
+    position[position < 0] = len(order)
+    return np.argsort(position, kind="stable")
+
+
+def merge_keyed(path, delta_path, retract, order=None):
+    """
+    Fusionne une sortie existante et la sortie calculée sur le delta : lignes existantes
+    dont le variant n'est pas dans `retract` et lignes du delta, rangées selon `order` si fourni
+    (clés de l'entrée complète). Retourne (gardées, ajoutées).
+    """
+    header, parts, part_keys, kept = "", [], [], 0
+    if os.path.exists(path):
+        header, previous, keys = read_keyed(path)
+        keep = ~keys.isin(retract).to_numpy()
+        parts.append(previous[keep])
+        part_keys.append(keys[keep])
+        kept = int(keep.sum())
+    if os.path.exists(delta_path):
+        delta_header, added, keys = read_keyed(delta_path)
+        header = header or delta_header
+        parts.append(added)
+        part_keys.append(keys)
+    if not parts:
+        return 0, 0
+    merged = pd.concat(parts, ignore_index=True)
+    if order is not None:
+        merged = merged.iloc[key_order(pd.concat(part_keys, ignore_index=True), order)]
+    write_keyed(path, header, merged)
+    return kept, len(merged) - kept
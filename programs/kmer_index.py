@@ -0,0 +1,153 @@
+## usage : python kmer_index.py --fasta MANE.GRCh38.v1.2.ensembl_protein.faa --out MANE.kmers [--lengths 8,9,10,11]
+##
+## Index des k-mers du protéome normal (transcrits MANE, comme parse_protein_fasta de 04) :
+##   MANE.kmers.k9.npy ... : k-mers uniques encodés sur 5 bits par résidu (uint64, k <= 12), triés
+##   MANE.kmers.k9.source  : empreinte du FASTA source (index reconstruit si le FASTA change)
+## Les tableaux sont ouverts par mmap (np.load mmap_mode="r") : recherche exacte par searchsorted,
+## voisins à une substitution près (distance de Hamming 1) générés par lots et cherchés de même.
+## Les k-mers contenant un résidu non standard (X, U, *...) ne sont pas indexés.
+
+import argparse
+import os
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from proteome_store import TX_PATTERN, iter_fasta, source_changed, write_source_stamp
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+BITS = 5
+INVALID = 31
+MAX_K = 64 // BITS
+DEFAULT_LENGTHS = [8, 9, 10, 11]
+QUERY_BATCH = 50_000
+
+# Table ASCII -> code 0..19, INVALID pour le reste
+CODES = np.full(256, INVALID, dtype=np.uint8)
+CODES[np.frombuffer(AMINO_ACIDS.encode(), dtype=np.uint8)] = np.arange(len(AMINO_ACIDS), dtype=np.uint8)
+
+
+def index_path(prefix, k):
+    return f"{prefix}.k{k}.npy"
+
+
+def stamp_path(prefix, k):
+    return f"{prefix}.k{k}.source"
+
+
+def index_exists(prefix, lengths):
+    return all(os.path.exists(index_path(prefix, k)) for k in lengths)
+
+
+def encode_residues(text):
+    """Séquence (str ou bytes) -> codes uint8 (INVALID pour les résidus non standard)."""
+    data = text.encode("ascii") if isinstance(text, str) else text
+    return CODES[np.frombuffer(data.upper(), dtype=np.uint8)]
+
+
+def pack_windows(codes, k):
+    """Codes de toutes les fenêtres de longueur k -> (entiers packés, fenêtre valide)."""
+    windows = sliding_window_view(codes, k)
+    packed = np.zeros(len(windows), dtype=np.uint64)
+    for j in range(k):
+        packed = (packed << np.uint64(BITS)) | windows[:, j].astype(np.uint64)
+    invalid = np.concatenate([[0], np.cumsum(codes == INVALID)])
+    valid = invalid[k:] - invalid[:-k] == 0
+    return packed, valid
+
+
+def encode_peptides(peptides, k):
+    """Peptides de longueur k -> (entiers packés, peptide encodable)."""
+    peptides = np.asarray(peptides, dtype=f"S{k}")
+    codes = CODES[np.frombuffer(np.char.upper(peptides).tobytes(), dtype=np.uint8)].reshape(len(peptides), k)
+    packed = np.zeros(len(peptides), dtype=np.uint64)
+    for j in range(k):
+        packed = (packed << np.uint64(BITS)) | codes[:, j].astype(np.uint64)
+    return packed, (codes != INVALID).all(axis=1)
+
+
+def decode(packed, k):
+    """Entier packé -> peptide."""
+    packed = int(packed)
+    return "".join(AMINO_ACIDS[(packed >> (BITS * (k - 1 - j))) & INVALID] for j in range(k))
+
+
+def build_index(fasta_path, prefix, lengths=DEFAULT_LENGTHS):
+    """Écrit un tableau trié de k-mers uniques par longueur demandée."""
+    if max(lengths) > MAX_K:
+        raise ValueError(f"k <= {MAX_K} requis pour l'encodage sur 64 bits")
+    # Protéines concaténées, séparées par un résidu invalide (aucune fenêtre à cheval)
+    sequences = [seq for desc, seq in iter_fasta(fasta_path) if TX_PATTERN.search(desc)]
+    codes = encode_residues("*".join(sequences))
+    for k in lengths:
+        packed, valid = pack_windows(codes, k)
+        kmers = np.unique(packed[valid])
+        path = index_path(prefix, k)
+        np.save(path + ".tmp.npy", kmers)
+        os.replace(path + ".tmp.npy", path)
+        write_source_stamp(stamp_path(prefix, k), fasta_path)
+        print(f"[INFO] {len(kmers)} {k}-mers uniques ({len(sequences)} protéines) -> {path}")
+    return prefix
+
+
+class KmerIndex:
+    """Ensemble trié des k-mers du protéome normal pour une longueur k (mmap)."""
+
+    def __init__(self, prefix, k):
+        self.k = k
+        self.kmers = np.load(index_path(prefix, k), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.kmers)
+
+    def contains(self, packed):
+        """Appartenance de chaque entier packé à l'index (vectorisé)."""
+        packed = np.asarray(packed, dtype=np.uint64)
+        if len(self.kmers) == 0:
+            return np.zeros(len(packed), dtype=bool)
+        pos = np.searchsorted(self.kmers, packed)
+        return np.asarray(self.kmers[np.minimum(pos, len(self.kmers) - 1)]) == packed
+
+    def neighbour_counts(self, packed):
+        """
+        Nombre de k-mers de l'index à exactement une substitution de chaque requête.
+        Les k x 19 voisins de chaque requête sont générés par lots de QUERY_BATCH requêtes.
+        """
+        packed = np.asarray(packed, dtype=np.uint64)
+        counts = np.zeros(len(packed), dtype=np.int64)
+        shifts = (BITS * (self.k - 1 - np.arange(self.k))).astype(np.uint64)
+        masks = ~(np.uint64(INVALID) << shifts)
+        letters = np.arange(len(AMINO_ACIDS), dtype=np.uint64)
+        substitutions = letters[None, :] << shifts[:, None]
+        for start in range(0, len(packed), QUERY_BATCH):
+            batch = packed[start:start + QUERY_BATCH]
+            # (requête, position, acide aminé) : position vidée puis remplie par chaque acide aminé
+            neighbours = (batch[:, None, None] & masks[None, :, None]) | substitutions[None, :, :]
+            found = self.contains(neighbours.ravel()).reshape(neighbours.shape)
+            found &= neighbours != batch[:, None, None]
+            counts[start:start + len(batch)] = found.sum(axis=(1, 2))
+        return counts
+
+
+def open_index(prefix, lengths, fasta_path=None):
+    """
+    Ouvre les index des longueurs demandées, en les (re)construisant depuis `fasta_path`
+    s'ils manquent ou ont été construits depuis une autre version du FASTA.
+    """
+    missing = [k for k in lengths if not os.path.exists(index_path(prefix, k))]
+    if missing and fasta_path is None:
+        raise FileNotFoundError(f"Index k-mers introuvable : {prefix} (k = {missing})")
+    stale = [k for k in lengths if k not in missing and fasta_path is not None
+             and source_changed(stamp_path(prefix, k), fasta_path)]
+    if stale:
+        print(f"[INFO] {fasta_path} modifié depuis la construction de l'index (k = {stale}), reconstruction")
+    if missing or stale:
+        build_index(fasta_path, prefix, sorted(missing + stale))
+    return {k: KmerIndex(prefix, k) for k in lengths}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index mmap des k-mers du protéome MANE (encodage 5 bits)")
+    parser.add_argument("--fasta", required=True, help="FASTA protéique MANE avec annotation transcript")
+    parser.add_argument("--out", required=True, help="Préfixe des fichiers d'index (.k<k>.npy)")
+    parser.add_argument("--lengths", default="8,9,10,11", help="Longueurs k indexées, séparées par des virgules")
+    args = parser.parse_args()
+    build_index(args.fasta, args.out, sorted({int(x) for x in args.lengths.split(",") if x.strip()}))
@@ -0,0 +1,113 @@
+## Cache persistant des prédictions peptide x allèle (SQLite)
+##
+## Clé : (peptide, allele, model_version). Seules les paires absentes du cache
+## sont envoyées au prédicteur ; le cache peut être borné en nombre d'entrées
+## (éviction des entrées les moins récemment utilisées).
+
+import sqlite3
+import time
+import pandas as pd
+
+
+def predictor_version(predictor="mhcflurry"):
+    """Version installée du prédicteur (ex. 'mhcflurry-2.1.1'), 'unknown' sinon."""
+    try:
+        from importlib.metadata import version
+        return f"{predictor}-{version(predictor)}"
+    except Exception:
+        return f"{predictor}-unknown"
+
+
+class PredictionCache:
+    def __init__(self, path, model_version, max_entries=None):
+        self.path = path
+        self.model_version = model_version
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.con = sqlite3.connect(path)
+        self.con.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            "peptide TEXT NOT NULL, allele TEXT NOT NULL, model_version TEXT NOT NULL, "
+            "affinity REAL NOT NULL, last_used REAL NOT NULL, "
+            "PRIMARY KEY (peptide, allele, model_version)) WITHOUT ROWID"
+        )
+        self.con.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON predictions (last_used)")
+        self.con.commit()
+
+    def get_many(self, pairs):
+        """
+        `pairs` : DataFrame avec colonnes peptide, allele.
+        Retourne les paires trouvées (peptide, allele, affinity) et met à jour les compteurs.
+        """
+        keys = pairs[["peptide", "allele"]].drop_duplicates()
+        self.con.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (peptide TEXT, allele TEXT)")
+        self.con.execute("DELETE FROM wanted")
+        self.con.executemany("INSERT INTO wanted VALUES (?, ?)", keys.itertuples(index=False, name=None))
+        found = pd.read_sql_query(
+            "SELECT p.peptide, p.allele, p.affinity FROM predictions p "
+            "JOIN wanted w ON p.peptide = w.peptide AND p.allele = w.allele "
+            "WHERE p.model_version = ?",
+            self.con, params=(self.model_version,)
+        )
+        self.con.execute(
+            "UPDATE predictions SET last_used = ? WHERE model_version = ? "
+            "AND (peptide, allele) IN (SELECT peptide, allele FROM wanted)",
+            (time.time(), self.model_version)
+        )
+        self.con.commit()
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        # Résultat vide : read_sql_query ne type pas les colonnes
+        return found.astype({"affinity": float})
+
+    def put_many(self, results):
+        """
+        `results` : DataFrame avec colonnes peptide, allele, affinity.
+        Les affinités manquantes (allèle ou peptide non supporté par le modèle) ne sont pas mises en cache.
+        """
+        missing = results["affinity"].isna()
+        if missing.any():
+            print(f"[WARNING] Cache : {int(missing.sum())} paires sans affinité (allèle ou peptide non supporté), "
+                  "non mises en cache")
+            results = results[~missing]
+        now = time.time()
+        rows = (
+            (pep, allele, self.model_version, float(aff), now)
+            for pep, allele, aff in results[["peptide", "allele", "affinity"]].itertuples(index=False, name=None)
+        )
+        self.con.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?)", rows)
+        self.con.commit()
+        self.evict()
+
+    def size(self):
+        return self.con.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+    def evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_entries."""
+        if not self.max_entries:
+            return 0
+        excess = self.size() - self.max_entries
+        if excess <= 0:
+            return 0
+        self.con.execute(
+            "DELETE FROM predictions WHERE (peptide, allele, model_version) IN "
+            "(SELECT peptide, allele, model_version FROM predictions ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+        self.con.commit()
+        print(f"[INFO] Cache : {excess} entrées évincées (limite {self.max_entries})")
+        return excess
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def report(self):
+        print(
+            f"[INFO] Cache prédictions ({self.model_version}) : {self.hits} hits, {self.misses} misses, "
+            f"taux de hit {self.hit_rate():.1%}, {self.size()} entrées"
+        )
+
+    def close(self):
+        self.con.close()
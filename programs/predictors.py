@@ -0,0 +1,156 @@
+## Moteurs de prédiction d'affinité MHC-I
+##
+## - inprocess  : Class1AffinityPredictor chargé une seule fois par processus,
+##                paires envoyées par lots de taille configurable
+## - subprocess : appel historique à mhcflurry-predict via CSV temporaires
+## Les deux renvoient un DataFrame peptide, allele, affinity (jointure par clé).
+##
+## predict_sharded découpe les paires en shards (par allèle ou par hash du peptide),
+## les prédit sur un pool de processus et écrit chaque shard terminé sur disque :
+## une exécution interrompue ne relance que les shards manquants ; les checkpoints sont supprimés
+## une fois toutes les prédictions fusionnées.
+
+import glob
+import hashlib
+import os
+import subprocess
+import uuid
+import zlib
+from functools import partial
+from multiprocessing import Pool
+import pandas as pd
+
+DEFAULT_BATCH_SIZE = 100_000
+
+# Modèle mhcflurry chargé une fois par processus
+_AFFINITY_PREDICTOR = None
+
+
+def run_mhcflurry(input_csv, output_csv):
+    subprocess.run([
+        "mhcflurry-predict",
+        input_csv,
+        "--out", output_csv
+    ], check=True)
+    return output_csv
+
+
+class SubprocessPredictor:
+    name = "subprocess"
+
+    def predict(self, pairs):
+        input_csv = f"mhcflurry_input_{uuid.uuid4().hex}.csv"
+        output_csv = f"mhcflurry_output_{uuid.uuid4().hex}.csv"
+        try:
+            pairs[["peptide", "allele"]].to_csv(input_csv, index=False)
+            run_mhcflurry(input_csv, output_csv)
+            prediction_df = pd.read_csv(output_csv)
+        finally:
+            for f in (input_csv, output_csv):
+                if os.path.exists(f):
+                    os.remove(f)
+        return prediction_df[["peptide", "allele", "mhcflurry_affinity"]].rename(
+            columns={"mhcflurry_affinity": "affinity"}
+        )
+
+
+def load_affinity_predictor():
+    global _AFFINITY_PREDICTOR
+    if _AFFINITY_PREDICTOR is None:
+        from mhcflurry import Class1AffinityPredictor
+        print("[INFO] Chargement des modèles mhcflurry (une fois par processus)...")
+        _AFFINITY_PREDICTOR = Class1AffinityPredictor.load()
+    return _AFFINITY_PREDICTOR
+
+
+class InProcessPredictor:
+    name = "inprocess"
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.model = load_affinity_predictor()
+
+    def predict(self, pairs):
+        pairs = pairs[["peptide", "allele"]].reset_index(drop=True)
+        results = []
+        for start in range(0, len(pairs), self.batch_size):
+            batch = pairs.iloc[start:start + self.batch_size]
+            affinities = self.model.predict(
+                peptides=batch["peptide"].tolist(),
+                alleles=batch["allele"].tolist(),
+                throw=False,
+            )
+            results.append(batch.assign(affinity=affinities))
+        if not results:
+            return pd.DataFrame(columns=["peptide", "allele", "affinity"])
+        return pd.concat(results, ignore_index=True)
+
+
+def get_predictor(engine="subprocess", batch_size=DEFAULT_BATCH_SIZE):
+    """Instancie le moteur demandé ; repli sur mhcflurry-predict si mhcflurry n'est pas importable."""
+    if engine == "inprocess":
+        try:
+            return InProcessPredictor(batch_size)
+        except ImportError as e:
+            print(f"[WARNING] mhcflurry non importable ({e}), repli sur mhcflurry-predict")
+    return SubprocessPredictor()
+
+
+def split_shards(pairs, n_shards, shard_by="hash"):
+    """
+    Découpe les paires en au plus `n_shards` shards : allèles (triés) répartis à tour de rôle,
+    ou plage de hash (crc32) du peptide.
+    """
+    pairs = pairs[["peptide", "allele"]].drop_duplicates()
+    if shard_by == "allele":
+        alleles = sorted(pairs["allele"].unique())
+        shard_of = {allele: i % n_shards for i, allele in enumerate(alleles)}
+        buckets = pairs["allele"].map(shard_of)
+        return [group for _, group in pairs.groupby(buckets, sort=True)]
+    buckets = pairs["peptide"].map(lambda p: zlib.crc32(p.encode()) % n_shards)
+    return [group for _, group in pairs.groupby(buckets, sort=True)]
+
+
+def shard_path(shard_dir, index, shard):
+    """Nom du checkpoint : indice + empreinte du contenu (un shard modifié n'est pas réutilisé)."""
+    keys = shard.sort_values(["allele", "peptide"])
+    digest = hashlib.sha1("\n".join(keys["allele"] + "\t" + keys["peptide"]).encode()).hexdigest()[:12]
+    return os.path.join(shard_dir, f"shard_{index:04d}_{digest}.tsv")
+
+
+def predict_shard(task, engine="subprocess", batch_size=DEFAULT_BATCH_SIZE):
+    """Worker : prédit un shard et l'écrit de façon atomique."""
+    shard, out_path = task
+    predicted = get_predictor(engine, batch_size).predict(shard)
+    predicted.to_csv(out_path + ".tmp", sep="\t", index=False)
+    os.replace(out_path + ".tmp", out_path)
+    return out_path
+
+
+def predict_sharded(pairs, shard_dir, n_shards=16, shard_by="hash", workers=1,
+                    engine="subprocess", batch_size=DEFAULT_BATCH_SIZE):
+    """Prédiction shardée et reprenable ; retourne peptide, allele, affinity pour toutes les paires."""
+    os.makedirs(shard_dir, exist_ok=True)
+    shards = split_shards(pairs, n_shards, shard_by)
+    tasks = [(shard, shard_path(shard_dir, i, shard)) for i, shard in enumerate(shards)]
+    todo = [task for task in tasks if not os.path.exists(task[1])]
+    print(f"[INFO] {len(tasks)} shards, {len(tasks) - len(todo)} déjà terminés, {len(todo)} à prédire")
+
+    worker = partial(predict_shard, engine=engine, batch_size=batch_size)
+    if workers > 1 and len(todo) > 1:
+        with Pool(workers) as pool:
+            for done, path in enumerate(pool.imap_unordered(worker, todo), 1):
+                print(f"[INFO] Shard terminé ({done}/{len(todo)}) : {path}")
+    else:
+        for done, task in enumerate(todo, 1):
+            print(f"[INFO] Shard terminé ({done}/{len(todo)}) : {worker(task)}")
+
+    results = [pd.read_csv(path, sep="\t", float_precision="round_trip") for _, path in tasks]
+    merged = pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=["peptide", "allele", "affinity"])
+    # Fusion réussie : checkpoints supprimés (y compris ceux d'un découpage antérieur) ;
+    # une exception plus haut les laisse en place pour la reprise
+    for path in glob.glob(os.path.join(shard_dir, "shard_*.tsv")):
+        os.remove(path)
+    if not os.listdir(shard_dir):
+        os.rmdir(shard_dir)
+    return merged
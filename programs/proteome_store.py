@@ -0,0 +1,180 @@
+## usage : python proteome_store.py --fasta MANE.GRCh38.v1.2.ensembl_protein.faa --out MANE.proteome
+##
+## Construit (une fois) un protéome indexé :
+##   MANE.proteome.seq     résidus concaténés (ASCII, sans séparateur)
+##   MANE.proteome.idx.tsv table transcript -> offset, longueur
+##   MANE.proteome.source  empreinte du FASTA source (taille, mtime) : store reconstruit si le FASTA change
+## Le fichier .seq est ouvert par mmap : plusieurs processus partagent les mêmes pages.
+
+import argparse
+import mmap
+import os
+import re
+
+TX_PATTERN = re.compile(r"transcript:(ENST[0-9]+)\.\d+")
+
+
+def store_paths(prefix):
+    return prefix + ".seq", prefix + ".idx.tsv"
+
+
+def store_exists(prefix):
+    return all(os.path.exists(p) for p in store_paths(prefix))
+
+
+def source_stamp(fasta_path):
+    """Empreinte d'un fichier source : taille et mtime (ns)."""
+    st = os.stat(fasta_path)
+    return f"{st.st_size}\t{st.st_mtime_ns}"
+
+
+def write_source_stamp(stamp_path, fasta_path):
+    with open(stamp_path, "w") as f:
+        f.write(source_stamp(fasta_path) + "\n")
+
+
+def source_changed(stamp_path, fasta_path):
+    """Vrai si l'artefact n'a pas été construit depuis la version actuelle de `fasta_path`."""
+    if not os.path.exists(stamp_path):
+        return True
+    with open(stamp_path) as f:
+        return f.read().strip() != source_stamp(fasta_path)
+
+
+def iter_fasta(fasta_path):
+    """Lecture FASTA minimale : (description, séquence)."""
+    desc, chunks = None, []
+    with open(fasta_path) as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if line.startswith(">"):
+                if desc is not None:
+                    yield desc, "".join(chunks)
+                desc, chunks = line[1:], []
+            elif line:
+                chunks.append(line.strip())
+    if desc is not None:
+        yield desc, "".join(chunks)
+
+
+def build_store(fasta_path, prefix):
+    """Écrit les résidus concaténés et la table d'index pour les transcrits MANE."""
+    seq_path, idx_path = store_paths(prefix)
+    offset = 0
+    n = 0
+    with open(seq_path + ".tmp", "wb") as seq_out, open(idx_path + ".tmp", "w") as idx_out:
+        idx_out.write("transcript\toffset\tlength\n")
+        for desc, seq in iter_fasta(fasta_path):
+            match = TX_PATTERN.search(desc)
+            if not match:
+                continue
+            data = seq.encode("ascii")
+            seq_out.write(data)
+            idx_out.write(f"{match.group(1)}\t{offset}\t{len(data)}\n")
+            offset += len(data)
+            n += 1
+    os.replace(seq_path + ".tmp", seq_path)
+    os.replace(idx_path + ".tmp", idx_path)
+    write_source_stamp(prefix + ".source", fasta_path)
+    print(f"[INFO] Protéome indexé : {n} transcrits, {offset} résidus -> {seq_path}")
+    return prefix
+
+
+class MappedSequence:
+    """Vue paresseuse sur une protéine du protéome mmap (len, slicing, `in`)."""
+
+    __slots__ = ("_mm", "_offset", "_length")
+
+    def __init__(self, mm, offset, length):
+        self._mm = mm
+        self._offset = offset
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(self._length)
+            if step != 1:
+                return str(self)[item]
+            return self._mm[self._offset + start:self._offset + max(start, stop)].decode("ascii")
+        if item < 0:
+            item += self._length
+        if not 0 <= item < self._length:
+            raise IndexError(item)
+        return chr(self._mm[self._offset + item])
+
+    def __contains__(self, peptide):
+        """Recherche d'une sous-séquence directement dans le mmap (sans copier la protéine)."""
+        return self._mm.find(peptide.encode("ascii"), self._offset, self._offset + self._length) >= 0
+
+    def __str__(self):
+        return self._mm[self._offset:self._offset + self._length].decode("ascii")
+
+
+class ProteomeStore:
+    """Accès type dict transcript -> MappedSequence, sans parser le FASTA."""
+
+    def __init__(self, prefix):
+        seq_path, idx_path = store_paths(prefix)
+        self.index = {}
+        with open(idx_path) as f:
+            next(f)
+            for line in f:
+                tx, offset, length = line.rstrip("\n").split("\t")
+                self.index[tx] = (int(offset), int(length))
+        self._file = open(seq_path, "rb")
+        size = os.path.getsize(seq_path)
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __contains__(self, tx_id):
+        return tx_id in self.index
+
+    def __getitem__(self, tx_id):
+        offset, length = self.index[tx_id]
+        return MappedSequence(self._mm, offset, length)
+
+    def __len__(self):
+        return len(self.index)
+
+    def keys(self):
+        return self.index.keys()
+
+    def window(self, tx_id, start, end):
+        """Extrait seq[start:end] d'un transcrit en O(1)."""
+        return self[tx_id][start:end]
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_store(prefix, fasta_path=None):
+    """
+    Ouvre le protéome indexé, en le (re)construisant depuis `fasta_path` s'il n'existe pas
+    ou s'il a été construit depuis une autre version du FASTA.
+    """
+    if fasta_path is None:
+        if not store_exists(prefix):
+            raise FileNotFoundError(f"Protéome indexé introuvable : {prefix}")
+    elif not store_exists(prefix) or source_changed(prefix + ".source", fasta_path):
+        if store_exists(prefix):
+            print(f"[INFO] {fasta_path} modifié depuis la construction de {prefix}, reconstruction")
+        build_store(fasta_path, prefix)
+    return ProteomeStore(prefix)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construit un protéome MANE indexé (mmap) depuis le FASTA protéique")
+    parser.add_argument("--fasta", required=True, help="FASTA protéique MANE avec annotation transcript")
+    parser.add_argument("--out", required=True, help="Préfixe des fichiers de sortie (.seq, .idx.tsv)")
+    args = parser.parse_args()
+    build_store(args.fasta, args.out)
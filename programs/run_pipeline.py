@@ -0,0 +1,317 @@
+## usage : python programs/run_pipeline.py --workdir run_gbm --cds_fasta MANE.GRCh38.v1.2.ensembl_protein.faa [--jobs 4]
+##         [--set 06="--engine inprocess --cache mhcflurry_cache.sqlite"] [--force 06] [--dry_run] [--profile 06]
+##
+## Enchaîne les étapes 01 -> 11 déclarées comme un DAG (entrées / sorties).
+## Chaque étape a une empreinte (contenu du script + contenu des entrées + paramètres) ;
+## une étape dont l'empreinte n'a pas changé et dont les sorties existent est sautée.
+## Les étapes indépendantes (rapports 07 / 08 / 09 / 10, annotation 11) tournent en parallèle.
+## Les rapports 07 / 08 / 10 lisent les agrégats précalculés de 06_binders.sqlite (voir binder_store.py).
+## SnpEff est lancé hors pipeline : gbm.ann.vcf est une entrée source.
+## Chaque étape ajoute ses mesures (sous-étapes, temps, mémoire) à telemetry.jsonl (voir telemetry.py).
+## Mode --incremental (cohorte qui grandit, voir delta.py) : les étapes 02 -> 06 ne traitent que les
+## variants (CHROM, POS, REF, ALT) nouveaux ou modifiés depuis leur dernier passage, puis fusionnent le
+## delta dans gbm.ann.tsv, cosmic_somatic.tsv, peptides_9mer.tsv, les FASTA et 06_binders_final.tsv ;
+## les variants disparus de l'entrée sont retirés. Les rapports 07 -> 11 sont relancés sur les sorties fusionnées.
+
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from delta import (DELTA_DIR, diff_manifest, file_kind, load_manifest, manifest_path, merge_keyed, read_keyed,
+                   save_manifest, table_header, variant_digests, write_keyed, write_keys)
+from telemetry import PROFILE_ENV
+
+PROGRAMS_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = ".pipeline_state.json"
+
+
+def pipeline_stages(cosmic, cds_fasta):
+    """
+    Déclaration des étapes : script, arguments, entrées, sorties (chemins relatifs au workdir).
+    `delta` (mode --incremental) : entrée découpée par variant et sorties fusionnées ;
+    `update` : l'étape fusionne elle-même ses sorties (option --update, variants à retirer).
+    """
+    return [
+        dict(name="01", script="01_prepare_vcf_for_snpeff.py", args=[],
+             inputs=["df.csv"], outputs=["GBM.vcf", "GBM.samples.tsv"]),
+        dict(name="02", script="02_vcf_to_tsv_postEff.py", args=["gbm.ann.vcf", "gbm.ann.tsv"],
+             inputs=["gbm.ann.vcf"], outputs=["gbm.ann.tsv"],
+             delta=dict(input="gbm.ann.vcf", outputs=["gbm.ann.tsv"])),
+        dict(name="03", script="03_cosmic.py",
+             args=["--cosmic", cosmic, "--input", "gbm.ann.tsv", "--output", "cosmic_somatic.tsv"],
+             inputs=[cosmic, "gbm.ann.tsv"], outputs=["cosmic_somatic.tsv"],
+             delta=dict(input="gbm.ann.tsv", outputs=["cosmic_somatic.tsv"])),
+        dict(name="04", script="04_genere_9mers.py",
+             args=["--input", "cosmic_somatic.tsv", "--cds_fasta", cds_fasta, "--output", "peptides_9mer.tsv"],
+             inputs=["cosmic_somatic.tsv", cds_fasta], outputs=["peptides_9mer.tsv"],
+             delta=dict(input="cosmic_somatic.tsv", outputs=["peptides_9mer.tsv"])),
+        dict(name="05", script="05_fasta.py",
+             args=["--input", "peptides_9mer.tsv", "--wt_fasta", "peptides_wt.fasta", "--mut_fasta", "peptides_mut.fasta"],
+             inputs=["peptides_9mer.tsv"], outputs=["peptides_wt.fasta", "peptides_mut.fasta"],
+             delta=dict(input="peptides_9mer.tsv", outputs=["peptides_wt.fasta", "peptides_mut.fasta"])),
+        dict(name="06", script="06_predict_binders.py", args=["--fasta", "peptides_mut.fasta", "--store", "06_binders.sqlite"],
+             inputs=["peptides_mut.fasta"],
+             outputs=["06_binders_final.tsv", "06_best_binders_by_peptide.tsv", "06_binders_plot.html", "06_binders.sqlite"],
+             delta=dict(input="peptides_mut.fasta", outputs=[], update=True)),
+        dict(name="07", script="07_barplot2.py",
+             args=["--store", "06_binders.sqlite", "--output-html", "07_barplot.html"],
+             inputs=["06_binders.sqlite"], outputs=["07_barplot.html"]),
+        dict(name="08", script="08_generate_seqlogos.py", args=["--store", "06_binders.sqlite"],
+             inputs=["06_binders.sqlite"], outputs=["08_seqlogos.html"]),
+        dict(name="09", script="09_mutations.py", args=["--no_show"],
+             inputs=["cosmic_somatic.tsv"], outputs=["09_mutations_plot.html"]),
+        dict(name="10", script="10_scatter2.py",
+             args=["--peptides", "peptides_9mer.tsv", "--store", "06_binders.sqlite"],
+             inputs=["peptides_9mer.tsv", "06_binders.sqlite"],
+             outputs=["10_peptides_mutations.tsv", "10_peptides_selection.html"]),
+        dict(name="11", script="11_self_similarity.py",
+             args=["--input", "peptides_9mer.tsv", "--index", "proteome_kmers", "--cds_fasta", cds_fasta,
+                   "--output", "11_peptides_self_similarity.tsv"],
+             inputs=["peptides_9mer.tsv", cds_fasta], outputs=["11_peptides_self_similarity.tsv"]),
+    ]
+
+
+def file_digest(path, state_hashes):
+    """sha256 du contenu, mémorisé par (taille, mtime) pour ne pas relire les gros fichiers inchangés."""
+    st = os.stat(path)
+    key = os.path.abspath(path)
+    cached = state_hashes.get(key)
+    if cached and cached["size"] == st.st_size and cached["mtime"] == st.st_mtime:
+        return cached["sha256"]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    state_hashes[key] = {"size": st.st_size, "mtime": st.st_mtime, "sha256": h.hexdigest()}
+    return h.hexdigest()
+
+
+def stage_fingerprint(stage, state_hashes, exclude=()):
+    h = hashlib.sha256()
+    h.update(file_digest(os.path.join(PROGRAMS_DIR, stage["script"]), state_hashes).encode())
+    h.update(json.dumps(stage["args"]).encode())
+    for path in stage["inputs"]:
+        if path in exclude:
+            continue
+        h.update(path.encode())
+        h.update(file_digest(path, state_hashes).encode())
+    return h.hexdigest()
+
+
+def delta_context(stage, state_hashes):
+    """Empreinte de l'étape hors entrée découpée par variant (script, paramètres, autres entrées)."""
+    return stage_fingerprint(stage, state_hashes, exclude={stage["delta"]["input"]})
+
+
+def load_state():
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE) as f:
+            return json.load(f)
+    return {"stages": {}, "hashes": {}}
+
+
+def save_state(state):
+    with open(STATE_FILE + ".tmp", "w") as f:
+        json.dump(state, f, indent=1)
+    os.replace(STATE_FILE + ".tmp", STATE_FILE)
+
+
+def dependencies(stages):
+    """Étape -> étapes productrices de ses entrées."""
+    producers = {out: s["name"] for s in stages for out in s["outputs"]}
+    return {s["name"]: {producers[i] for i in s["inputs"] if i in producers} for s in stages}
+
+
+def run_stage(stage, args=None):
+    cmd = [sys.executable, os.path.join(PROGRAMS_DIR, stage["script"])] + (stage["args"] if args is None else args)
+    print(f"[INFO] Étape {stage['name']} : {' '.join(shlex.quote(c) for c in cmd)}")
+    log_path = f"{stage['name']}_{os.path.splitext(stage['script'])[0]}.log"
+    with open(log_path, "w") as log:
+        result = subprocess.run(cmd, stdout=log, stderr=subprocess.STDOUT)
+    return stage["name"], result.returncode, log_path
+
+
+def run_delta_stage(stage, context):
+    """
+    Étape en mode incrémental : l'entrée est comparée au manifeste de l'étape, l'étape tourne sur
+    les seuls variants nouveaux ou modifiés (fichiers sous .delta/<étape>/) et ses sorties sont fusionnées.
+    """
+    name, spec = stage["name"], stage["delta"]
+    work_dir = os.path.join(DELTA_DIR, name)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir)
+
+    header, data, keys = read_keyed(spec["input"])
+    digests = variant_digests(data, keys, context)
+    # Sans manifeste (premier run incrémental, sorties d'un run normal) ou sans sorties, rien ne dit
+    # quels variants les sorties contiennent : reconstruction complète qui écrase les sorties
+    previous_run = os.path.exists(manifest_path(name)) and all(os.path.exists(p) for p in stage["outputs"])
+    if not previous_run:
+        print(f"[INFO] Étape {name} (incrémental) : pas de manifeste, reconstruction complète "
+              f"({len(digests)} variants)")
+        _, code, log_path = run_stage(stage)
+        if code == 0:
+            save_manifest(name, digests)
+        return name, code, log_path
+    changed, removed = diff_manifest(digests, load_manifest(name))
+    retract = set(changed) | set(removed)
+    print(f"[INFO] Étape {name} (incrémental) : {len(changed)} variants nouveaux ou modifiés, "
+          f"{len(removed)} retirés, {len(digests) - len(changed)} inchangés")
+
+    log_path = None
+    if retract:
+        base = os.path.basename(spec["input"])
+        delta_input = os.path.join(work_dir, base[:-3] if file_kind(base) == "vcf" and base.endswith(".gz") else base)
+        renamed = {spec["input"]: delta_input, **{p: os.path.join(work_dir, os.path.basename(p)) for p in spec["outputs"]}}
+        args = [renamed.get(a, a) for a in stage["args"]]
+        # Ordre des variants de l'entrée complète : les sorties fusionnées suivent l'ordre d'un run complet
+        order = keys.unique()
+        if spec.get("update"):
+            write_keys(os.path.join(work_dir, "retract.tsv"), sorted(retract))
+            write_keys(os.path.join(work_dir, "order.tsv"), order)
+            args += ["--update", os.path.join(work_dir, "retract.tsv"), "--key_order", os.path.join(work_dir, "order.tsv")]
+        # Étape lancée sur le delta (ou seulement pour retirer des variants si elle fusionne elle-même)
+        if len(changed) or spec.get("update"):
+            write_keyed(delta_input, header, data[keys.isin(changed).to_numpy()])
+            _, code, log_path = run_stage(stage, args)
+            if code != 0:
+                return name, code, log_path
+        # Colonnes du delta différentes des sorties existantes (ex. champs INFO nouveaux) : reconstruction complète
+        mismatch = [p for p in spec["outputs"] if os.path.exists(renamed[p]) and table_header(p) != table_header(renamed[p])]
+        if mismatch:
+            print(f"[INFO] Étape {name} (incrémental) : colonnes modifiées dans {', '.join(mismatch)}, reconstruction complète")
+            _, code, log_path = run_stage(stage)
+            if code == 0:
+                save_manifest(name, digests)
+            return name, code, log_path
+        for path in spec["outputs"]:
+            kept, added = merge_keyed(path, renamed[path], retract, order)
+            print(f"[INFO] Étape {name} : {path} fusionné ({kept} lignes gardées, {added} ajoutées)")
+
+    save_manifest(name, digests)
+    return name, 0, log_path
+
+
+def run_pipeline(stages, jobs=1, force=(), dry_run=False, incremental=False):
+    state = load_state()
+    deps = dependencies(stages)
+    by_name = {s["name"]: s for s in stages}
+    done, running, failed = set(), {}, set()
+    executed = set()
+
+    def ready(name):
+        return name not in done and name not in running and name not in failed and deps[name] <= done
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while len(done) + len(failed) < len(stages):
+            progressed = False
+            for name in [s["name"] for s in stages if ready(s["name"])]:
+                progressed = True
+                stage = by_name[name]
+                missing = [p for p in stage["inputs"] if not os.path.exists(p)]
+                if missing and not dry_run:
+                    print(f"[ERROR] Étape {name} : entrées manquantes {missing}")
+                    failed.add(name)
+                    continue
+                # En dry_run les sorties amont ne sont pas régénérées : on propage l'exécution
+                upstream_rerun = dry_run and bool(deps[name] & executed)
+                fingerprint = None if missing else stage_fingerprint(stage, state["hashes"])
+                up_to_date = (
+                    name not in force and not upstream_rerun
+                    and state["stages"].get(name) == fingerprint
+                    and all(os.path.exists(p) for p in stage["outputs"])
+                )
+                if up_to_date:
+                    print(f"[INFO] Étape {name} à jour, sautée")
+                    done.add(name)
+                    continue
+                if dry_run:
+                    print(f"[INFO] Étape {name} serait exécutée")
+                    executed.add(name)
+                    done.add(name)
+                    continue
+                if incremental and "delta" in stage:
+                    running[name] = pool.submit(run_delta_stage, stage, delta_context(stage, state["hashes"]))
+                else:
+                    running[name] = pool.submit(run_stage, stage)
+
+            if not running and progressed:
+                # Des étapes sautées ont pu débloquer leurs dépendantes
+                continue
+            if not running:
+                # Plus rien d'exécutable : étapes bloquées par un échec en amont
+                blocked = [s["name"] for s in stages if s["name"] not in done and s["name"] not in failed]
+                for name in blocked:
+                    print(f"[WARNING] Étape {name} non exécutée (dépendance en échec)")
+                failed.update(blocked)
+                break
+
+            finished, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, code, log_path = future.result()
+                del running[name]
+                if code != 0:
+                    print(f"[ERROR] Étape {name} en échec (code {code}), voir {log_path}")
+                    failed.add(name)
+                    continue
+                # Empreinte calculée après exécution : les entrées n'ont pas pu changer entre-temps
+                state["stages"][name] = stage_fingerprint(by_name[name], state["hashes"])
+                save_state(state)
+                executed.add(name)
+                done.add(name)
+                print(f"[INFO] Étape {name} terminée ({log_path})")
+
+    if not dry_run:
+        save_state(state)
+    return not failed
+
+
+def parse_overrides(values):
+    """--set 06="--engine inprocess" -> {"06": ["--engine", "inprocess"]}"""
+    overrides = {}
+    for value in values or []:
+        name, _, extra = value.partition("=")
+        overrides.setdefault(name, []).extend(shlex.split(extra))
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exécution incrémentale du pipeline GBM MHC-I (étapes 01 à 11)")
+    parser.add_argument("--workdir", default=".", help="Répertoire des fichiers d'entrée / sortie")
+    parser.add_argument("--cosmic", default="Cosmic_MutantCensus_v102_GRCh38.tsv", help="Fichier Cosmic Mutant Census")
+    parser.add_argument("--cds_fasta", default="MANE.GRCh38.v1.2.ensembl_protein.faa", help="FASTA protéique MANE")
+    parser.add_argument("--jobs", type=int, default=1, help="Nombre d'étapes exécutées en parallèle")
+    parser.add_argument("--set", action="append", metavar="ETAPE=ARGS",
+                        help="Arguments supplémentaires d'une étape (pris en compte dans l'empreinte)")
+    parser.add_argument("--force", action="append", default=[], help="Forcer la ré-exécution d'une étape")
+    parser.add_argument("--dry_run", action="store_true", help="Afficher les étapes à exécuter sans les lancer")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Étapes 02 -> 06 sur les seuls variants nouveaux / modifiés, fusion dans les sorties existantes")
+    parser.add_argument("--profile", action="append", default=[],
+                        help="Profil cProfile d'une étape (<étape>.prof) ; combiner avec --force si elle est à jour")
+    args = parser.parse_args()
+    if args.profile:
+        os.environ[PROFILE_ENV] = ",".join(args.profile)
+
+    cosmic = os.path.abspath(args.cosmic) if os.path.exists(args.cosmic) else args.cosmic
+    cds_fasta = os.path.abspath(args.cds_fasta) if os.path.exists(args.cds_fasta) else args.cds_fasta
+    os.chdir(args.workdir)
+
+    stages = pipeline_stages(cosmic, cds_fasta)
+    for name, extra in parse_overrides(args.set).items():
+        for stage in stages:
+            if stage["name"] == name:
+                stage["args"] = stage["args"] + extra
+
+    ok = run_pipeline(stages, args.jobs, set(args.force), args.dry_run, args.incremental)
+    print("[✔] Pipeline terminé." if ok else "[✘] Pipeline incomplet.")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+## Format intermédiaire partagé entre les étapes
+##
+## Le format suit l'extension du fichier : .parquet (colonnaire, typé) ou TSV.
+## - types explicites (POS entier, FREQ flottant...) quel que soit le format
+## - colonnes répétitives (gènes, allèles, interprétation...) encodées en catégories dans Parquet
+## - lecture projetée : seules les colonnes demandées sont chargées
+## Conversion pour lecture humaine : python table_io.py 06_binders_final.parquet 06_binders_final.tsv
+
+import argparse
+import os
+import pandas as pd
+
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+
+# Types explicites des colonnes numériques connues
+NUMERIC_DTYPES = {
+    "POS": "Int64",
+    "GENOME_START": "Int64",
+    "FREQ": "float64",
+    "Affinity_nM": "float64",
+    "WT_Affinity_nM": "float64",
+    "MUT_Affinity_nM": "float64",
+    "Agretopicity": "float64",
+    "Mutant_AA_Position_in_9mer": "Int64",
+    "Peptide_Length": "Int64",
+    "Mutation_ID": "Int64",
+    "N_Sources": "Int64",
+}
+
+# Colonnes à faible cardinalité stockées en catégories
+CATEGORICAL_COLUMNS = [
+    "CHROM", "CHROMOSOME", "REF", "ALT", "GENE", "Gene_Name", "Gene_ID", "TYPE",
+    "Annotation", "Annotation_Impact", "Feature_Type", "Transcript_BioType",
+    "MUTATION_DESCRIPTION", "MUTATION_SOMATIC_STATUS", "HLA", "allele", "Interpretation",
+]
+
+
+def is_parquet(path):
+    return str(path).lower().endswith(PARQUET_EXTENSIONS)
+
+
+def apply_dtypes(df, categorical=False):
+    """Applique les types explicites ; catégories seulement si `categorical`."""
+    for col, dtype in NUMERIC_DTYPES.items():
+        if col in df.columns and str(df[col].dtype) != dtype:
+            values = pd.to_numeric(df[col], errors="coerce")
+            df[col] = values.round().astype(dtype) if dtype == "Int64" else values.astype(dtype)
+    for col in CATEGORICAL_COLUMNS:
+        if col not in df.columns:
+            continue
+        if categorical and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+        elif not categorical and isinstance(df[col].dtype, pd.CategoricalDtype):
+            # Type des catégories (str sous pandas 3, object avant) : même type qu'une lecture TSV
+            df[col] = df[col].astype(df[col].cat.categories.dtype)
+    return df
+
+
+def table_columns(path):
+    """Noms de colonnes sans charger les données."""
+    if is_parquet(path):
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+    return pd.read_csv(path, sep="\t", nrows=0).columns.tolist()
+
+
+def read_table(path, columns=None, categorical=False):
+    """
+    Lit une table intermédiaire (Parquet ou TSV).
+    `columns` : projection ; les colonnes absentes du fichier sont ignorées.
+    `categorical` : garder l'encodage catégoriel (sinon chaînes simples).
+    """
+    if columns is not None:
+        available = set(table_columns(path))
+        columns = [c for c in columns if c in available]
+    if is_parquet(path):
+        df = pd.read_parquet(path, columns=columns)
+    else:
+        df = pd.read_csv(path, sep="\t", usecols=columns, low_memory=False, float_precision="round_trip")
+    return apply_dtypes(df, categorical)
+
+
+def write_table(df, path, tsv_export=False):
+    """Écrit la table au format déduit de l'extension ; `tsv_export` ajoute une copie TSV à côté du Parquet."""
+    if is_parquet(path):
+        apply_dtypes(df.copy(), categorical=True).to_parquet(path, index=False)
+        if tsv_export:
+            df.to_csv(os.path.splitext(path)[0] + ".tsv", sep="\t", index=False)
+    else:
+        df.to_csv(path, sep="\t", index=False)
+    return path
+
+
+def with_extension(path, fmt):
+    """'06_binders_final.tsv', 'parquet' -> '06_binders_final.parquet'"""
+    return os.path.splitext(path)[0] + (".parquet" if fmt == "parquet" else ".tsv")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conversion entre tables intermédiaires Parquet et TSV")
+    parser.add_argument("input", help="Table source (.parquet ou .tsv)")
+    parser.add_argument("output", help="Table de sortie (.parquet ou .tsv)")
+    parser.add_argument("--columns", default=None, help="Colonnes à garder, séparées par des virgules")
+    args = parser.parse_args()
+    columns = args.columns.split(",") if args.columns else None
+    write_table(read_table(args.input, columns), args.output)
+    print(f"[INFO] {args.input} -> {args.output}")
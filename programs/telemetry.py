@@ -0,0 +1,111 @@
+## Télémétrie partagée des étapes du pipeline
+##
+## Chaque script ouvre un Telemetry au nom de son étape et enveloppe ses sous-étapes :
+##     telemetry = Telemetry("04")
+##     with telemetry.step("fasta_load") as step:
+##         protein_dict = parse_protein_fasta(path)
+##         step.rows_out = len(protein_dict)
+## Une ligne JSON par sous-étape (temps réel, temps CPU sous-processus compris, pic de RSS,
+## lignes en entrée / sortie, lignes par seconde) et une ligne "total" à la fin du script
+## sont ajoutées à telemetry.jsonl dans le répertoire courant (celui des sorties).
+##
+## Variables d'environnement :
+##   GBM_TELEMETRY=<fichier>  autre fichier JSON lines ; GBM_TELEMETRY=0 désactive l'écriture
+##   GBM_PROFILE=04,06        active cProfile pour ces étapes ("all" : toutes) -> <étape>.prof
+
+import atexit
+import cProfile
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+TELEMETRY_ENV = "GBM_TELEMETRY"
+PROFILE_ENV = "GBM_PROFILE"
+DEFAULT_PATH = "telemetry.jsonl"
+
+
+def cpu_seconds():
+    """Temps CPU utilisateur + système du processus et de ses sous-processus terminés."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def peak_rss_mb():
+    """Pic de RSS (processus ou plus gros sous-processus terminé), en Mo."""
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss en Ko sous Linux, en octets sous macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def profiling_enabled(stage):
+    stages = os.environ.get(PROFILE_ENV, "")
+    return stages == "all" or stage in stages.split(",")
+
+
+class Step:
+    """Compteurs d'une sous-étape, renseignés dans le bloc `with`."""
+
+    __slots__ = ("name", "rows_in", "rows_out")
+
+    def __init__(self, name, rows_in=None, rows_out=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = rows_out
+
+
+class Telemetry:
+    def __init__(self, stage, path=None):
+        self.stage = stage
+        setting = os.environ.get(TELEMETRY_ENV, DEFAULT_PATH)
+        self.path = path or (None if setting in ("", "0") else setting)
+        self.rows_in = None
+        self.rows_out = None
+        self._wall = time.perf_counter()
+        self._cpu = cpu_seconds()
+        self._closed = False
+        self.profiler = None
+        if profiling_enabled(stage):
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        atexit.register(self.close)
+
+    @contextmanager
+    def step(self, name, rows_in=None):
+        """Mesure une sous-étape ; `rows_in` / `rows_out` peuvent être fixés dans le bloc."""
+        step = Step(name, rows_in)
+        wall, cpu = time.perf_counter(), cpu_seconds()
+        try:
+            yield step
+        finally:
+            self.record(name, time.perf_counter() - wall, cpu_seconds() - cpu, step.rows_in, step.rows_out)
+
+    def record(self, name, wall, cpu, rows_in=None, rows_out=None):
+        if self.path is None:
+            return
+        rows = rows_in if rows_in is not None else rows_out
+        entry = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "stage": self.stage, "step": name,
+            "pid": os.getpid(), "wall_s": round(wall, 4), "cpu_s": round(cpu, 4),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "rows_in": None if rows_in is None else int(rows_in),
+            "rows_out": None if rows_out is None else int(rows_out),
+            "rows_per_s": round(rows / wall, 1) if rows and wall > 0 else None,
+        }
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def close(self):
+        """Ligne "total" du script (appelée automatiquement à la sortie) et dump cProfile éventuel."""
+        if self._closed:
+            return
+        self._closed = True
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(f"{self.stage}.prof")
+            print(f"[INFO] Profil cProfile écrit dans {self.stage}.prof")
+        self.record("total", time.perf_counter() - self._wall, cpu_seconds() - self._cpu,
+                    self.rows_in, self.rows_out)
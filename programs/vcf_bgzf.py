@@ -0,0 +1,93 @@
+## usage : python vcf_bgzf.py gbm.ann.vcf gbm.ann.vcf.gz
+##
+## VCF compressé BGZF + index positionnel <vcf>.idx.tsv, écrit par 01 (--output GBM.vcf.gz) ou, pour la
+## sortie de SnpEff (lancé hors pipeline), par ce script : 02 --threads gbm.ann.vcf.gz s'en sert alors
+## pour que chaque worker décompresse lui-même ses blocs.
+## Index : chrom, first_pos, last_pos, virtual_offset, n_records (un bloc tous les INDEX_EVERY variants
+## et à chaque changement de chromosome). Si pysam est installé, un index tabix <vcf>.tbi est aussi écrit
+## (VCF trié uniquement).
+
+import argparse
+import gzip
+import os
+
+INDEX_EVERY = 10_000
+
+
+def index_path_for(vcf_path):
+    return vcf_path + ".idx.tsv"
+
+
+def write_bgzip(header, lines, vcf_path, tabix=True):
+    """Écrit l'en-tête et les lignes de variants en BGZF, puis l'index positionnel (offsets virtuels BGZF)."""
+    from Bio import bgzf
+
+    index_path = index_path_for(vcf_path)
+    blocks = []
+    block = None
+    with bgzf.BgzfWriter(vcf_path, "wb") as out:
+        out.write(header.encode())
+        for line in lines:
+            chrom, pos, _ = line.split("\t", 2)
+            pos = int(pos)
+            if block is None or block[0] != chrom or block[4] >= INDEX_EVERY:
+                block = [chrom, pos, pos, out.tell(), 0]
+                blocks.append(block)
+            block[2] = pos
+            block[4] += 1
+            out.write(line.encode())
+    with open(index_path + ".tmp", "w") as f:
+        f.write("chrom\tfirst_pos\tlast_pos\tvirtual_offset\tn_records\n")
+        f.writelines("\t".join(map(str, b)) + "\n" for b in blocks)
+    os.replace(index_path + ".tmp", index_path)
+    print(f"[INFO] Index positionnel : {index_path} ({len(blocks)} blocs)")
+
+    if not tabix:
+        return
+    try:
+        import pysam
+    except ImportError:
+        return
+    pysam.tabix_index(vcf_path, preset="vcf", force=True)
+    print(f"[INFO] Index tabix : {vcf_path}.tbi")
+
+
+def load_block_index(vcf_path):
+    """Blocs (offset virtuel BGZF, nombre de variants) de l'index positionnel, ou None s'il est absent."""
+    index_path = index_path_for(vcf_path)
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path) as f:
+        next(f)
+        return [(int(fields[3]), int(fields[4])) for fields in (line.rstrip("\n").split("\t") for line in f)]
+
+
+def compress_vcf(vcf_path, out_path):
+    """VCF existant (texte ou gzip, ex. sortie SnpEff) -> BGZF indexé, en une passe."""
+    with open(vcf_path, "rb") as f:
+        gz = f.read(2) == b"\x1f\x8b"
+    header = []
+    with (gzip.open(vcf_path, "rt") if gz else open(vcf_path)) as vcf:
+        for line in vcf:
+            if not line.startswith("#"):
+                break
+            header.append(line)
+        else:
+            line = None
+
+        def data_lines():
+            if line is not None:
+                yield line
+                yield from vcf
+
+        # Sortie SnpEff pas forcément triée : pas d'index tabix
+        write_bgzip("".join(header), data_lines(), out_path, tabix=False)
+    print(f"✅ VCF BGZF indexé : {out_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compresse un VCF en BGZF avec l'index positionnel lu par 02 --threads")
+    parser.add_argument("vcf", help="VCF d'entrée (texte ou gzip), ex. sortie SnpEff gbm.ann.vcf")
+    parser.add_argument("out", help="VCF BGZF de sortie (.vcf.gz), index écrit dans <out>.idx.tsv")
+    args = parser.parse_args()
+    compress_vcf(args.vcf, args.out)
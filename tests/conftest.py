@@ -0,0 +1,29 @@
+import importlib.util
+import os
+import subprocess
+import sys
+
+import pytest
+
+PROGRAMS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "programs")
+sys.path.insert(0, PROGRAMS)
+
+
+def load_script(name):
+    """Importe un script numéroté de programs/ (ex. '04_genere_9mers') comme module."""
+    spec = importlib.util.spec_from_file_location(name.replace("-", "_"), os.path.join(PROGRAMS, name + ".py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def run_script(tmp_path):
+    """Lance un script de programs/ dans tmp_path, comme le fait run_pipeline.py."""
+    def run(name, *args):
+        return subprocess.run(
+            [sys.executable, os.path.join(PROGRAMS, name + ".py"), *map(str, args)],
+            cwd=tmp_path, check=True, capture_output=True, text=True,
+            env={**os.environ, "MPLBACKEND": "Agg"},
+        )
+    return run
@@ -0,0 +1,56 @@
+import json
+import re
+
+import pandas as pd
+from benchmark import AA_1TO3, COSMIC_FILE, PROTEOME_FILE, generate_cohort, parse_sizes
+from proteome_store import iter_fasta
+
+COHORT_FILES = ["df.csv", "gbm.ann.vcf", COSMIC_FILE, PROTEOME_FILE]
+AA_3TO1 = {three: one for one, three in AA_1TO3.items()}
+
+
+def test_cohort_is_deterministic(tmp_path):
+    for name in ["a", "b", "c"]:
+        (tmp_path / name).mkdir()
+    generate_cohort(str(tmp_path / "a"), 300, seed=4)
+    generate_cohort(str(tmp_path / "b"), 300, seed=4)
+    generate_cohort(str(tmp_path / "c"), 300, seed=5)
+    for name in COHORT_FILES:
+        assert (tmp_path / "a" / name).read_bytes() == (tmp_path / "b" / name).read_bytes(), name
+    assert (tmp_path / "a" / "df.csv").read_bytes() != (tmp_path / "c" / "df.csv").read_bytes()
+
+
+def test_cohort_files_agree(tmp_path):
+    generate_cohort(str(tmp_path), 300, seed=2)
+    maf = pd.read_csv(tmp_path / "df.csv", sep="\t", dtype={"chrom": str})
+    vcf = pd.read_csv(tmp_path / "gbm.ann.vcf", sep="\t", comment=None, skiprows=5, dtype={"#CHROM": str})
+    cosmic = pd.read_csv(tmp_path / COSMIC_FILE, sep="\t", dtype={"CHROMOSOME": str})
+    proteins = {header.split("transcript:")[1].split()[0]: seq
+                for header, seq in iter_fasta(str(tmp_path / PROTEOME_FILE))}
+
+    keys = list(zip(maf["chrom"], maf["chromStart"] + 1, maf["Reference_Allele"], maf["Tumor_Seq_Allele2"]))
+    assert len(set(keys)) == len(keys) == 300
+    assert list(zip(vcf["#CHROM"], vcf["POS"], vcf["REF"], vcf["ALT"])) == keys
+    cosmic_keys = set(zip(cosmic["CHROMOSOME"], cosmic["GENOME_START"], cosmic["GENOMIC_WT_ALLELE"],
+                          cosmic["GENOMIC_MUT_ALLELE"]))
+    assert set(keys) <= cosmic_keys and len(cosmic) == 600
+
+    # HGVS.p de l'ANN : résidu de référence lu dans le protéome, résidu muté différent
+    for info in vcf["INFO"]:
+        fields = info.split("ANN=")[1].split("|")
+        ref, pos, alt = re.fullmatch(r"p\.([A-Z][a-z]{2})(\d+)([A-Z][a-z]{2})", fields[10]).groups()
+        assert proteins[fields[6]][int(pos) - 1] == AA_3TO1[ref] != AA_3TO1[alt]
+
+
+def test_parse_sizes():
+    assert parse_sizes("1k, 100K,1M,250") == [1_000, 100_000, 1_000_000, 250]
+
+
+def test_benchmark_records_each_stage(tmp_path, run_script):
+    run_script("benchmark", "--sizes", 200, "--stages", "01,02,03", "--results", "results.jsonl", "--keep")
+    records = [json.loads(line) for line in (tmp_path / "results.jsonl").read_text().splitlines()]
+    assert [r["stage"] for r in records] == ["01", "02", "03"]
+    assert all(r["returncode"] == 0 and r["wall_s"] > 0 and r["steps"] for r in records)
+    assert records[0]["rows_in"] == {"df.csv": 200} and records[0]["rows_out"]["GBM.vcf"] == 200
+    assert records[1]["rows_out"]["gbm.ann.tsv"] == 200
+    assert (tmp_path / "benchmark_runs" / "n200" / "cosmic_somatic.tsv").exists()
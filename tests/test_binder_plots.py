@@ -0,0 +1,26 @@
+import pandas as pd
+import pytest
+from conftest import load_script
+
+predict = load_script("06_predict_binders")
+
+
+def binder_table(n=300):
+    peptides = [f"{'ACDEFGHIK'[i % 9]}{'LMNPQRSTV'[i // 9 % 9]}AAAAAAA" for i in range(n)]
+    affinities = [10.0 * (1 + i % 120) for i in range(n)]
+    return pd.DataFrame({
+        "Sequence_ID": [f"GENE1_ENST00000000001_pos{i % 9 + 1}_chr1_{100 + i}_A>G" for i in range(n)],
+        "Peptide": peptides,
+        "HLA": "HLA-A*02:01",
+        "Affinity_nM": affinities,
+        "Interpretation": [predict.classify_affinity(a) for a in affinities],
+    })
+
+
+@pytest.mark.parametrize("dtype", [float, object])
+def test_large_plot_mode(tmp_path, dtype):
+    table = binder_table().astype({"Affinity_nM": dtype})
+    html = tmp_path / "06_binders_plot.html"
+    predict.generate_html_plot(table, str(html), plot_mode="large", plotlyjs="cdn")
+    content = html.read_text()
+    assert "non-binders agrégés" in content and "scattergl" in content
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+from binder_store import BinderStore, write_store
+
+ALLELES = ["HLA-A*02:01", "HLA-B*07:02", "HLA-C*07:01"]
+
+
+def binder_table(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    gene = rng.integers(4, size=n)
+    affinity = np.round(10 ** rng.uniform(0.5, 4.5, size=n), 2)
+    return pd.DataFrame({
+        "Sequence_ID": [f"GENE{g}_ENST{g:011d}_pos{i % 9 + 1}_chr{g + 1}_{1000 + i // 9}_A>G"
+                        for i, g in enumerate(gene)],
+        "Peptide": ["".join(rng.choice(list("ACDEFGHIKLMNPQRSTVWY"), size=9)) for _ in range(n)],
+        "HLA": rng.choice(ALLELES, size=n),
+        "Affinity_nM": affinity,
+        "Interpretation": np.select([affinity < 50, affinity < 500], ["Strong binder", "Weak binder"], "Non-binder"),
+    })
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = str(tmp_path / "06_binders.sqlite")
+    write_store(binder_table(), path)
+    store = BinderStore(path)
+    yield store
+    store.close()
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"hla": "HLA-A*02:01"},
+    {"interpretation": "Strong binder", "hla": ALLELES[1:]},
+    {"max_affinity": 120.0},
+    {"gene": "GENE2"},
+    {"gene": ["GENE0", "GENE3"], "hla": "HLA-C*07:01", "max_affinity": 300.0},
+])
+def test_allele_binders_match_binders_table(store, filters):
+    columns = ["Sequence_ID", "Peptide", "HLA", "Affinity_nM", "Interpretation"]
+    expected = store.query(columns, **dict(filters, binders_only=True))
+    pd.testing.assert_frame_equal(store.allele_binders(columns, **filters), expected)
+
+
+@pytest.mark.parametrize("by, filters", [
+    (["HLA", "Interpretation"], {}),
+    (["Gene", "Interpretation"], {"hla": "HLA-B*07:02"}),
+    (["HLA"], {"gene": "GENE1", "binders_only": True}),
+])
+def test_allele_counts_match_binders_table(store, by, filters):
+    expected = store.query(**filters).groupby(by).size().rename("Count").reset_index()
+    counts = store.counts(by, **filters)
+    pd.testing.assert_frame_equal(counts, expected.sort_values(by).reset_index(drop=True), check_dtype=False)
+
+
+def test_aggregates_match_pandas(store):
+    binders = store.query()
+    best = binders.loc[binders.groupby(["CHROM", "POS", "REF", "ALT"])["Affinity_nM"].idxmin()]
+    got = store.best_by_mutation().sort_values(["CHROM", "POS"]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(
+        got[["Sequence_ID", "HLA", "Affinity_nM"]],
+        best.sort_values(["CHROM", "POS"]).reset_index(drop=True)[["Sequence_ID", "HLA", "Affinity_nM"]],
+    )
+    assert store.predicted_peptides() == sorted(binders["Peptide"].unique())
+
+
+def pandas_filter(table, gene=None, hla=None, interpretation=None, peptide=None, binders_only=False,
+                  max_affinity=None):
+    """Filtres de BinderStore._where appliqués à 06_binders_final en pandas."""
+    gene_names = table["Sequence_ID"].str.split("_").str[0]
+    keep = pd.Series(True, index=table.index)
+    for values, column in [(gene, gene_names), (hla, table["HLA"]), (peptide, table["Peptide"])]:
+        if values is not None:
+            keep &= column.isin([values] if isinstance(values, str) else values)
+    if interpretation is not None:
+        keep &= table["Interpretation"] == interpretation
+    if binders_only:
+        keep &= table["Interpretation"] != "Non-binder"
+    if max_affinity is not None:
+        keep &= table["Affinity_nM"] <= max_affinity
+    return table[keep].reset_index(drop=True)
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"gene": "GENE1", "interpretation": "Weak binder"},
+    {"hla": ALLELES[:2], "binders_only": True, "max_affinity": 250.0},
+    {"peptide": binder_table()["Peptide"].iloc[:25].tolist(), "interpretation": "Non-binder"},
+])
+def test_store_filters_match_pandas(store, filters):
+    table = binder_table()
+    expected = pandas_filter(table, **filters)
+    got = store.query(table.columns.tolist(), **filters)
+    pd.testing.assert_frame_equal(got, expected, check_dtype=False)
+
+    by = ["HLA", "Interpretation"]
+    counts = expected.groupby(by).size().rename("Count").reset_index()
+    pd.testing.assert_frame_equal(store.counts(by, **filters), counts, check_dtype=False)
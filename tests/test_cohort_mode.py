@@ -0,0 +1,51 @@
+import pandas as pd
+from Bio import SeqIO
+from delta import SEQ_ID_VARIANT
+from test_unique_peptides import run, write_inputs
+
+# GENE1 (chr1:100) et GENE3 (chr3:300) portés par des échantillons génotypés, GENE2 (chr2:200) par S3 seul
+MUTATION_SAMPLES = pd.DataFrame({
+    "CHROM": ["1", "1", "3", "2"], "POS": [100, 100, 300, 200],
+    "REF": ["A", "A", "G", "C"], "ALT": ["G", "G", "A", "T"],
+    "sample": ["S1", "S2", "S1", "S3"],
+})
+# Format large, nomenclatures hétérogènes
+GENOTYPES = pd.DataFrame({
+    "patient": ["S1", "S2"],
+    "HLA-A1": ["A*02:01", "HLA-A*02:01:01"],
+    "HLA-B1": ["B07:02", "HLA-B*08:01"],
+    "HLA-C1": [None, "C*07:01"],
+})
+ALLELES = {"S1": {"HLA-A*02:01", "HLA-B*07:02"}, "S2": {"HLA-A*02:01", "HLA-B*08:01", "HLA-C*07:01"}}
+
+
+def test_cohort_mode_predicts_carrier_alleles_only(tmp_path):
+    workdir = tmp_path / "cohort"
+    write_inputs(workdir)
+    MUTATION_SAMPLES.to_csv(workdir / "GBM.samples.tsv", sep="\t", index=False)
+    GENOTYPES.to_csv(workdir / "hla_typing.tsv", sep="\t", index=False)
+    run(workdir, "04_genere_9mers", "--input", "cosmic_somatic.tsv", "--cds_fasta", "proteome.faa",
+        "--output", "peptides_9mer.tsv")
+    run(workdir, "05_fasta", "--input", "peptides_9mer.tsv", "--mut_fasta", "mut.fasta")
+    result = run(workdir, "06_predict_binders", "--fasta", "mut.fasta",
+                 "--hla_genotypes", "hla_typing.tsv", "--mutation_samples", "GBM.samples.tsv")
+
+    # Référence : produit variant -> porteurs génotypés -> allèles
+    fasta = pd.DataFrame([(r.id, str(r.seq)) for r in SeqIO.parse(workdir / "mut.fasta", "fasta")],
+                         columns=["Sequence_ID", "Peptide"])
+    fasta = pd.concat([fasta, fasta["Sequence_ID"].str.extract(SEQ_ID_VARIANT)], axis=1)
+    carriers = fasta.merge(MUTATION_SAMPLES.astype(str), on=["CHROM", "POS", "REF", "ALT"])
+    expected = {(s, seq_id, allele) for s, seq_id in zip(carriers["sample"], carriers["Sequence_ID"])
+                for allele in ALLELES.get(s, ())}
+
+    final = pd.read_csv(workdir / "06_binders_final.tsv", sep="\t")
+    assert set(zip(final["Sequence_ID"], final["HLA"])) == {(seq_id, a) for _, seq_id, a in expected}
+    assert not final.duplicated(["Sequence_ID", "HLA"]).any()
+    assert not final["Sequence_ID"].str.contains("chr2_200").any()
+    assert "sans échantillon génotypé porteur" in result.stdout
+
+    by_sample = pd.read_csv(workdir / "06_binders_by_sample.tsv", sep="\t")
+    assert set(zip(by_sample["Sample"], by_sample["Sequence_ID"], by_sample["HLA"])) == expected
+    joined = by_sample.merge(final, on=["Sequence_ID", "Peptide", "HLA"], suffixes=("", "_final"))
+    assert len(joined) == len(by_sample)
+    pd.testing.assert_series_equal(joined["Affinity_nM"], joined["Affinity_nM_final"], check_names=False)
@@ -0,0 +1,70 @@
+import pandas as pd
+from conftest import load_script
+
+MISSENSE, CONFIRMED = "missense_variant", "Confirmed somatic variant"
+
+
+def write_inputs(tmp_path):
+    pd.DataFrame({
+        "CHROMOSOME": ["1", "1", "X", "1", "2", "1", "3"],
+        "GENOME_START": [100, 100, 500, None, 200, 300, 700],
+        "GENOME_STOP": [100, 100, 500, None, 200, 300, 700],
+        "GENOMIC_WT_ALLELE": ["A", "A", "G", "C", "T", "C", "G"],
+        "GENOMIC_MUT_ALLELE": ["G", "G", "A", "T", "C", "T", "C"],
+        "MUTATION_DESCRIPTION": [MISSENSE] * 5 + ["synonymous_variant", MISSENSE],
+        "MUTATION_SOMATIC_STATUS": [CONFIRMED] * 4 + ["Reported in another cancer sample as somatic", CONFIRMED, CONFIRMED],
+        "LEGACY_MUTATION_ID": [f"COSM{i}" for i in range(7)],
+        "MUTATION_AA": ["p.K1E", "p.K1E", "p.R2H", "p.A3V", "p.L4P", "p.S5S", "p.G6A"],
+        "MUTATION_CDS": ["c.1A>G", "c.1A>G", "c.4G>A", "c.7C>T", "c.10T>C", "c.13C>T", "c.16G>C"],
+    }).to_csv(tmp_path / "Cosmic_MutantCensus_v102_GRCh38.tsv", sep="\t", index=False)
+    pd.DataFrame({
+        "CHROM": ["X", "1", "1", "2", "3", "1"],
+        "POS": [500, 100, 300, 200, 700, 100],
+        "REF": ["G", "A", "C", "T", "G", "A"],
+        "ALT": ["A", "G", "T", "C", "C", "G"],
+        "Annotation": [MISSENSE, MISSENSE, MISSENSE, MISSENSE, "synonymous_variant", MISSENSE],
+        "Feature_ID": ["ENST1", "ENST2", "ENST3", "ENST4", "ENST5", "ENST6"],
+        "Distance": [""] * 6,
+    }).to_csv(tmp_path / "gbm.ann.tsv", sep="\t", index=False)
+
+
+def test_index_lookup_matches_pandas_join(tmp_path, run_script):
+    write_inputs(tmp_path)
+    common = ["--cosmic", "Cosmic_MutantCensus_v102_GRCh38.tsv", "--input", "gbm.ann.tsv"]
+    run_script("03_cosmic", *common, "--output", "join.tsv", "--no_index", "--no_cache")
+    run_script("03_cosmic", *common, "--output", "index.tsv")
+    run_script("03_cosmic", *common, "--output", "index_reused.tsv")
+    run_script("03_cosmic", *common, "--output", "index_memory.tsv", "--no_cache")
+
+    expected = (tmp_path / "join.tsv").read_bytes()
+    for name in ["index.tsv", "index_reused.tsv", "index_memory.tsv"]:
+        assert (tmp_path / name).read_bytes() == expected, name
+
+    merged = pd.read_csv(tmp_path / "join.tsv", sep="\t", dtype=str)
+    # COSM0 / COSM1 : deux entrées du census pour la même clé, chacune rattachée aux deux lignes ENST2 / ENST6
+    pairs = sorted(zip(merged["Feature_ID"], merged["LEGACY_MUTATION_ID"], merged["GENOME_START"]))
+    assert pairs == [("ENST1", "COSM2", "500.0"), ("ENST2", "COSM0", "100.0"), ("ENST2", "COSM1", "100.0"),
+                     ("ENST6", "COSM0", "100.0"), ("ENST6", "COSM1", "100.0")]
+
+
+def test_streamed_census_is_chunk_invariant_and_snapshot_reused(tmp_path, monkeypatch):
+    cosmic_module = load_script("03_cosmic")
+    write_inputs(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    census = "Cosmic_MutantCensus_v102_GRCh38.tsv"
+
+    # Référence : lecture complète du census puis filtre d'origine
+    full = pd.read_csv(census, sep="\t", dtype=cosmic_module.COSMIC_DTYPES)[cosmic_module.COSMIC_COLS]
+    expected = cosmic_module.filter_cosmic(full).reset_index(drop=True)
+    for chunksize in (1, 2, 100):
+        pd.testing.assert_frame_equal(cosmic_module.stream_cosmic(census, chunksize), expected)
+
+    assert cosmic_module.load_cosmic(census, "cache", use_cache=False).equals(expected)
+    assert not (tmp_path / "cache").exists()
+    first = cosmic_module.load_cosmic(census, "cache", chunksize=2)
+    snapshot = tmp_path / "cache" / "Cosmic_MutantCensus_v102_GRCh38.v102.missense_somatic.parquet"
+    assert snapshot.exists()
+    snapshot_mtime = snapshot.stat().st_mtime_ns
+    pd.testing.assert_frame_equal(cosmic_module.load_cosmic(census, "cache"), first)
+    assert snapshot.stat().st_mtime_ns == snapshot_mtime
+    pd.testing.assert_frame_equal(first, expected)
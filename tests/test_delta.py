@@ -0,0 +1,61 @@
+import pandas as pd
+from delta import (diff_manifest, key_order, merge_keyed, read_keyed, read_keys, sequence_id, sequence_keys,
+                   variant_digests, write_keys)
+
+HEADER = "CHROM\tPOS\tREF\tALT\tGene_Name\tFREQ\r\n"
+
+
+def row(chrom, pos, ref, alt, gene, freq):
+    return f"{chrom}\t{pos}\t{ref}\t{alt}\t{gene}\t{freq}\r\n"
+
+
+def test_digests_and_manifest_diff():
+    data = pd.Series([row(1, 100, "A", "G", "GENE1", 0.5), row(1, 100, "A", "G", "GENE1b", 0.5),
+                      row(2, 200, "C", "T", "GENE2", 0.1)])
+    keys = pd.Series(["1:100:A:G", "1:100:A:G", "2:200:C:T"])
+    digests = variant_digests(data, keys, "context")
+    assert sorted(digests.index) == ["1:100:A:G", "2:200:C:T"]
+    # Lignes d'un variant dans un autre ordre : même empreinte ; autre contexte : tout change
+    assert variant_digests(data[::-1].reset_index(drop=True), keys[::-1].reset_index(drop=True), "context").equals(digests)
+    assert (variant_digests(data, keys, "other") != digests).all()
+
+    edited = data.copy()
+    edited[2] = row(2, 200, "C", "T", "GENE2", 0.9)
+    new = variant_digests(pd.concat([edited[1:], pd.Series([row(3, 300, "G", "A", "GENE3", 0.2)])], ignore_index=True),
+                          pd.Series(["1:100:A:G", "2:200:C:T", "3:300:G:A"]), "context")
+    changed, removed = diff_manifest(new, digests)
+    assert sorted(changed) == ["1:100:A:G", "2:200:C:T", "3:300:G:A"]
+    assert list(removed) == []
+    changed, removed = diff_manifest(digests.drop("2:200:C:T"), digests)
+    assert list(changed) == [] and list(removed) == ["2:200:C:T"]
+
+
+def test_merge_keyed_retracts_and_follows_input_order(tmp_path):
+    path, delta_path = str(tmp_path / "cosmic_somatic.tsv"), str(tmp_path / "delta.tsv")
+    rows = {key: row(*key.split(":"), f"GENE{i}", f"0.{i}") for i, key in
+            enumerate(["1:100:A:G", "1:150:C:T", "2:200:G:A", "3:300:T:C", "X:50:A:C"])}
+    with open(path, "w", newline="") as f:
+        f.write(HEADER + rows["1:100:A:G"] + rows["1:150:C:T"] + rows["2:200:G:A"] + rows["X:50:A:C"])
+    modified = rows["1:150:C:T"].replace("\t0.1", "\t0.9")
+    with open(delta_path, "w", newline="") as f:
+        f.write(HEADER + rows["3:300:T:C"] + modified)
+
+    order = pd.Index(["3:300:T:C", "1:100:A:G", "1:150:C:T", "2:200:G:A"])
+    kept, added = merge_keyed(path, delta_path, pd.Index(["1:150:C:T", "X:50:A:C"]), order)
+    assert (kept, added) == (2, 2)
+    with open(path, newline="") as f:
+        assert f.read() == HEADER + rows["3:300:T:C"] + rows["1:100:A:G"] + modified + rows["2:200:G:A"]
+
+
+def test_fasta_keys_and_key_tables(tmp_path):
+    ids = [sequence_id("GENE 1", "ENST1.2", 3, "1", 100, "A", "G"), sequence_id("GENE2", "ENST2", 1, "X", 5, "AT", "A")]
+    with open(tmp_path / "mut.fasta", "w") as f:
+        f.writelines(f">{seq_id}\nSIINFEKLV\n" for seq_id in ids)
+    header, data, keys = read_keyed(str(tmp_path / "mut.fasta"))
+    assert header == "" and list(keys) == ["1:100:A:G", "X:5:AT:A"] == list(sequence_keys(ids))
+    assert data[0] == f">{ids[0]}\nSIINFEKLV\n" and ids[0].startswith("GENE_1_ENST1_2_pos3")
+
+    write_keys(str(tmp_path / "order.tsv"), ["2:200:C:T", "1:100:A:G", "2:200:C:T"])
+    assert list(read_keys(str(tmp_path / "order.tsv"))) == ["2:200:C:T", "1:100:A:G"]
+    assert list(key_order(pd.Index(["9:1:A:C", "1:100:A:G", "2:200:C:T", "1:100:A:G"]),
+                          ["2:200:C:T", "1:100:A:G"])) == [2, 1, 3, 0]
@@ -0,0 +1,66 @@
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+
+import pandas as pd
+from benchmark import COSMIC_FILE, PROTEOME_FILE, generate_cohort
+from conftest import PROGRAMS
+
+COMPARED = ["gbm.ann.tsv", "cosmic_somatic.tsv", "peptides_9mer.tsv", "peptides_wt.fasta", "peptides_mut.fasta",
+            "06_binders_final.tsv", "06_best_binders_by_peptide.tsv"]
+
+
+def run_pipeline(workdir, bin_dir, *args):
+    env = {**os.environ, "PATH": bin_dir + os.pathsep + os.environ["PATH"], "MPLBACKEND": "Agg"}
+    subprocess.run(
+        [sys.executable, os.path.join(PROGRAMS, "run_pipeline.py"), "--workdir", str(workdir),
+         "--cosmic", COSMIC_FILE, "--cds_fasta", PROTEOME_FILE, "--jobs", "4", *args],
+        cwd=workdir, check=True, capture_output=True, text=True, env=env,
+    )
+
+
+def read_vcf(path):
+    with open(path) as f:
+        lines = f.readlines()
+    return [line for line in lines if line.startswith("#")], [line for line in lines if not line.startswith("#")]
+
+
+def write_vcf(path, header, body):
+    with open(path, "w") as f:
+        f.writelines(header + body)
+
+
+def store_tables(path):
+    with sqlite3.connect(path) as con:
+        names = [r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")]
+        return {name: pd.read_sql(f"SELECT * FROM {name}", con) for name in names}
+
+
+def test_incremental_run_matches_full_run(tmp_path):
+    inc, full = tmp_path / "inc", tmp_path / "full"
+    inc.mkdir()
+    bin_dir = generate_cohort(str(inc), 400, seed=3)
+    vcf = inc / "gbm.ann.vcf"
+    header, body = read_vcf(vcf)
+    # Premier passage sans les variants 300 -> 339 ; au second ils arrivent, d'autres sont retirés ou retouchés
+    write_vcf(vcf, header, body[:300] + body[340:])
+    run_pipeline(inc, bin_dir, "--incremental")
+
+    second = [line.replace(";FREQ=0.", ";FREQ=0.9", 1) if i % 37 == 5 else line
+              for i, line in enumerate(body) if i % 23 != 7]
+    write_vcf(vcf, header, second)
+    run_pipeline(inc, bin_dir, "--incremental")
+
+    full.mkdir()
+    for name in ["df.csv", "gbm.ann.vcf", COSMIC_FILE, PROTEOME_FILE]:
+        shutil.copy(inc / name, full / name)
+    run_pipeline(full, bin_dir)
+
+    for name in COMPARED:
+        assert (inc / name).read_bytes() == (full / name).read_bytes(), name
+    inc_store, full_store = store_tables(inc / "06_binders.sqlite"), store_tables(full / "06_binders.sqlite")
+    assert inc_store.keys() == full_store.keys()
+    for name, table in full_store.items():
+        pd.testing.assert_frame_equal(inc_store[name], table, obj=name)
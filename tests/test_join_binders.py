@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import load_script
+from test_seqlogos import random_peptides
+
+scatter = load_script("10_scatter2")
+INTERPRETATIONS = np.array(["Strong binder", "Weak binder", "Non-binder"])
+
+
+def merge_then_filter(pep_unique, binder, max_affinity=None):
+    """Jointure gauche d'origine de 10, puis filtre des non-binders."""
+    merged = pd.merge(pep_unique, binder, left_on="MUT_9mer", right_on="Peptide", how="left")
+    keep = ~merged["Interpretation"].str.contains("Non", na=False)
+    if max_affinity is not None:
+        keep &= (merged["Affinity_nM"] <= max_affinity) | merged["Peptide"].isna()
+    return merged[keep].reset_index(drop=True)
+
+
+def cohort(seed=3):
+    rng = np.random.default_rng(seed)
+    peptides = random_peptides(rng, 80, 9)
+    # 60 peptides prédits (plusieurs allèles chacun), 20 jamais prédits
+    predicted = np.repeat(peptides[:60], rng.integers(1, 5, size=60))
+    binder = pd.DataFrame({
+        "Peptide": predicted,
+        "HLA": [f"HLA-A*0{i % 4 + 1}:01" for i in range(len(predicted))],
+        "Sequence_ID": [f"GENE{i}|ENST{i}|p.X|1" for i in range(len(predicted))],
+        "Affinity_nM": rng.uniform(5, 5000, size=len(predicted)),
+        "Interpretation": INTERPRETATIONS[rng.integers(3, size=len(predicted))],
+    }).sample(frac=1, random_state=1).reset_index(drop=True)
+    pep_unique = pd.DataFrame({
+        "conca": [f"GENE{i % 30}_p.X{i}" for i in range(120)],
+        "FREQ": rng.uniform(size=120),
+        "MUT_9mer": peptides[rng.integers(80, size=120)],
+    })
+    return pep_unique, binder
+
+
+@pytest.mark.parametrize("max_affinity", [None, 500])
+def test_indexed_join_matches_pandas_merge(max_affinity):
+    pep_unique, binder = cohort()
+    expected = merge_then_filter(pep_unique, binder, max_affinity)
+    result = scatter.join_binders(pep_unique, binder, max_affinity)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_store_binders_with_predicted_peptides_match_full_table():
+    pep_unique, binder = cohort(8)
+    binders_only = binder[~binder["Interpretation"].str.contains("Non")]
+    result = scatter.join_binders(pep_unique, binders_only, predicted=binder["Peptide"].unique())
+    pd.testing.assert_frame_equal(result, scatter.join_binders(pep_unique, binder))
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+from benchmark import AMINO_ACIDS, write_proteome
+from conftest import load_script
+
+AA_1TO3 = {one: three for three, one in load_script("04_genere_9mers").AA_3TO1.items()}
+
+
+def sliding_9mers(seq, pos1, mut_aa):
+    """Boucle d'origine de 04 (generate_9mers_sliding), référence des fenêtres vectorisées."""
+    peptides = []
+    for offset in range(9):
+        start = pos1 - (offset + 1)
+        if start < 0 or start + 9 > len(seq):
+            continue
+        wt = seq[start:start + 9]
+        peptides.append((offset + 1, wt, wt[:offset] + mut_aa + wt[offset + 1:]))
+    return peptides
+
+
+def write_mutations(tmp_path, n=300, seed=7):
+    rng = np.random.default_rng(seed)
+    residues = write_proteome(str(tmp_path / "proteome.faa"), 20, rng)
+    proteins = [row.tobytes().decode() for row in residues]
+    gene = rng.integers(len(proteins), size=n)
+    # Positions aux extrémités comprises (fenêtres tronquées en début et fin de protéine)
+    pos = np.concatenate([[1, 2, 8, 392, 399, 400], rng.integers(1, 401, size=n - 6)])
+    alt = AMINO_ACIDS[rng.integers(len(AMINO_ACIDS), size=n)].view("S1").astype(str)
+    mutations = pd.DataFrame({
+        "Gene_Name": [f"GENE{g}" for g in gene],
+        "Feature_ID": [f"ENST{g:011d}.1" for g in gene],
+        "HGVS.p": [f"p.{AA_1TO3[proteins[g][p - 1]]}{p}{AA_1TO3[a]}" for g, p, a in zip(gene, pos, alt)],
+        "CHROM": "1", "POS": np.arange(n) * 10 + 1000, "REF": "A", "ALT": "G",
+    })
+    mutations.to_csv(tmp_path / "cosmic_somatic.tsv", sep="\t", index=False)
+    return mutations, proteins, gene, pos, alt
+
+
+def test_vectorised_windows_match_sliding_loop(tmp_path, run_script):
+    mutations, proteins, gene, pos, alt = write_mutations(tmp_path)
+    run_script("04_genere_9mers", "--input", "cosmic_somatic.tsv", "--cds_fasta", "proteome.faa",
+               "--output", "peptides_9mer.tsv")
+    peptides = pd.read_csv(tmp_path / "peptides_9mer.tsv", sep="\t")
+
+    expected = [
+        (position, offset, wt, mut)
+        for g, p, a, position in zip(gene, pos, alt, mutations["POS"])
+        if a != proteins[g][p - 1]
+        for offset, wt, mut in sliding_9mers(proteins[g], int(p), a)
+    ]
+    got = list(zip(peptides["POS"], peptides["Mutant_AA_Position_in_9mer"], peptides["WT_9mer"], peptides["MUT_9mer"]))
+    assert got == expected
+
+
+def test_normalised_output_joins_back_to_wide(tmp_path, run_script):
+    write_mutations(tmp_path)
+    common = ["--input", "cosmic_somatic.tsv", "--cds_fasta", "proteome.faa"]
+    run_script("04_genere_9mers", *common, "--output", "wide.tsv")
+    run_script("04_genere_9mers", *common, "--output", "peptides.tsv", "--normalised")
+    wide = pd.read_csv(tmp_path / "wide.tsv", sep="\t")
+    peptides = pd.read_csv(tmp_path / "peptides.tsv", sep="\t")
+    mutations = pd.read_csv(tmp_path / "peptides.mutations.tsv", sep="\t")
+
+    joined = mutations.merge(peptides, on="Mutation_ID").drop(columns="Mutation_ID")
+    pd.testing.assert_frame_equal(joined[wide.columns], wide)
+    assert len(peptides.columns) < len(wide.columns)
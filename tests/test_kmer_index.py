@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+import pytest
+import kmer_index
+from kmer_index import decode, encode_peptides, open_index
+
+# Alphabet réduit : beaucoup de k-mers à une substitution les uns des autres
+ALPHABET = np.array(list("ACDE"))
+
+
+def write_fasta(path, rng):
+    proteins = ["".join(ALPHABET[rng.integers(4, size=n)]) for n in (300, 250, 8)]
+    proteins[1] = proteins[1][:100] + "X" + proteins[1][101:]
+    with open(path, "w") as f:
+        for i, seq in enumerate(proteins):
+            f.write(f">ENSP{i}.1 pep transcript:ENST{i:011d}.1\n{seq[:120]}\n{seq[120:]}\n")
+        # Sans annotation transcript : non indexé
+        f.write(">ENSP9.1 pep\nWWWWWWWWWWWW\n")
+    return proteins
+
+
+def proteome_kmers(proteins, k):
+    return {seq[i:i + k] for seq in proteins for i in range(len(seq) - k + 1) if "X" not in seq[i:i + k]}
+
+
+def brute_force_counts(queries, kmers):
+    return [sum(sum(a != b for a, b in zip(q, s)) == 1 for s in kmers) for q in queries]
+
+
+@pytest.mark.parametrize("k", [8, 9])
+def test_neighbour_counts_match_brute_force(tmp_path, monkeypatch, k):
+    rng = np.random.default_rng(k)
+    proteins = write_fasta(tmp_path / "proteome.faa", rng)
+    kmers = proteome_kmers(proteins, k)
+    queries = list(rng.choice(sorted(kmers), 60)) + ["".join(ALPHABET[rng.integers(4, size=k)]) for _ in range(60)]
+    # Une substitution d'un k-mer indexé : au moins un voisin
+    for q, i in zip(rng.choice(sorted(kmers), 40), rng.integers(k, size=40)):
+        queries.append(q[:i] + ("C" if q[i] == "A" else "A") + q[i + 1:])
+    queries += ["W" * k, "A" * (k - 1) + "W"]
+    # Petits lots : plusieurs passes de génération des voisins
+    monkeypatch.setattr(kmer_index, "QUERY_BATCH", 16)
+
+    index = open_index(str(tmp_path / "MANE.kmers"), [k], str(tmp_path / "proteome.faa"))[k]
+    assert sorted(decode(p, k) for p in index.kmers) == sorted(kmers)
+    packed, valid = encode_peptides(queries, k)
+    assert valid.all()
+    assert index.contains(packed).tolist() == [q in kmers for q in queries]
+    expected = brute_force_counts(queries, kmers)
+    assert sum(n > 0 for n in expected) >= 40
+    assert index.neighbour_counts(packed).tolist() == expected
+
+
+def test_index_rebuilt_when_fasta_changes(tmp_path):
+    fasta, prefix = tmp_path / "proteome.faa", str(tmp_path / "MANE.kmers")
+    write_fasta(fasta, np.random.default_rng(1))
+    first = np.array(open_index(prefix, [9], str(fasta))[9].kmers)
+    stamp = os.path.getmtime(kmer_index.index_path(prefix, 9))
+    open_index(prefix, [9], str(fasta))
+    assert os.path.getmtime(kmer_index.index_path(prefix, 9)) == stamp
+
+    proteins = write_fasta(fasta, np.random.default_rng(2))
+    rebuilt = open_index(prefix, [9], str(fasta))[9]
+    assert not np.array_equal(np.asarray(rebuilt.kmers), first)
+    assert sorted(decode(p, 9) for p in rebuilt.kmers) == sorted(proteome_kmers(proteins, 9))
+    with pytest.raises(FileNotFoundError):
+        open_index(prefix, [10])
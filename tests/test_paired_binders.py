@@ -0,0 +1,39 @@
+import sys
+import zlib
+
+import pandas as pd
+from benchmark import FAKE_PREDICTOR
+from test_unique_peptides import run, write_inputs
+
+HLA_COUNT = 12
+
+
+def fake_affinity(peptide, allele):
+    return 10 + zlib.crc32((peptide + allele).encode()) % 30000 / 3
+
+
+def test_paired_mode_predicts_each_sequence_once(tmp_path):
+    workdir = tmp_path / "paired"
+    write_inputs(workdir)
+    # Copie de l'entrée de mhcflurry-predict pour compter les paires prédites
+    predictor = workdir / "bin" / "mhcflurry-predict"
+    predictor.write_text(FAKE_PREDICTOR.format(python=sys.executable)
+                         + "import shutil\nshutil.copy(inp, 'predicted_input.csv')\n")
+    run(workdir, "04_genere_9mers", "--input", "cosmic_somatic.tsv", "--cds_fasta", "proteome.faa",
+        "--output", "peptides_9mer.tsv")
+    run(workdir, "06_predict_binders", "--pairs", "peptides_9mer.tsv", "--paired_output", "paired.tsv")
+
+    peptides = pd.read_csv(workdir / "peptides_9mer.tsv", sep="\t")
+    paired = pd.read_csv(workdir / "paired.tsv", sep="\t")
+    predicted = pd.read_csv(workdir / "predicted_input.csv")
+    sequences = set(peptides["WT_9mer"]) | set(peptides["MUT_9mer"])
+    assert len(predicted) == len(sequences) * HLA_COUNT
+    assert not predicted.duplicated().any()
+
+    assert len(paired) == len(peptides) * HLA_COUNT
+    for prefix in ["WT", "MUT"]:
+        expected = [fake_affinity(p, a) for p, a in zip(paired[f"{prefix}_9mer"], paired["HLA"])]
+        pd.testing.assert_series_equal(paired[f"{prefix}_Affinity_nM"], pd.Series(expected), check_names=False)
+    pd.testing.assert_series_equal(paired["Agretopicity"], paired["MUT_Affinity_nM"] / paired["WT_Affinity_nM"],
+                                   check_names=False)
+    assert set(paired["Transcript_ID"]) == set(peptides["Transcript_ID"])
@@ -0,0 +1,86 @@
+import pandas as pd
+import pytest
+from conftest import load_script
+
+PROTEIN = "MKTAYIAKQRQISFVKSHFSRQLEERLGLIEVQAPILSRVGDGTQDNLSGAEKAVQVKVKALPDAQFEVVHSLAKWKRQTLGQHDFSAGEGLYTHMKALRPDEDRLSPLHSVYVDQWDWERVMGDGERQFSTLKSTVEAIWAGIKATEAAVSEEFGLAPFLPDQIHFVHSQELLSRYPDLDAKGRERAIAKDLGAVFLVGIGGKLSDGHRHDVRAPDYDDWSAWFPVD"
+TX = "ENST00000000001"
+
+
+def write_inputs(tmp_path):
+    (tmp_path / "proteome.faa").write_text(f">ENSP00000000001.1 transcript:{TX}.1\n{PROTEIN}\n")
+    n = len(PROTEIN)
+    pd.DataFrame({
+        "Gene_Name": ["GENE1", "GENE1"],
+        "Feature_ID": [f"{TX}.1", f"{TX}.1"],
+        "HGVS.p": ["p.Lys20Gly", f"p.Ter{n + 1}GlnextTer12"],
+        "CHROM": ["1", "1"],
+        "POS": [100, 900],
+        "REF": ["A", "T"],
+        "ALT": ["G", "C"],
+    }).to_csv(tmp_path / "cosmic_somatic.tsv", sep="\t", index=False)
+
+
+def read_fasta(path):
+    lines = path.read_text().split()
+    return dict(zip(lines[::2], lines[1::2]))
+
+
+def test_all_classes_reach_fasta(tmp_path, run_script):
+    write_inputs(tmp_path)
+    run_script("04_genere_9mers", "--input", "cosmic_somatic.tsv", "--cds_fasta", "proteome.faa",
+               "--output", "peptides_9mer.tsv", "--classes", "all")
+    peptides = pd.read_csv(tmp_path / "peptides_9mer.tsv", sep="\t")
+    stop_loss = peptides[peptides["Mutation_Class"] == "stop_loss"]
+    assert len(stop_loss) == 1 and stop_loss["WT_9mer"].isna().all()
+    assert stop_loss["MUT_9mer"].iloc[0] == PROTEIN[-8:] + "Q"
+
+    run_script("05_fasta", "--input", "peptides_9mer.tsv", "--wt_fasta", "wt.fasta", "--mut_fasta", "mut.fasta")
+    wt, mut = read_fasta(tmp_path / "wt.fasta"), read_fasta(tmp_path / "mut.fasta")
+    assert len(wt) == 9 and len(mut) == 10
+    assert PROTEIN[-8:] + "Q" in mut.values()
+    assert set(wt) < set(mut)
+
+
+def test_reference_windows_skipped_with_both_sources(tmp_path):
+    from proteome_store import open_store
+    genere = load_script("04_genere_9mers")
+    (tmp_path / "proteome.faa").write_text(f">ENSP00000000001.1 transcript:{TX}.1\n{PROTEIN}\n")
+    # p.Lys75_Trp76dup dans ...AKWKRQ : une partie des fenêtres dupliquées existe déjà dans la protéine
+    hgvs = pd.Series(["p.Lys75_Trp76dup", "p.Thr3_Ala4insGlyGly", "p.Ile12del"])
+    decoded = genere.decode_hgvs_p(hgvs)
+    mutations = decoded[["Mutation_Class", "pos", "end", "alt"]].astype({"pos": int, "end": int})
+    mutations.insert(0, "Transcript_ID", TX)
+    mutations.insert(0, "Mutation_ID", range(len(mutations)))
+
+    from_fasta = genere.generate_variant_kmers(mutations, genere.parse_protein_fasta(tmp_path / "proteome.faa"))
+    with open_store(str(tmp_path / "proteome"), str(tmp_path / "proteome.faa")) as store:
+        from_store = genere.generate_variant_kmers(mutations, store)
+    pd.testing.assert_frame_equal(from_fasta, from_store)
+    assert not from_fasta["MUT_9mer"].map(lambda mut: mut in PROTEIN).any()
+
+
+@pytest.mark.parametrize("hgvs_p, mutation_class, pos, end, alt", [
+    ("p.Arg123Gly", "missense", 123, 123, "G"),
+    ("p.Arg123Ter", "nonsense", 123, 123, "*"),
+    ("p.Arg123*", "nonsense", 123, 123, "*"),
+    ("p.Arg123Arg", "synonymous", 123, 123, "R"),
+    ("p.Ile12del", "deletion", 12, 12, ""),
+    ("p.Ile12_Lys14del", "deletion", 12, 14, ""),
+    ("p.Lys75_Trp76dup", "duplication", 75, 76, ""),
+    ("p.Thr3_Ala4insGlyGly", "insertion", 3, 4, "GG"),
+    ("p.Cys28_Lys29delinsTrp", "delins", 28, 29, "W"),
+    ("p.Arg97ProfsTer23", "frameshift", 97, 97, "P"),
+    ("p.Arg97fs", "frameshift", 97, 97, ""),
+    ("p.Ter110GlnextTer17", "stop_loss", 110, 110, "Q"),
+])
+def test_decode_hgvs_p_classes(hgvs_p, mutation_class, pos, end, alt):
+    decoded = load_script("04_genere_9mers").decode_hgvs_p(pd.Series([hgvs_p])).iloc[0]
+    assert (decoded["Mutation_Class"], decoded["pos"], decoded["end"], decoded["alt"]) == (mutation_class, pos, end, alt)
+    # Seuls les missense portent un mut_aa : Ter et préfixes de frameshift ne sont plus lus comme missense
+    assert (decoded["mut_aa"] == alt) if mutation_class == "missense" else pd.isna(decoded["mut_aa"])
+
+
+@pytest.mark.parametrize("hgvs_p", ["p.?", "p.Arg123Xyz", "c.123A>G", "p.Ile14_Lys12del"])
+def test_decode_hgvs_p_unrecognised(hgvs_p):
+    decoded = load_script("04_genere_9mers").decode_hgvs_p(pd.Series([hgvs_p])).iloc[0]
+    assert pd.isna(decoded["Mutation_Class"])
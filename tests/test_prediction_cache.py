@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+from conftest import load_script
+from prediction_cache import PredictionCache
+
+predict = load_script("06_predict_binders")
+
+
+class UnsupportedAllelePredictor:
+    """Comme mhcflurry avec throw=False : NaN pour un allèle non supporté."""
+    name = "fake"
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, pairs):
+        self.calls.append(len(pairs))
+        return pairs.assign(affinity=np.where(pairs["allele"] == "HLA-X*99:99", np.nan, 42.0))
+
+
+def test_unsupported_pairs_are_not_cached(tmp_path):
+    pairs = pd.DataFrame({
+        "peptide": ["SIINFEKLL", "SIINFEKLL", "GILGFVFTL"],
+        "allele": ["HLA-A*02:01", "HLA-X*99:99", "HLA-A*02:01"],
+    })
+    predictor = UnsupportedAllelePredictor()
+    cache = PredictionCache(str(tmp_path / "cache.sqlite"), "test")
+    first = predict.predict_affinities(pairs, predictor, cache)
+    assert cache.size() == 2 and first["affinity"].isna().sum() == 1
+
+    # Seule la paire non supportée est renvoyée au prédicteur au passage suivant
+    second = predict.predict_affinities(pairs, predictor, cache)
+    cache.close()
+    assert predictor.calls == [3, 1]
+    assert second["affinity"].dtype == float and second["affinity"].isna().sum() == 1
+    assert [predict.classify_affinity(a) for a in (np.nan, 42.0, 600.0)] == ["Non-binder", "Strong binder", "Non-binder"]
@@ -0,0 +1,74 @@
+import gzip
+
+import pandas as pd
+import pytest
+import vcf_bgzf
+from Bio import bgzf
+from benchmark import generate_cohort
+from conftest import load_script
+from run_pipeline import pipeline_stages
+
+
+@pytest.mark.parametrize("with_samples", [False, True])
+def test_stage_01_writes_every_declared_output(tmp_path, run_script, with_samples):
+    generate_cohort(str(tmp_path), 50, seed=2)
+    if with_samples:
+        maf = pd.read_csv(tmp_path / "df.csv", sep="\t")
+        maf.assign(Tumor_Sample_Barcode=[f"S{i % 3}" for i in range(len(maf))]).to_csv(
+            tmp_path / "df.csv", sep="\t", index=False)
+    run_script("01_prepare_vcf_for_snpeff")
+
+    stage = pipeline_stages("cosmic.tsv", "proteome.faa")[0]
+    assert all((tmp_path / path).exists() for path in stage["outputs"])
+    samples = pd.read_csv(tmp_path / "GBM.samples.tsv", sep="\t")
+    assert samples.columns.tolist() == ["CHROM", "POS", "REF", "ALT", "sample"]
+    assert len(samples) == (50 if with_samples else 0)
+
+
+def shuffled_maf(tmp_path):
+    generate_cohort(str(tmp_path), 300, seed=6)
+    maf = pd.read_csv(tmp_path / "df.csv", sep="\t")
+    # Doublons de position (tri stable) et chromosomes préfixés 'chr'
+    maf = pd.concat([maf, maf.iloc[:20].assign(Tumor_Seq_Allele2="N")]).sample(frac=1, random_state=3)
+    maf["chrom"] = maf["chrom"].where(maf.index % 5 != 0, "chr" + maf["chrom"].astype(str))
+    maf.to_csv(tmp_path / "df.csv", sep="\t", index=False)
+
+
+def data_lines(text):
+    return [line for line in text.splitlines(keepends=True) if not line.startswith("#")]
+
+
+def test_external_sort_matches_in_memory_sort(tmp_path, run_script):
+    prepare = load_script("01_prepare_vcf_for_snpeff")
+    shuffled_maf(tmp_path)
+    run_script("01_prepare_vcf_for_snpeff", "--output", "unsorted.vcf")
+    run_script("01_prepare_vcf_for_snpeff", "--output", "sorted.vcf", "--sort", "--chunksize", 7)
+    run_script("01_prepare_vcf_for_snpeff", "--output", "sorted.vcf.gz", "--chunksize", 7)
+
+    expected = sorted(data_lines((tmp_path / "unsorted.vcf").read_text()), key=prepare.line_key)
+    assert data_lines((tmp_path / "sorted.vcf").read_text()) == expected
+    with gzip.open(tmp_path / "sorted.vcf.gz", "rt") as f:
+        assert data_lines(f.read()) == expected
+
+
+def test_bgzf_virtual_offsets_round_trip(tmp_path, monkeypatch):
+    prepare = load_script("01_prepare_vcf_for_snpeff")
+    shuffled_maf(tmp_path)
+    vcf_df = prepare.sort_chunk(prepare.maf_to_vcf(pd.read_csv(tmp_path / "df.csv", sep="\t", dtype=str)))
+    lines = data_lines(vcf_df.to_csv(sep="\t", index=False, header=False))
+    monkeypatch.setattr(vcf_bgzf, "INDEX_EVERY", 16)
+    path = str(tmp_path / "GBM.vcf.gz")
+    vcf_bgzf.write_bgzip(prepare.VCF_HEADER, lines, path, tabix=False)
+
+    blocks = vcf_bgzf.load_block_index(path)
+    index = pd.read_csv(vcf_bgzf.index_path_for(path), sep="\t", dtype={"chrom": str})
+    assert len(blocks) > len(lines) // 16 and sum(n for _, n in blocks) == len(lines)
+    read_back = []
+    with bgzf.BgzfReader(path, "rt") as reader:
+        for (offset, n_records), row in zip(blocks, index.itertuples()):
+            reader.seek(offset)
+            block = [reader.readline() for _ in range(n_records)]
+            assert block[0].split("\t")[:2] == [row.chrom, str(row.first_pos)]
+            assert block[-1].split("\t")[:2] == [row.chrom, str(row.last_pos)]
+            read_back.extend(block)
+    assert read_back == lines
@@ -0,0 +1,32 @@
+import os
+
+import numpy as np
+from benchmark import write_proteome
+from conftest import load_script
+from proteome_store import open_store
+
+
+def test_store_matches_parsed_fasta(tmp_path):
+    fasta = str(tmp_path / "proteome.faa")
+    write_proteome(fasta, 30, np.random.default_rng(5))
+    expected = load_script("04_genere_9mers").parse_protein_fasta(fasta)
+
+    with open_store(str(tmp_path / "proteome"), fasta) as store:
+        assert sorted(store.keys()) == sorted(expected)
+        for tx, seq in expected.items():
+            protein = store[tx]
+            assert (len(protein), str(protein)) == (len(seq), seq)
+            assert protein[5:14] == store.window(tx, 5, 14) == seq[5:14]
+            assert protein[-3:] == seq[-3:] and protein[0] == seq[0] and protein[::2] == seq[::2]
+            assert seq[100:109] in protein and "W" * 12 not in protein
+
+
+def test_store_rebuilt_when_fasta_changes(tmp_path):
+    fasta, prefix = str(tmp_path / "proteome.faa"), str(tmp_path / "proteome")
+    write_proteome(fasta, 3, np.random.default_rng(6))
+    with open_store(prefix, fasta) as store:
+        tx = sorted(store.keys())[0]
+    (tmp_path / "proteome.faa").write_text(f">ENSP0.1 pep transcript:{tx}.1\nMKTAYIAK\n")
+    os.utime(fasta, ns=(os.stat(fasta).st_atime_ns, os.stat(fasta).st_mtime_ns + 10**9))
+    with open_store(prefix, fasta) as store:
+        assert list(store.keys()) == [tx] and str(store[tx]) == "MKTAYIAK"
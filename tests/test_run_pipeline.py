@@ -0,0 +1,62 @@
+import os
+
+import run_pipeline as pipeline
+from run_pipeline import run_pipeline
+
+# Étape jouet : copie son entrée en majuscules et trace son exécution dans runs.log
+STAGE_SCRIPT = '''import sys
+src, dst, name = sys.argv[1:]
+with open(dst, "w") as out, open(src) as f:
+    out.write(f.read().upper())
+with open("runs.log", "a") as log:
+    log.write(name + "\\n")
+'''
+
+
+def toy_stages(tmp_path, monkeypatch):
+    (tmp_path / "copy_upper.py").write_text(STAGE_SCRIPT)
+    monkeypatch.setattr(pipeline, "PROGRAMS_DIR", str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    script = "copy_upper.py"
+    return [
+        dict(name="a", script=script, args=["in.txt", "a.txt", "a"], inputs=["in.txt"], outputs=["a.txt"]),
+        dict(name="b", script=script, args=["a.txt", "b.txt", "b"], inputs=["a.txt"], outputs=["b.txt"]),
+        dict(name="c", script=script, args=["in.txt", "c.txt", "c"], inputs=["in.txt"], outputs=["c.txt"]),
+    ]
+
+
+def runs(tmp_path, monkeypatch, **options):
+    log = tmp_path / "runs.log"
+    log.write_text("")
+    assert run_pipeline(toy_stages(tmp_path, monkeypatch), jobs=2, **options)
+    return sorted(log.read_text().split())
+
+
+def test_stages_rerun_only_when_their_fingerprint_changes(tmp_path, monkeypatch):
+    (tmp_path / "in.txt").write_text("gbm\n")
+    assert runs(tmp_path, monkeypatch) == ["a", "b", "c"]
+    assert runs(tmp_path, monkeypatch) == []
+
+    # Même contenu, mtime modifié : empreinte de contenu inchangée
+    os.utime(tmp_path / "in.txt", (0, 0))
+    assert runs(tmp_path, monkeypatch) == []
+
+    (tmp_path / "in.txt").write_text("mhc\n")
+    assert runs(tmp_path, monkeypatch) == ["a", "b", "c"]
+    assert (tmp_path / "b.txt").read_text() == "MHC\n"
+
+    (tmp_path / "b.txt").unlink()
+    assert runs(tmp_path, monkeypatch) == ["b"]
+
+    # a relancée, sortie identique : b reste à jour
+    assert runs(tmp_path, monkeypatch, force={"a"}) == ["a"]
+    assert runs(tmp_path, monkeypatch, dry_run=True, force={"a"}) == []
+
+
+def test_failed_stage_blocks_its_dependents(tmp_path, monkeypatch):
+    stages = toy_stages(tmp_path, monkeypatch)
+    stages[0]["args"] = ["missing.txt", "a.txt", "a"]
+    (tmp_path / "in.txt").write_text("gbm\n")
+    assert not run_pipeline(stages, jobs=2)
+    assert (tmp_path / "c.txt").exists()
+    assert not (tmp_path / "b.txt").exists()
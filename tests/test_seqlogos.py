@@ -0,0 +1,60 @@
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+from benchmark import AMINO_ACIDS
+from conftest import load_script
+
+seqlogos = load_script("08_generate_seqlogos")
+
+
+def loop_pwm(peptides):
+    """Boucle d'origine de 08 (build_pwm), référence de la PWM vectorisée."""
+    length = len(peptides[0])
+    counts = [defaultdict(int) for _ in range(length)]
+    for pep in peptides:
+        for i, aa in enumerate(pep):
+            counts[i][aa] += 1
+    all_aas = sorted({aa for pos in counts for aa in pos.keys()})
+    pwm_df = pd.DataFrame({aa: [counts[i].get(aa, 0) for i in range(length)] for aa in all_aas})
+    return pwm_df / pwm_df.sum(axis=1).values[:, None]
+
+
+def random_peptides(rng, n, length, alphabet=AMINO_ACIDS):
+    return alphabet[rng.integers(len(alphabet), size=(n, length))].view(f"S{length}").ravel().astype(str)
+
+
+def test_vectorised_pwms_match_loop():
+    rng = np.random.default_rng(11)
+    peptides = random_peptides(rng, 500, 9)
+    alleles = np.array(["HLA-A*02:01", "HLA-B*07:02", "HLA-C*07:01", "HLA-A*01:01"])[rng.integers(4, size=500)]
+    # Alphabet réduit pour un allèle : acides aminés absents de la PWM
+    narrow = random_peptides(rng, 20, 9, AMINO_ACIDS[:3])
+    peptides, alleles = np.concatenate([peptides, narrow]), np.concatenate([alleles, ["HLA-B*08:01"] * 20])
+
+    pwms = seqlogos.build_pwms(peptides, alleles)
+    assert sorted(pwms) == sorted(set(alleles))
+    for allele, pwm in pwms.items():
+        pd.testing.assert_frame_equal(pwm, loop_pwm(list(peptides[alleles == allele])), check_exact=True)
+    pd.testing.assert_frame_equal(seqlogos.build_pwm(list(narrow)), loop_pwm(list(narrow)))
+    assert seqlogos.build_pwm([]) is None
+
+
+def test_logo_cache_reuses_rendered_pngs(tmp_path, run_script):
+    rng = np.random.default_rng(5)
+    alleles = np.array(["HLA-A*02:01", "HLA-B*07:02", "HLA-C*07:01"])
+    pd.DataFrame({
+        "Peptide": random_peptides(rng, 60, 9),
+        "HLA": alleles[np.arange(60) % 3],
+        "Interpretation": np.where(np.arange(60) % 4 == 0, "Non-binder", "Strong binder"),
+    }).to_csv(tmp_path / "06_binders_final.tsv", sep="\t", index=False)
+
+    run_script("08_generate_seqlogos", "--workers", 2)
+    cached = sorted(p.name for p in (tmp_path / "08_logo_cache").iterdir())
+    first = (tmp_path / "08_seqlogos.html").read_bytes()
+    assert len(cached) == 3 and first.count(b"data:image/png;base64,") == 3
+
+    stamps = {p.name: p.stat().st_mtime_ns for p in (tmp_path / "08_logo_cache").iterdir()}
+    run_script("08_generate_seqlogos")
+    assert {p.name: p.stat().st_mtime_ns for p in (tmp_path / "08_logo_cache").iterdir()} == stamps
+    assert (tmp_path / "08_seqlogos.html").read_bytes() == first
@@ -0,0 +1,81 @@
+import os
+import sys
+import zlib
+
+import pandas as pd
+import pytest
+import predictors
+from benchmark import FAKE_PREDICTOR
+from predictors import SubprocessPredictor, predict_sharded, split_shards
+
+ALLELES = ["HLA-A*02:01", "HLA-B*07:02", "HLA-C*07:01"]
+
+
+class RecordingPredictor:
+    """Affinité déterministe ; échoue sur les shards contenant `fail_on`."""
+    name = "subprocess"
+
+    def __init__(self, calls, fail_on=None):
+        self.calls, self.fail_on = calls, fail_on
+
+    def predict(self, pairs):
+        if self.fail_on is not None and (pairs["peptide"] == self.fail_on).any():
+            raise RuntimeError("prédiction interrompue")
+        self.calls.append(len(pairs))
+        return pairs.assign(affinity=[10 + zlib.crc32((p + a).encode()) % 30000 / 3
+                                      for p, a in zip(pairs["peptide"], pairs["allele"])])
+
+
+def input_pairs(n=60):
+    peptides = [f"SIINF{i:04d}" for i in range(n)]
+    return pd.DataFrame({"peptide": [p for p in peptides for _ in ALLELES],
+                         "allele": [a for _ in peptides for a in ALLELES]})
+
+
+def test_resume_after_interrupted_run(tmp_path, monkeypatch):
+    pairs, shard_dir = input_pairs(), str(tmp_path / "shards")
+    shards = split_shards(pairs, 8)
+    calls = []
+    # Premier passage interrompu sur le 5e shard : les 4 premiers restent sur disque
+    fail_on = shards[4]["peptide"].iloc[0]
+    monkeypatch.setattr(predictors, "get_predictor", lambda *args: RecordingPredictor(calls, fail_on))
+    with pytest.raises(RuntimeError):
+        predict_sharded(pairs, shard_dir, n_shards=8)
+    assert len(os.listdir(shard_dir)) == 4
+
+    calls.clear()
+    monkeypatch.setattr(predictors, "get_predictor", lambda *args: RecordingPredictor(calls))
+    result = predict_sharded(pairs, shard_dir, n_shards=8)
+    assert calls == [len(shard) for shard in shards[4:]]
+    assert len(result) == len(pairs)
+    assert set(zip(result["peptide"], result["allele"])) == set(zip(pairs["peptide"], pairs["allele"]))
+    assert not os.path.exists(shard_dir)
+
+
+def test_allele_shards_honour_n_shards():
+    pairs = input_pairs(10)
+    shards = split_shards(pairs, 2, shard_by="allele")
+    assert [sorted(shard["allele"].unique()) for shard in shards] == [ALLELES[::2], ALLELES[1:2]]
+    assert sum(map(len, shards)) == len(pairs)
+    assert len(split_shards(pairs, 16, shard_by="allele")) == len(ALLELES)
+
+
+@pytest.mark.parametrize("shard_by", ["hash", "allele"])
+def test_sharded_pool_matches_single_prediction(tmp_path, monkeypatch, shard_by):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    (bin_dir / "mhcflurry-predict").write_text(FAKE_PREDICTOR.format(python=sys.executable))
+    (bin_dir / "mhcflurry-predict").chmod(0o755)
+    monkeypatch.setenv("PATH", str(bin_dir) + os.pathsep + os.environ["PATH"])
+    monkeypatch.chdir(tmp_path)
+    pairs = input_pairs(40)
+
+    shards = split_shards(pairs, 4, shard_by)
+    keys = [set(zip(shard["peptide"], shard["allele"])) for shard in shards]
+    assert sum(map(len, keys)) == len(set.union(*keys)) == len(pairs)
+
+    expected = SubprocessPredictor().predict(pairs)
+    result = predict_sharded(pairs, str(tmp_path / "shards"), n_shards=4, shard_by=shard_by, workers=2)
+    order = ["allele", "peptide"]
+    pd.testing.assert_frame_equal(result.sort_values(order, ignore_index=True)[expected.columns],
+                                  expected.sort_values(order, ignore_index=True))
@@ -0,0 +1,78 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+from binder_store import BinderStore, store_table, write_store
+from test_binder_store import binder_table
+
+
+def predictions():
+    """06_binders_final avec affinités manquantes, égalités d'affinité et un identifiant hors format 05."""
+    table = binder_table(800, seed=4)
+    table.loc[::37, ["Affinity_nM"]] = np.nan
+    table.loc[::37, "Interpretation"] = "Non-binder"
+    table.loc[5::50, "Affinity_nM"] = table["Affinity_nM"].iloc[4]
+    table.loc[len(table)] = ["PEP12", "SIINFEKLV", "HLA-A*02:01", 42.0, "Strong binder"]
+    return table
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    path = str(tmp_path / "06_binders.sqlite")
+    write_store(predictions(), path)
+    return path
+
+
+def test_allele_counts_cube_matches_groupby(store_path):
+    rows = store_table(predictions())
+    expected = (rows.groupby(["HLA", "Bucket", "Gene"], dropna=False).size().rename("Count")
+                .reset_index().sort_values(["HLA", "Bucket", "Gene"]).reset_index(drop=True))
+    with sqlite3.connect(store_path) as con:
+        cube = pd.read_sql_query("SELECT * FROM allele_counts ORDER BY HLA, Bucket, Gene", con)
+    cube = cube.sort_values(["HLA", "Bucket", "Gene"]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(cube, expected, check_dtype=False)
+
+
+def test_mutation_best_and_predicted_peptides_match_pandas(store_path):
+    rows = store_table(predictions())
+    predicted = rows[rows["Affinity_nM"].notna()]
+    # Variant (ou Sequence_ID hors format) -> première ligne d'affinité minimale
+    keys = predicted["CHROM"] + ":" + predicted["POS"].astype(str) + ":" + predicted["REF"] + ":" + predicted["ALT"]
+    group = keys.fillna(predicted["Sequence_ID"])
+    best = predicted.loc[predicted.groupby(group)["Affinity_nM"].idxmin()]
+    store = BinderStore(store_path)
+    try:
+        got = store.best_by_mutation()
+        peptides = pd.read_sql_query("SELECT * FROM predicted_peptides", store.con)
+    finally:
+        store.close()
+    assert got["Affinity_nM"].is_monotonic_increasing
+    columns = ["Sequence_ID", "Peptide", "HLA", "Affinity_nM"]
+    pd.testing.assert_frame_equal(got.sort_values("Sequence_ID", ignore_index=True)[columns],
+                                  best.sort_values("Sequence_ID", ignore_index=True)[columns])
+
+    expected = rows.groupby("Peptide").agg(N_Predictions=("HLA", "size"), Best_Affinity_nM=("Affinity_nM", "min"))
+    pd.testing.assert_frame_equal(peptides, expected.reset_index(), check_dtype=False)
+
+
+def test_scatter_report_from_store_matches_table(tmp_path, run_script, store_path):
+    # Ordre des colonnes de 06_binders_final écrit par 06
+    table = predictions()[["Peptide", "HLA", "Sequence_ID", "Affinity_nM", "Interpretation"]]
+    table.to_csv(tmp_path / "06_binders_final.tsv", sep="\t", index=False)
+    rng = np.random.default_rng(2)
+    peptides = np.concatenate([table["Peptide"].to_numpy()[rng.integers(len(table), size=150)], ["WWWWWWWWW"]])
+    pd.DataFrame({
+        "Gene_Name": [f"GENE{i % 7}" for i in range(len(peptides))],
+        "HGVS.p": [f"p.Ser{i}Gly" for i in range(len(peptides))],
+        "FREQ": rng.uniform(size=len(peptides)).round(4),
+        "MUT_9mer": peptides,
+        "Mutant_AA_Position_in_9mer": rng.integers(1, 10, size=len(peptides)),
+        "LEGACY_MUTATION_ID": [f"COSM{i}" for i in range(len(peptides))],
+    }).to_csv(tmp_path / "peptides_9mer.tsv", sep="\t", index=False)
+
+    outputs = {}
+    for mode, source in [("table", ["--binders", "06_binders_final.tsv"]), ("store", ["--store", store_path])]:
+        run_script("10_scatter2", "--peptides", "peptides_9mer.tsv", *source, "--max_affinity", 400, "--top_k", 2)
+        outputs[mode] = (tmp_path / "10_peptides_mutations.tsv").read_bytes()
+    assert outputs["store"] == outputs["table"]
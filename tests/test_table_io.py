@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+from table_io import read_table, table_columns, write_table
+
+
+def binders_table():
+    return pd.DataFrame({
+        "Sequence_ID": ["GENE1|ENST1|p.Ser20Gly|5", "GENE2|ENST2|p.Asp10Val|1", "GENE1|ENST1|p.Ser20Gly|5"],
+        "CHROM": ["1", "X", "1"],
+        "POS": pd.array([100, 2_000_000_001, None], dtype="Int64"),
+        "HLA": ["HLA-A*02:01", "HLA-B*07:02", "HLA-A*02:01"],
+        "Affinity_nM": [12.345678901234567, 1 / 3, float("nan")],
+        "Interpretation": ["Strong binder", "Non-binder", None],
+        "Peptide": ["SIINFEKLV", "GILGFVFTL", "SIINFEKLV"],
+    })
+
+
+@pytest.mark.parametrize("name", ["binders.tsv", "binders.parquet"])
+def test_round_trip_keeps_values_and_dtypes(tmp_path, name):
+    table, path = binders_table(), str(tmp_path / name)
+    write_table(table, path)
+    assert table_columns(path) == table.columns.tolist()
+
+    result = read_table(path)
+    pd.testing.assert_frame_equal(result, table)
+    assert str(result["POS"].dtype) == "Int64" and result["Affinity_nM"].dtype == "float64"
+    assert isinstance(read_table(path, categorical=True)["HLA"].dtype, pd.CategoricalDtype)
+
+
+@pytest.mark.parametrize("name", ["binders.tsv", "binders.parquet"])
+def test_projection_ignores_missing_columns(tmp_path, name):
+    path = str(tmp_path / name)
+    write_table(binders_table(), path)
+    result = read_table(path, columns=["Peptide", "Affinity_nM", "Absent"])
+    assert sorted(result.columns) == ["Affinity_nM", "Peptide"]
+
+
+def test_parquet_tsv_export_matches_tsv(tmp_path):
+    write_table(binders_table(), str(tmp_path / "binders.parquet"), tsv_export=True)
+    write_table(binders_table(), str(tmp_path / "direct.tsv"))
+    assert (tmp_path / "binders.tsv").read_bytes() == (tmp_path / "direct.tsv").read_bytes()
+    pd.testing.assert_frame_equal(read_table(str(tmp_path / "binders.parquet")), read_table(str(tmp_path / "direct.tsv")))
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+from telemetry import PROFILE_ENV, TELEMETRY_ENV, Telemetry
+from test_kmer_generation import write_mutations
+
+
+def read_lines(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_steps_and_total_are_json_lines(tmp_path):
+    path = tmp_path / "telemetry.jsonl"
+    telemetry = Telemetry("04", path=str(path))
+    with telemetry.step("load", rows_in=10) as step:
+        step.rows_out = 8
+    with pytest.raises(ValueError):
+        with telemetry.step("fail"):
+            raise ValueError("étape interrompue")
+    telemetry.rows_in, telemetry.rows_out = 10, 8
+    telemetry.close()
+    telemetry.close()
+
+    entries = read_lines(path)
+    assert [e["step"] for e in entries] == ["load", "fail", "total"]
+    assert {e["stage"] for e in entries} == {"04"}
+    assert (entries[0]["rows_in"], entries[0]["rows_out"]) == (10, 8)
+    assert entries[1]["rows_in"] is None and entries[1]["rows_per_s"] is None
+    assert (entries[2]["rows_in"], entries[2]["rows_out"]) == (10, 8)
+    for entry in entries:
+        assert entry["wall_s"] >= 0 and entry["cpu_s"] >= 0 and entry["peak_rss_mb"] > 0
+
+
+def test_environment_disables_telemetry_and_enables_profile(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv(TELEMETRY_ENV, "0")
+    monkeypatch.setenv(PROFILE_ENV, "05,06")
+    telemetry = Telemetry("06")
+    with telemetry.step("predict"):
+        pass
+    telemetry.close()
+    assert not (tmp_path / "telemetry.jsonl").exists()
+    assert (tmp_path / "06.prof").exists()
+    Telemetry("04").close()
+    assert not (tmp_path / "04.prof").exists()
+
+
+def test_script_appends_its_steps(tmp_path, run_script):
+    mutations = write_mutations(tmp_path)[0]
+    for _ in range(2):
+        run_script("04_genere_9mers", "--input", "cosmic_somatic.tsv", "--cds_fasta", "proteome.faa",
+                   "--output", "peptides_9mer.tsv")
+    entries = read_lines(tmp_path / "telemetry.jsonl")
+    totals = [e for e in entries if e["step"] == "total"]
+    assert len(totals) == 2 and len({e["pid"] for e in totals}) == 2
+    assert {e["stage"] for e in entries} == {"04"}
+    assert totals[0]["rows_in"] == len(mutations)
+    assert totals[0]["rows_out"] == sum(1 for _ in open(tmp_path / "peptides_9mer.tsv")) - 1
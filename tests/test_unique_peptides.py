@@ -0,0 +1,79 @@
+import os
+import stat
+import subprocess
+import sys
+
+import pandas as pd
+from benchmark import FAKE_PREDICTOR
+from binder_store import BinderStore
+from conftest import PROGRAMS
+from test_peptide_classes import PROTEIN
+
+PARALOG = PROTEIN[::-1]
+
+
+def write_inputs(workdir):
+    """Deux transcrits de même séquence mutés au même résidu (peptides partagés) et un troisième transcrit."""
+    workdir.mkdir()
+    (workdir / "proteome.faa").write_text(
+        f">ENSP1.1 transcript:ENST00000000001.1\n{PROTEIN}\n"
+        f">ENSP2.1 transcript:ENST00000000002.1\n{PROTEIN}\n"
+        f">ENSP3.1 transcript:ENST00000000003.1\n{PARALOG}\n"
+    )
+    pd.DataFrame({
+        "Gene_Name": ["GENE1", "GENE2", "GENE3"],
+        "Feature_ID": ["ENST00000000001.1", "ENST00000000002.1", "ENST00000000003.1"],
+        "HGVS.p": ["p.Ser20Gly", "p.Ser20Gly", "p.Asp10Val"],
+        "CHROM": ["1", "2", "3"],
+        "POS": [100, 200, 300],
+        "REF": ["A", "C", "G"],
+        "ALT": ["G", "T", "A"],
+    }).to_csv(workdir / "cosmic_somatic.tsv", sep="\t", index=False)
+    bin_dir = workdir / "bin"
+    bin_dir.mkdir()
+    predictor = bin_dir / "mhcflurry-predict"
+    predictor.write_text(FAKE_PREDICTOR.format(python=sys.executable))
+    predictor.chmod(predictor.stat().st_mode | stat.S_IXUSR)
+
+
+def run(workdir, name, *args):
+    env = {**os.environ, "PATH": str(workdir / "bin") + os.pathsep + os.environ["PATH"], "MPLBACKEND": "Agg"}
+    return subprocess.run([sys.executable, os.path.join(PROGRAMS, name + ".py"), *args],
+                          cwd=workdir, check=True, capture_output=True, text=True, env=env)
+
+
+def test_unique_peptides_keep_variant_identity(tmp_path):
+    wide, unique = tmp_path / "wide", tmp_path / "unique"
+    for workdir in (wide, unique):
+        write_inputs(workdir)
+    peptides = ["--input", "cosmic_somatic.tsv", "--cds_fasta", "proteome.faa", "--output", "peptides_9mer.tsv"]
+
+    run(wide, "04_genere_9mers", *peptides)
+    run(wide, "05_fasta", "--input", "peptides_9mer.tsv", "--mut_fasta", "mut.fasta")
+    run(wide, "06_predict_binders", "--fasta", "mut.fasta", "--store", "binders.sqlite")
+
+    run(unique, "04_genere_9mers", *peptides, "--unique_output", "peptides_unique.tsv")
+    run(unique, "05_fasta", "--unique", "peptides_unique.tsv", "--mut_fasta", "mut.fasta")
+    unique_ids = (unique / "mut.fasta").read_text().count(">")
+    assert unique_ids < (wide / "mut.fasta").read_text().count(">")
+    run(unique, "06_predict_binders", "--fasta", "mut.fasta", "--store", "binders.sqlite",
+        "--peptide_sources", "peptides_unique.sources.tsv")
+
+    for name in ["06_binders_final.tsv", "06_best_binders_by_peptide.tsv"]:
+        assert (unique / name).read_bytes() == (wide / name).read_bytes(), name
+    store = BinderStore(str(unique / "binders.sqlite"))
+    try:
+        assert sorted(store.distinct("Gene")) == ["GENE1", "GENE2", "GENE3"]
+        assert len(store.best_by_mutation()) == 3
+    finally:
+        store.close()
+
+
+def test_unique_peptides_without_sources_warn(tmp_path):
+    workdir = tmp_path / "unique"
+    write_inputs(workdir)
+    run(workdir, "04_genere_9mers", "--input", "cosmic_somatic.tsv", "--cds_fasta", "proteome.faa",
+        "--output", "peptides_9mer.tsv", "--unique_output", "peptides_unique.tsv")
+    run(workdir, "05_fasta", "--unique", "peptides_unique.tsv", "--mut_fasta", "mut.fasta")
+    result = run(workdir, "06_predict_binders", "--fasta", "mut.fasta")
+    assert "sans --peptide_sources" in result.stdout
@@ -0,0 +1,96 @@
+import gzip
+import json
+
+import pandas as pd
+import pytest
+from benchmark import generate_cohort
+from vcf_bgzf import INDEX_EVERY
+
+
+def parse_steps(tmp_path):
+    with open(tmp_path / "telemetry.jsonl") as f:
+        return [json.loads(line) for line in f if '"parse_variants"' in line]
+
+
+@pytest.fixture
+def cohort(tmp_path):
+    generate_cohort(str(tmp_path), 120, seed=1)
+    return tmp_path
+
+
+@pytest.mark.parametrize("threads", [1, 3])
+def test_mane_mode_counts_dropped_variants(cohort, run_script, threads):
+    # Transcrits MANE : un gène sur deux (ENST pairs) ; les variants des autres gènes sont écartés
+    body = [line for line in (cohort / "gbm.ann.vcf").read_text().splitlines() if not line.startswith("#")]
+    transcripts = sorted({line.split("|")[6].split(".")[0] for line in body})
+    mane = transcripts[::2]
+    (cohort / "mane.txt").write_text("\n".join(mane) + "\n")
+    kept = sum(line.split("|")[6].split(".")[0] in mane for line in body)
+
+    result = run_script("02_vcf_to_tsv_postEff", "gbm.ann.vcf", "gbm.ann.tsv", "--threads", threads,
+                        "--ann_mode", "mane", "--transcripts", "mane.txt")
+    assert f"[INFO] {len(body) - kept} variants sans transcrit MANE écartés" in result.stdout
+    assert len((cohort / "gbm.ann.tsv").read_text().splitlines()) == kept + 1
+    step, = parse_steps(cohort)
+    assert (step["rows_in"], step["rows_out"]) == (len(body), kept)
+
+
+def test_threaded_parsing_matches_sequential(tmp_path, run_script):
+    # Assez de variants pour plusieurs blocs de l'index BGZF (un point d'entrée tous les INDEX_EVERY)
+    n_variants = 2 * INDEX_EVERY + 500
+    generate_cohort(str(tmp_path), n_variants, seed=4)
+    text = (tmp_path / "gbm.ann.vcf").read_text()
+    (tmp_path / "crlf.vcf").write_bytes(text.replace("\n", "\r\n").encode())
+    with gzip.open(tmp_path / "plain.vcf.gz", "wt") as f:
+        f.write(text)
+    run_script("vcf_bgzf", "gbm.ann.vcf", "indexed.vcf.gz")
+
+    run_script("02_vcf_to_tsv_postEff", "gbm.ann.vcf", "expected.tsv")
+    expected = (tmp_path / "expected.tsv").read_bytes()
+    assert expected.count(b"\n") == n_variants + 1
+    for vcf in ["gbm.ann.vcf", "crlf.vcf", "plain.vcf.gz", "indexed.vcf.gz"]:
+        for threads in (1, 3):
+            run_script("02_vcf_to_tsv_postEff", vcf, "out.tsv", "--threads", threads)
+            assert (tmp_path / "out.tsv").read_bytes() == expected, (vcf, threads)
+    assert [step["rows_in"] for step in parse_steps(tmp_path)] == [n_variants] * 9
+
+
+def ann(consequence, transcript):
+    return f"A|{consequence}|MODERATE|GENE1|ENSG1|transcript|{transcript}.1|protein_coding|1/1|c.1A>G|p.Lys1Glu|1/9|1/9|1/3||"
+
+
+MULTI_ANN_VCF = (
+    "##fileformat=VCFv4.2\n"
+    '##INFO=<ID=GENE,Number=1,Type=String,Description="Gene">\n'
+    '##INFO=<ID=DP,Number=1,Type=Integer,Description="Depth">\n'
+    "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+    f"1\t100\t.\tG\tA\t.\t.\tGENE=GENE1;ANN={ann('missense_variant', 'ENST1')},{ann('synonymous_variant', 'ENST2')}\n"
+    f"1\t200\t.\tG\tA\t.\t.\tGENE=GENE1;SOMATIC;ANN={ann('synonymous_variant', 'ENST1')},{ann('missense_variant', 'ENST3')}\n"
+    "1\t300\t.\tG\tA\t.\t.\tGENE=GENE1;DP=12\n"
+)
+
+
+@pytest.mark.parametrize("options, expected", [
+    ([], [(100, "ENST1.1"), (200, "ENST1.1"), (300, None)]),
+    (["--ann_mode", "all"], [(100, "ENST1.1"), (100, "ENST2.1"), (200, "ENST1.1"), (200, "ENST3.1"), (300, None)]),
+    (["--ann_mode", "mane", "--transcripts", "mane.txt"], [(100, "ENST1.1"), (200, "ENST1.1"), (300, None)]),
+    (["--ann_mode", "all", "--annotation", "missense_variant"], [(100, "ENST1.1"), (200, "ENST3.1")]),
+    (["--annotation", "missense_variant"], [(100, "ENST1.1")]),
+])
+def test_annotation_selection(tmp_path, run_script, options, expected):
+    (tmp_path / "multi.vcf").write_text(MULTI_ANN_VCF)
+    (tmp_path / "mane.txt").write_text("ENST1\n")
+    run_script("02_vcf_to_tsv_postEff", "multi.vcf", "multi.tsv", *options)
+    table = pd.read_csv(tmp_path / "multi.tsv", sep="\t")
+    rows = list(zip(table["POS"], table["Feature_ID"].astype(object).where(table["Feature_ID"].notna(), None)))
+    assert rows == expected
+
+
+def test_info_schema_auto_keeps_undeclared_keys(tmp_path, run_script):
+    (tmp_path / "multi.vcf").write_text(MULTI_ANN_VCF)
+    result = run_script("02_vcf_to_tsv_postEff", "multi.vcf", "multi.tsv")
+    assert "SOMATIC" in result.stdout
+    table = pd.read_csv(tmp_path / "multi.tsv", sep="\t", dtype=str, keep_default_na=False)
+    assert table.columns[7:10].tolist() == ["DP", "GENE", "SOMATIC"]
+    assert table["DP"].tolist() == ["", "", "12"]
+    assert table["SOMATIC"].tolist() == ["", "True", ""]